@@ -3,9 +3,20 @@
 R.Jim Simons Strategy Tester - Simplified Version
 """
 
+import importlib.util
 import random
-import statistics
+from collections import deque
 from datetime import datetime
+from pathlib import Path
+
+# Shared O(1) rolling statistics from the CLAWARS backend. core/rolling.py
+# only needs the standard library, so it is loaded from its file rather
+# than through the core package (which pulls in settings and the database)
+_ROLLING = Path(__file__).resolve().parents[3] / "clawars" / "backend" / "core" / "rolling.py"
+_spec = importlib.util.spec_from_file_location("clawars_rolling", _ROLLING)
+_rolling = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_rolling)
+RollingVariance = _rolling.RollingVariance
 
 # Strategy parameters
 LOOKBACK = 20
@@ -17,12 +28,15 @@ class ResidualMomentumStrategy:
     """Dr. Simons' Residual Momentum with Regime Detection"""
     
     def __init__(self):
-        self.prices = []
+        self.prices = deque(maxlen=LOOKBACK + 2)  # only the warm-up check needs history
+        self.changes = RollingVariance(LOOKBACK)
         self.trades = []
         self.signals = []
         
     def step(self, price):
         """Process one price tick"""
+        if self.prices:
+            self.changes.update(price - self.prices[-1])
         self.prices.append(price)
         
         if len(self.prices) < LOOKBACK + 2:
@@ -30,12 +44,10 @@ class ResidualMomentumStrategy:
             
         # Calculate residual (detrended change)
         price_change = self.prices[-1] - self.prices[-2]
-        changes = [self.prices[i] - self.prices[i-1] for i in range(-LOOKBACK, 0)]
-        trend = sum(changes) / len(changes)
-        residual = price_change - trend
+        residual = price_change - self.changes.mean
         
         # Volatility-adjusted score
-        vol = statistics.stdev(changes) if len(changes) > 1 else 0.02
+        vol = self.changes.std if LOOKBACK > 1 else 0.02
         score = residual / (vol * price) if vol > 0 else 0
         
         # Check regime (simplified correlation check)
@@ -3,6 +3,7 @@ CLAWARS API Routes
 FastAPI router for all endpoints
 """
 
+import hashlib
 from datetime import datetime
 from typing import List, Optional
 from uuid import UUID, uuid4
@@ -22,6 +23,10 @@ from schemas.schemas import (
     APIResponse
 )
 
+from core.indicator_cache import get_indicator_cache
+from core.result_cache import get_result_cache
+from core.strategy_cache import get_strategy_cache
+
 router = APIRouter(prefix="/api/v1")
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -67,7 +72,7 @@ class MockDB:
             "asset": data["asset"],
             "timeframe": data["timeframe"],
             "code": data["code"],
-            "code_hash": f"hash_{uuid4().hex[:16]}",
+            "code_hash": hashlib.sha256(data["code"].encode("utf-8")).hexdigest(),
             "status": "pending",
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat()
@@ -347,5 +352,8 @@ async def system_status():
         "strategies": len(db.strategies),
         "backtests_queued": sum(1 for b in db.backtests.values() if b["status"] == "queued"),
         "backtests_running": sum(1 for b in db.backtests.values() if b["status"] == "running"),
+        "strategy_cache": get_strategy_cache().stats(),
+        "indicator_cache": get_indicator_cache().stats(),
+        "result_cache": get_result_cache().stats(),
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -0,0 +1,4 @@
+"""
+CLAWARS Benchmarks
+Performance measurements of the backtest engine (run as `python -m benchmarks.engine`)
+"""
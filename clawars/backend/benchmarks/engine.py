@@ -0,0 +1,300 @@
+"""
+CLAWARS Engine Benchmarks
+Per-stage timings and peak memory of BacktestEngine across bar counts,
+lookbacks, trade densities and sweep sizes, with a history file and a
+regression gate
+
+    python -m benchmarks.engine                      # quick profile, appended to history
+    python -m benchmarks.engine --compare            # also fail on regressions vs the last run
+    python -m benchmarks.engine --profile full --threshold 15
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.backtest_engine import (
+    ENGINE_VERSION,
+    SIGNAL_CODES,
+    SIGNALS_BY_CODE,
+    BacktestEngine,
+    PineScriptEngine,
+    SignalType,
+)
+from core.bars import Bars
+from core.config import settings
+from core.synthetic import SyntheticMarket
+
+# Grids per profile; sweeps use their own (smaller) bar counts
+PROFILES: Dict[str, Dict[str, List[int]]] = {
+    "quick": {
+        "bars": [1_000, 10_000, 100_000],
+        "lookbacks": [20, 200],
+        "densities": [5, 50],  # trades per 1000 bars
+        "strategies": [1, 8],
+        "sweep_bars": [10_000],
+    },
+    "full": {
+        "bars": [1_000, 10_000, 100_000, 1_000_000, 10_000_000],
+        "lookbacks": [20, 200, 1000],
+        "densities": [1, 10, 100],
+        "strategies": [1, 8, 32],
+        "sweep_bars": [10_000, 100_000],
+    },
+}
+
+STAGES = ("signals", "simulate", "metrics", "sweep")
+
+# Stages faster than this are too noisy to gate on
+MIN_GATED_SECONDS = 0.005
+
+
+@dataclass
+class Measurement:
+    stage: str
+    params: Dict[str, int]
+    seconds: float  # best of the timed repeats
+    peak_bytes: int  # tracemalloc peak of one run
+    trades: int = 0
+
+    @property
+    def key(self) -> str:
+        return "/".join([self.stage] + [f"{k}={v}" for k, v in sorted(self.params.items())])
+
+
+@dataclass
+class BenchmarkRun:
+    profile: str
+    measurements: List[Measurement] = field(default_factory=list)
+    timestamp: str = ""
+    engine_version: str = ENGINE_VERSION
+    commit: Optional[str] = None
+    host: str = ""
+    python: str = ""
+
+    def by_key(self) -> Dict[str, Measurement]:
+        return {m.key: m for m in self.measurements}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BenchmarkRun":
+        data = dict(data)
+        data["measurements"] = [Measurement(**m) for m in data.get("measurements", [])]
+        return cls(**data)
+
+
+@dataclass
+class Regression:
+    key: str
+    baseline: float
+    current: float
+
+    @property
+    def change_pct(self) -> float:
+        return (self.current / self.baseline - 1) * 100
+
+
+def strategy_code(lookback: int) -> str:
+    """Built-in residual momentum strategy at `lookback`"""
+    return (
+        f"lookback = input.int({lookback}, \"Lookback\")\n"
+        "entryThreshold = input.float(0.00002, \"Entry\")\n"
+        "exitThreshold = input.float(0.000005, \"Exit\")\n"
+        "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+    )
+
+
+def density_signals(n_bars: int, per_1000: int) -> List[SignalType]:
+    """
+    Evenly spaced round trips, `per_1000` per 1000 bars, alternating long
+    and short and each held for half its slot, so simulation cost can be
+    measured at a fixed trade density independent of any strategy.
+    """
+    codes = np.zeros(n_bars, dtype=np.int8)
+    slot = max(1000 // max(per_1000, 1), 2)
+    entries = np.arange(0, n_bars - slot // 2, slot)
+    codes[entries[0::2]] = SIGNAL_CODES[SignalType.LONG]
+    codes[entries[1::2]] = SIGNAL_CODES[SignalType.SHORT]
+    codes[entries + slot // 2] = SIGNAL_CODES[SignalType.CLOSE]
+    return [SIGNALS_BY_CODE[c] for c in codes.tolist()]
+
+
+def _bars(n_bars: int, seed: int = 0) -> Bars:
+    return SyntheticMarket(seed=seed).gbm(1, n_bars).bars(0)
+
+
+def _measure(fn: Callable[[], Any], repeat: int) -> Tuple[float, int, Any]:
+    """Best wall time of `repeat` runs and the peak traced memory of a warm-up run"""
+    tracemalloc.start()
+    try:
+        result = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, peak, result
+
+
+def run_profile(
+    grid: Dict[str, List[int]],
+    repeat: int = 3,
+    profile: str = "custom",
+    log: Optional[Callable[[Measurement], None]] = None,
+) -> BenchmarkRun:
+    """Measure every stage over `grid` (see PROFILES)"""
+    engine = BacktestEngine()
+    run = BenchmarkRun(profile=profile)
+
+    def record(measurement: Measurement) -> None:
+        run.measurements.append(measurement)
+        if log is not None:
+            log(measurement)
+
+    for n_bars in grid["bars"]:
+        bars = _bars(n_bars)
+        for lookback in grid["lookbacks"]:
+            pine = PineScriptEngine(strategy_code(lookback))
+            seconds, peak, codes = _measure(lambda: pine.generate_signal_codes(bars), repeat)
+            trades = int(np.count_nonzero(codes == SIGNAL_CODES[SignalType.CLOSE]))
+            record(Measurement("signals", {"bars": n_bars, "lookback": lookback}, seconds, peak, trades))
+
+        for density in grid["densities"]:
+            signals = density_signals(n_bars, density)
+            seconds, peak, (trades, curve) = _measure(
+                lambda: engine._simulate_trades(bars, signals, 0.0001), repeat
+            )
+            params = {"bars": n_bars, "density": density}
+            record(Measurement("simulate", params, seconds, peak, len(trades)))
+            seconds, peak, _ = _measure(lambda: engine._calculate_metrics(trades, curve), repeat)
+            record(Measurement("metrics", params, seconds, peak, len(trades)))
+        del bars
+
+    for n_bars in grid["sweep_bars"]:
+        bars = _bars(n_bars)
+        for n_strategies in grid["strategies"]:
+            samples = [{"lookback": 10 + 5 * i} for i in range(n_strategies)]
+            # One worker: the benchmark measures the engine, not the pool
+            seconds, peak, _ = _measure(
+                lambda: engine.sweep(strategy_code(20), bars, samples=samples, max_workers=1), repeat
+            )
+            record(Measurement("sweep", {"bars": n_bars, "strategies": n_strategies}, seconds, peak))
+
+    run.timestamp = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    run.commit = _commit()
+    run.host = platform.node()
+    run.python = platform.python_version()
+    return run
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+# History
+
+def load_history(path: str) -> List[BenchmarkRun]:
+    """Runs recorded in `path` (JSON lines), oldest first"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [BenchmarkRun.from_dict(json.loads(line)) for line in f if line.strip()]
+
+
+def append_history(path: str, run: BenchmarkRun) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(run.to_dict(), sort_keys=True) + "\n")
+
+
+def baseline_for(history: List[BenchmarkRun], run: BenchmarkRun) -> Optional[BenchmarkRun]:
+    """Latest earlier run of the same profile on the same host"""
+    for previous in reversed(history):
+        if previous.profile == run.profile and previous.host == run.host:
+            return previous
+    return None
+
+
+def compare(
+    baseline: BenchmarkRun,
+    current: BenchmarkRun,
+    threshold_pct: float,
+    min_seconds: float = MIN_GATED_SECONDS,
+) -> List[Regression]:
+    """Measurements present in both runs that slowed down by more than `threshold_pct`"""
+    before = baseline.by_key()
+    regressions = []
+    for key, measurement in current.by_key().items():
+        previous = before.get(key)
+        if previous is None or max(previous.seconds, measurement.seconds) < min_seconds:
+            continue
+        if measurement.seconds > previous.seconds * (1 + threshold_pct / 100):
+            regressions.append(Regression(key, previous.seconds, measurement.seconds))
+    return regressions
+
+
+# CLI
+
+def _format(measurement: Measurement) -> str:
+    return (
+        f"{measurement.key:<40} {measurement.seconds * 1000:>11.2f} ms"
+        f" {measurement.peak_bytes / 2 ** 20:>9.1f} MiB {measurement.trades:>9} trades"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.engine", description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="quick")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per measurement (best is kept)")
+    parser.add_argument("--history", default=settings.BENCHMARK_HISTORY_FILE)
+    parser.add_argument("--compare", action="store_true", help="exit 1 on regressions vs the previous run")
+    parser.add_argument("--threshold", type=float, default=settings.BENCHMARK_REGRESSION_PCT,
+                        help="allowed slowdown per measurement, in percent")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args(argv)
+
+    run = run_profile(PROFILES[args.profile], args.repeat, args.profile, log=lambda m: print(_format(m), flush=True))
+
+    status = 0
+    if args.compare:
+        baseline = baseline_for(load_history(args.history), run)
+        if baseline is None:
+            print(f"No earlier '{args.profile}' run on this host to compare against")
+        else:
+            regressions = compare(baseline, run, args.threshold)
+            print(f"Compared with {baseline.timestamp} ({baseline.commit or 'unknown commit'}):"
+                  f" {len(regressions)} regression(s) over {args.threshold:g}%")
+            for regression in regressions:
+                print(f"  {regression.key}: {regression.baseline * 1000:.2f} ms -> "
+                      f"{regression.current * 1000:.2f} ms (+{regression.change_pct:.1f}%)")
+            status = 1 if regressions else 0
+    if not args.no_save:
+        append_history(args.history, run)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,32 +3,61 @@ CLAWARS Backtesting Engine
 Simulates trading strategies against historical data
 """
 
-import re
-import hashlib
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+import asyncio
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
-import random
 import statistics
 
+import numpy as np
+
+from .bars import Bars, MS_PER_HOUR, as_bars, to_epoch_ms
+from .config import settings
+from .equity import EquityCurveStream, downsample_equity
+from .exits import ExitStage
+from .indicator_cache import get_indicator_cache
+from .metrics import MetricsAccumulator
+from .pine_compiler import COMPILER_VERSION
+from .portfolio import Panel, PortfolioResult, simulate_portfolio
+from .profiling import Profiler
+from .result_cache import get_result_cache, result_key
+from .rolling import RollingMax, RollingVariance
+from .strategy_cache import get_strategy_cache
+from .synthetic import SyntheticMarket
+from .trade_log import TradeLog
+
+if TYPE_CHECKING:
+    from .robustness import RobustnessReport
+    from .sandbox import SandboxPool
+    from .sweep import SweepEntry
+
+# Bump when simulation or metrics change so cached results (core.result_cache) are recomputed
+ENGINE_VERSION = "2"
+
 class SignalType(Enum):
     LONG = "LONG"
     SHORT = "SHORT"
     CLOSE = "CLOSE"
     HOLD = "HOLD"
 
-@dataclass
-class Trade:
-    entry_price: float
-    exit_price: Optional[float]
-    entry_time: datetime
-    exit_time: Optional[datetime]
-    direction: str  # "LONG" or "SHORT"
-    size: float
-    pnl: Optional[float]
-    pnl_pct: Optional[float]
-    exit_reason: Optional[str]
+# Compact int8 encoding used by the vectorized signal kernel
+SIGNAL_CODES = {
+    SignalType.HOLD: 0,
+    SignalType.LONG: 1,
+    SignalType.SHORT: 2,
+    SignalType.CLOSE: 3,
+}
+SIGNALS_BY_CODE = (SignalType.HOLD, SignalType.LONG, SignalType.SHORT, SignalType.CLOSE)
+
+# Scores closer than this (relative) to a threshold are recomputed exactly,
+# so float rounding in the vectorized path can never flip a decision
+_THRESHOLD_TOLERANCE = 1e-9
+# Wider band for the incremental path, which carries Welford rounding drift
+_INCREMENTAL_TOLERANCE = 1e-7
+
+# Windows are processed in blocks to bound the size of temporaries
+_WINDOW_BLOCK = 16384
 
 @dataclass  
 class BacktestResult:
@@ -43,21 +72,81 @@ class BacktestResult:
     avg_trade_pnl: float
     total_return: float
     equity_curve: List[Dict]
-    trades: List[Trade]
+    trades: TradeLog
     composite_score: float
+    timings: Dict[str, Dict[str, float]] = field(default_factory=dict)  # per stage, see core.profiling
+    
+    def summary(self) -> Dict[str, float]:
+        """Scalar metrics only (no trades or equity curve)"""
+        return {
+            "total_trades": self.total_trades,
+            "winning_trades": self.winning_trades,
+            "losing_trades": self.losing_trades,
+            "win_rate": self.win_rate,
+            "profit_factor": self.profit_factor,
+            "sharpe_ratio": self.sharpe_ratio,
+            "sortino_ratio": self.sortino_ratio,
+            "max_drawdown": self.max_drawdown,
+            "avg_trade_pnl": self.avg_trade_pnl,
+            "total_return": self.total_return,
+            "composite_score": self.composite_score,
+        }
+
+@dataclass
+class SimulationProgress:
+    """Reported after each simulated chunk of bars"""
+    bars_done: int
+    bars_total: int
+    trades: int
+    equity: float  # marked to market at the last bar done
+    
+    @property
+    def fraction(self) -> float:
+        return self.bars_done / self.bars_total if self.bars_total else 1.0
+
+@dataclass
+class SimulationState:
+    """Realized equity and open position carried between simulated chunks"""
+    equity: float
+    bars_done: int = 0
+    position: Optional[str] = None  # "LONG", "SHORT" or None
+    entry_price: float = 0.0
+    position_size: float = 0.0
+    entry_index: int = 0  # absolute bar of the open position's entry
+    entry_time: int = 0  # epoch ms
+
+class BacktestCancelled(Exception):
+    """Raised when a run's cancellation check returns true"""
 
 class PineScriptEngine:
     """
-    Simplified Pine Script interpreter for backtesting.
-    In production, this would interface with TradingView's engine or a full parser.
+    Pine Script strategy runner.
+    
+    The script is compiled to a vectorized indicator graph (core.pine_compiler),
+    cached by code hash across backtests and workers (core.strategy_cache).
+    Scripts that place orders run their own entry/exit logic; scripts with
+    inputs only run the built-in residual momentum rule parameterized by them.
     """
     
-    def __init__(self, code: str):
+    # Built-in rule parameters and the Pine inputs that set them
+    INPUT_NAMES = {
+        "lookback": "lookback",
+        "entry_threshold": "entryThreshold",
+        "exit_threshold": "exitThreshold",
+        "kelly_fraction": "kellyFraction",
+        "trading_hours_start": "tradingStart",
+        "trading_hours_end": "tradingEnd",
+        "max_positions": "maxPositions",
+    }
+    
+    def __init__(self, code: str, vectorized: bool = True, inputs: Optional[Dict] = None):
         self.code = code
+        self.vectorized = vectorized
+        self.compiled = get_strategy_cache().get(code, inputs)
         self.parsed = self._parse_code()
         
     def _parse_code(self) -> Dict:
-        """Extract key parameters from Pine Script"""
+        """Built-in rule parameters, taken from the script's inputs"""
         params = {
             "lookback": 20,
             "entry_threshold": 1.5,
@@ -65,57 +154,105 @@ class PineScriptEngine:
             "kelly_fraction": 0.25,
             "trading_hours_start": 0,
             "trading_hours_end": 23,
+            "max_positions": settings.PORTFOLIO_MAX_POSITIONS,
         }
-        
-        # Extract lookback
-        lookback_match = re.search(r'lookback\s*=\s*input\.int\((\d+)', self.code)
-        if lookback_match:
-            params["lookback"] = int(lookback_match.group(1))
-            
-        # Extract entry threshold
-        entry_match = re.search(r'entryThreshold\s*=\s*input\.float\(([\d.]+)', self.code)
-        if entry_match:
-            params["entry_threshold"] = float(entry_match.group(1))
-            
-        # Extract exit threshold
-        exit_match = re.search(r'exitThreshold\s*=\s*input\.float\(([\d.]+)', self.code)
-        if exit_match:
-            params["exit_threshold"] = float(exit_match.group(1))
-            
-        # Extract Kelly fraction
-        kelly_match = re.search(r'kellyFraction\s*=\s*input\.float\(([\d.]+)', self.code)
-        if kelly_match:
-            params["kelly_fraction"] = float(kelly_match.group(1))
-            
+        for key, name in self.INPUT_NAMES.items():
+            if name in self.compiled.inputs:
+                params[key] = type(params[key])(self.compiled.inputs[name].value)
         return params
     
-    def generate_signals(self, prices: List[float]) -> List[SignalType]:
+    def generate_signals(self, bars: Bars, exits: Optional[ExitStage] = None) -> List[SignalType]:
+        """
+        Generate trading signals for the script (or the built-in residual
+        momentum rule, via the vectorized kernel or the incremental per-bar
+        path). Accepts Bars or a plain close series.
+        """
+        bars = as_bars(bars)
+        if self.vectorized or self.compiled.has_orders or (exits is not None and exits.active):
+            codes = self.generate_signal_codes(bars, exits)
+            return [SIGNALS_BY_CODE[c] for c in codes.tolist()]
+        return self._generate_signals_incremental(bars.close.tolist())
+        
+    def generate_signal_codes(self, bars: Bars, exits: Optional[ExitStage] = None) -> np.ndarray:
+        """
+        Vectorized signal generation, returned as int8 codes (see SIGNAL_CODES).
+        Positions also close on the protective exits of `exits`.
+        A Panel gives (assets, bars) codes: scripts are evaluated on all
+        assets at once, the built-in rule over each asset's own bars.
+        """
+        if isinstance(bars, Panel):
+            if self.compiled.has_orders:
+                return self.compiled.signal_codes(bars, exits=exits)
+            codes = _per_asset_codes(bars, self.generate_signal_codes)
+            return exits.apply(codes) if exits is not None and exits.active else codes
+        bars = as_bars(bars)
+        if self.compiled.has_orders:
+            return self.compiled.signal_codes(bars, get_indicator_cache(), exits)
+        lookback = self.parsed["lookback"]
+        scores = cached_residual_scores(
+            bars,
+            lookback,
+            thresholds=(self.parsed["entry_threshold"], self.parsed["exit_threshold"]),
+        )
+        return signal_codes_from_scores(
+            scores,
+            self.parsed["entry_threshold"],
+            self.parsed["exit_threshold"],
+            start=lookback + 2,
+            exits=exits,
+        )
+        
+    def signal_stream(self) -> "ResidualSignalStream":
+        """
+        Codes for bars pushed chunk by chunk, equal to generate_signal_codes
+        over the concatenated bars. Only the built-in rule can be streamed:
+        scripts that place orders are evaluated over the whole series.
+        """
+        if self.compiled.has_orders:
+            raise ValueError("Scripts that place orders cannot be streamed; run them over the whole series")
+        return ResidualSignalStream(
+            self.parsed["lookback"], self.parsed["entry_threshold"], self.parsed["exit_threshold"]
+        )
+        
+    def _generate_signals_incremental(self, prices: List[float]) -> List[SignalType]:
         """
-        Generate trading signals based on Residual Momentum strategy.
-        Simplified implementation for simulation.
+        Per-bar path on O(1) rolling statistics, as used for live ticks.
+        Scores near a decision threshold are recomputed exactly.
         """
         lookback = self.parsed["lookback"]
         entry_threshold = self.parsed["entry_threshold"]
         exit_threshold = self.parsed["exit_threshold"]
+        margins = [
+            (t, _INCREMENTAL_TOLERANCE * max(1.0, abs(t)))
+            for t in (entry_threshold, -entry_threshold, exit_threshold, -exit_threshold)
+        ]
         
+        window = RollingVariance(lookback)
+        largest = RollingMax(lookback)
         signals = []
         position = None  # None, "LONG", "SHORT"
         
         for i in range(len(prices)):
+            if i > 0:
+                price_change = prices[i] - prices[i-1]
+                window.update(price_change)
+                largest.update(abs(price_change))
+                
             if i < lookback + 2:
                 signals.append(SignalType.HOLD)
                 continue
                 
-            # Calculate residual momentum
-            price_change = prices[i] - prices[i-1]
-            changes = [prices[j] - prices[j-1] for j in range(i-lookback+1, i+1)]
-            trend = sum(changes) / len(changes)
-            residual = price_change - trend
-            
-            # Volatility adjusted
-            vol = statistics.stdev(changes) if len(changes) > 1 else 0.02
+            # Residual momentum, volatility adjusted
+            residual = price_change - window.mean
+            vol = window.std if lookback > 1 else 0.02
             score = residual / (vol * prices[i]) if vol > 0 else 0
             
+            # Flat windows and near-threshold scores take the exact path
+            if lookback > 1 and window.variance <= 1e-6 * largest.value ** 2:
+                score = _exact_residual_score(prices, i, lookback)
+            elif any(abs(score - t) <= margin for t, margin in margins):
+                score = _exact_residual_score(prices, i, lookback)
+            
             # Generate signal
             signal = SignalType.HOLD
             
@@ -142,16 +279,298 @@ class PineScriptEngine:
             
         return signals
 
+
+class PythonStrategyEngine:
+    """
+    Python strategy runner.
+    
+    The code defines `generate_signals(bars)` and optionally KELLY_FRACTION
+    (see core.sandbox.SandboxPool); each run gets a fresh process forked
+    by a sandbox, never the worker itself. `parsed` holds the sizing
+    parameters, updated by each run.
+    """
+    
+    def __init__(self, code: str, pool: Optional["SandboxPool"] = None):
+        self.code = code
+        self.pool = pool
+        self.parsed = {"kelly_fraction": 0.25}
+        
+    def generate_signals(self, bars: Bars, exits: Optional[ExitStage] = None) -> List[SignalType]:
+        codes = self.generate_signal_codes(bars, exits)
+        return [SIGNALS_BY_CODE[c] for c in codes.tolist()]
+        
+    def generate_signal_codes(self, bars: Bars, exits: Optional[ExitStage] = None) -> np.ndarray:
+        """
+        int8 codes from the sandbox, with the protective exits of `exits`
+        imposed; raises SandboxError if the strategy fails
+        """
+        from .sandbox import get_sandbox_pool
+        
+        if isinstance(bars, Panel):
+            codes = _per_asset_codes(bars, self.generate_signal_codes)
+        else:
+            pool = self.pool or get_sandbox_pool()
+            codes, params = pool.run(self.code, as_bars(bars))
+            self.parsed.update(params)
+        return exits.apply(codes) if exits is not None and exits.active else codes
+
+def _per_asset_codes(panel: Panel, generate) -> np.ndarray:
+    """(assets, bars) codes from a single-series generator run over each asset's own bars"""
+    codes = np.zeros((len(panel.assets), len(panel)), dtype=np.int8)
+    for r in range(len(panel.assets)):
+        codes[r, panel.present[r]] = generate(panel.asset_bars(r))
+    return codes
+
+
+def _exact_residual_score(prices, i: int, lookback: int) -> float:
+    """Reference residual momentum score at bar i, O(lookback)"""
+    # Calculate residual momentum
+    price_change = prices[i] - prices[i-1]
+    changes = [prices[j] - prices[j-1] for j in range(i-lookback+1, i+1)]
+    trend = sum(changes) / len(changes)
+    residual = price_change - trend
+    
+    # Volatility adjusted
+    vol = statistics.stdev(changes) if len(changes) > 1 else 0.02
+    return residual / (vol * prices[i]) if vol > 0 else 0
+
+def residual_scores(
+    closes: np.ndarray,
+    lookback: int,
+    thresholds: Tuple[float, ...] = ()
+) -> np.ndarray:
+    """
+    Residual momentum score for every bar in one pass.
+    
+    Rolling trend and volatility come from strided windows over the price
+    changes. Bars scoring within rounding distance of +/- any of the given
+    thresholds, or whose window is numerically flat, are recomputed with
+    the exact reference formula. Bars without a full window score 0.
+    """
+    n = len(closes)
+    start = lookback + 2
+    scores = np.zeros(n)
+    if n <= start:
+        return scores
+        
+    changes = np.diff(closes)
+    if lookback < 2:
+        # Single-change window: the trend equals the change, residual is 0
+        return scores
+        
+    windows = np.lib.stride_tricks.sliding_window_view(changes, lookback)
+    exact = []
+    
+    # Window for bar i is changes[i-lookback:i] == windows[i-lookback]
+    for lo in range(start, n, _WINDOW_BLOCK):
+        hi = min(lo + _WINDOW_BLOCK, n)
+        block = windows[lo - lookback:hi - lookback]
+        trend = block.sum(axis=1) / lookback
+        deviations = block - trend[:, None]
+        var = np.einsum("ij,ij->i", deviations, deviations) / (lookback - 1)
+        vol = np.sqrt(var)
+        
+        residual = changes[lo - 1:hi - 1] - trend
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block_scores = np.where(vol > 0, residual / (vol * closes[lo:hi]), 0.0)
+            
+        # Flat windows: the exact stdev may be 0 where ours is rounding noise
+        scale = np.abs(block).max(axis=1)
+        uncertain = var <= 1e-20 * scale * scale
+        for t in thresholds:
+            margin = _THRESHOLD_TOLERANCE * max(1.0, abs(t))
+            uncertain |= np.abs(block_scores - t) <= margin
+            uncertain |= np.abs(block_scores + t) <= margin
+            
+        scores[lo:hi] = block_scores
+        exact.extend((np.flatnonzero(uncertain) + lo).tolist())
+        
+    for i in exact:
+        window = closes[i - lookback:i + 1].tolist()
+        scores[i] = _exact_residual_score(window, lookback, lookback)
+        
+    return scores
+
+class ResidualSignalStream:
+    """
+    The built-in residual momentum rule over closes arriving in chunks.
+    Carries the lookback + 2 closes a score reads and the open position
+    between pushes, so chunk boundaries do not change any code.
+    """
+    
+    def __init__(self, lookback: int, entry_threshold: float, exit_threshold: float):
+        self.lookback = lookback
+        self.entry_threshold = entry_threshold
+        self.exit_threshold = exit_threshold
+        self.bars_done = 0
+        self.position = 0  # 1 long, -1 short, 0 flat
+        self._history = np.empty(0)
+        
+    def push(self, closes: np.ndarray) -> np.ndarray:
+        """int8 codes for the next chunk of closes"""
+        history = self.lookback + 2
+        carried = len(self._history)
+        window = np.concatenate([self._history, closes])
+        scores = residual_scores(window, self.lookback, thresholds=(self.entry_threshold, self.exit_threshold))
+        codes = signal_codes_from_scores(
+            scores[carried:],
+            self.entry_threshold,
+            self.exit_threshold,
+            start=max(history - self.bars_done, 0),
+            position=self.position,
+        )
+        events = np.flatnonzero(codes)
+        if len(events):
+            last = codes[events[-1]]
+            self.position = 0 if last == SIGNAL_CODES[SignalType.CLOSE] else (
+                1 if last == SIGNAL_CODES[SignalType.LONG] else -1
+            )
+        self._history = window[-history:].copy()
+        self.bars_done += len(closes)
+        return codes
+
+def cached_residual_scores(
+    bars: Bars,
+    lookback: int,
+    thresholds: Tuple[float, ...] = ()
+) -> np.ndarray:
+    """
+    residual_scores over `bars` through the process indicator cache. A
+    score reads the lookback + 1 closes up to its bar, so windows inside a
+    cached one are sliced from it.
+    """
+    return get_indicator_cache().series(
+        bars,
+        "residual_scores",
+        (lookback, tuple(thresholds)),
+        lambda b: residual_scores(b.close, lookback, thresholds=thresholds),
+        history=lookback + 2,
+    )
+
+def signal_codes_from_scores(
+    scores: np.ndarray,
+    entry_threshold: float,
+    exit_threshold: float,
+    start: int = 0,
+    exits: Optional[ExitStage] = None,
+    position: int = 0
+) -> np.ndarray:
+    """
+    Run the entry/exit state machine over precomputed scores.
+    Jumps from event to event, so the Python loop is O(trades), not O(bars).
+    Positions also close on the protective exits of `exits`. `position`
+    is a position already open before `start` (1 long, -1 short), as
+    when scores arrive in chunks.
+    """
+    n = len(scores)
+    codes = np.zeros(n, dtype=np.int8)
+    if n <= start:
+        return codes
+        
+    tail = scores[start:]
+    long_entry = tail > entry_threshold
+    short_entry = ~long_entry & (tail < -entry_threshold)
+    entries = np.flatnonzero(long_entry | short_entry) + start
+    long_exits = np.flatnonzero(tail < exit_threshold) + start
+    short_exits = np.flatnonzero(tail > -exit_threshold) + start
+    
+    i = start
+    if position:
+        exit_bars = long_exits if position > 0 else short_exits
+        if not len(exit_bars):
+            return codes
+        codes[exit_bars[0]] = SIGNAL_CODES[SignalType.CLOSE]
+        i = int(exit_bars[0]) + 1
+    while True:
+        k = entries.searchsorted(i)
+        if k == len(entries):
+            break
+        entry = int(entries[k])
+        is_long = bool(long_entry[entry - start])
+        codes[entry] = SIGNAL_CODES[SignalType.LONG if is_long else SignalType.SHORT]
+        
+        exit_bars = long_exits if is_long else short_exits
+        k = exit_bars.searchsorted(entry + 1)
+        exit_bar = int(exit_bars[k]) if k < len(exit_bars) else None
+        if exits is not None:
+            exit_bar = exits.exit(entry, 1 if is_long else -1, exit_bar)
+        if exit_bar is None:
+            break
+        codes[exit_bar] = SIGNAL_CODES[SignalType.CLOSE]
+        i = exit_bar + 1
+        
+    return codes
+
 class BacktestEngine:
     """
     Core backtesting engine for CLAWARS.
     Simulates strategy execution against historical price data.
     """
     
-    def __init__(self, initial_capital: float = 10000.0):
+    def __init__(
+        self,
+        initial_capital: float = 10000.0,
+        vectorized: bool = True,
+        slippage: float = 0.001,  # 10 bps slippage
+        commission: float = 0.0006,  # 6 bps commission (0.06%)
+        max_trades: Optional[int] = None,
+        equity_points: Optional[int] = None,
+        stop_loss: Optional[float] = None,  # fraction of entry price, e.g. 0.05
+        take_profit: Optional[float] = None,
+        time_stop_hours: Optional[float] = None
+    ):
+        if time_stop_hours is not None and not time_stop_hours > 0:
+            # A position would close on the bar that opened it
+            raise ValueError(f"time_stop_hours must be positive, got {time_stop_hours!r}")
         self.initial_capital = initial_capital
-        self.slippage = 0.001  # 10 bps slippage
-        self.commission = 0.0006  # 6 bps commission (0.06%)
+        self.vectorized = vectorized  # False selects the incremental per-bar signal path
+        self.slippage = slippage
+        self.commission = commission
+        # Trades kept in memory before the log spills older rows to disk
+        self.max_trades = max_trades if max_trades is not None else settings.BACKTEST_MAX_TRADES
+        # Point budget for the stored/returned equity curve
+        self.equity_points = equity_points if equity_points is not None else settings.BACKTEST_EQUITY_POINTS
+        # Protective exits checked against bar highs/lows (see core.exits); None disables each
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.time_stop_hours = time_stop_hours
+        
+    def config(self) -> Dict:
+        """Constructor arguments, for rebuilding an identical engine in another process"""
+        return {
+            "initial_capital": self.initial_capital,
+            "vectorized": self.vectorized,
+            "slippage": self.slippage,
+            "commission": self.commission,
+            "max_trades": self.max_trades,
+            "equity_points": self.equity_points,
+            "stop_loss": self.stop_loss,
+            "take_profit": self.take_profit,
+            "time_stop_hours": self.time_stop_hours,
+        }
+        
+    def sweep(
+        self,
+        strategy_code: str,
+        bars: Bars,
+        grid: Optional[Dict[str, List[float]]] = None,
+        samples: Optional[List[Dict]] = None,
+        max_workers: Optional[int] = None,
+    ) -> List["SweepEntry"]:
+        """
+        Backtest many parameter sets over one loaded series.
+        
+        Pass either a `grid` (values per parameter, all combinations) or
+        explicit `samples` (see core.sweep.random_samples / latin_hypercube).
+        Parameters not swept keep the values parsed from the strategy code.
+        Returns entries ranked by composite score.
+        """
+        from .sweep import parameter_grid, run_sweep
+        
+        if (grid is None) == (samples is None):
+            raise ValueError("Provide exactly one of grid or samples")
+        combinations = parameter_grid(grid) if grid is not None else samples
+        return run_sweep(self, strategy_code, as_bars(bars), combinations, max_workers)
         
     async def run_backtest(
         self,
@@ -159,94 +578,525 @@ class BacktestEngine:
         strategy_type: str,
         start_date: datetime,
         end_date: datetime,
-        progress_callback=None
+        progress_callback: Optional[Callable[[SimulationProgress], None]] = None,
+        seed: Optional[int] = None,
+        asset: Optional[str] = None,
+        timeframe: str = "4H",
+        use_cache: bool = True,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        profiler: Optional[Profiler] = None,
+        stream: bool = False
     ) -> BacktestResult:
         """
         Run a complete backtest.
+
+        Bars come from the local market data store when `asset` has history
+        there for `timeframe`; otherwise synthetic data is generated, which
+        `seed` makes reproducible.
+
+        Results over versioned data (stored or seeded bars) are kept in the
+        result cache, keyed by code, data version, engine version and this
+        engine's settings; a repeat run returns the stored result.
+
+        The simulation reports a SimulationProgress to `progress_callback`
+        after each chunk of bars and stops with BacktestCancelled once
+        `should_cancel` returns true (it is also polled before signals).
+
+        Data loading, signals, simulation and metrics each run as a stage
+        of `profiler` (default Profiler.from_settings()); the breakdown is
+        attached to the result as `timings` and logged. A cached result
+        keeps the timings of the run that computed it.
+
+        `stream` runs the backtest with run_streaming over the store's
+        chunks instead of loading the range (results are not cached); up
+        to PIPELINE_PREFETCH chunks are read ahead while one is computing.
+
+        Data is loaded on a worker thread, as is the whole streaming run,
+        so the event loop (and any other backtest computing on it) keeps
+        running meanwhile; callbacks of a streaming run are called from
+        that thread.
+        """
+        from .pipeline import prefetch, resident
+
+        profiler = profiler or Profiler.from_settings()
+        if stream:
+            def streamed() -> BacktestResult:
+                chunks, total_bars = self._iter_bars(start_date, end_date, asset, timeframe, seed)
+                return self.run_streaming(
+                    strategy_code,
+                    prefetch(chunks, settings.PIPELINE_PREFETCH, resident),
+                    strategy_type,
+                    progress_callback=progress_callback,
+                    should_cancel=should_cancel,
+                    profiler=profiler,
+                    total_bars=total_bars,
+                )
+
+            return await asyncio.to_thread(streamed)
+        with profiler.stage("data"):
+            bars = await asyncio.to_thread(self._load_bars, start_date, end_date, asset, timeframe, seed)
+        return self.run_bars(
+            strategy_code,
+            strategy_type,
+            bars,
+            progress_callback=progress_callback,
+            use_cache=use_cache,
+            should_cancel=should_cancel,
+            profiler=profiler,
+        )
+        
+    def run_bars(
+        self,
+        strategy_code: str,
+        strategy_type: str,
+        bars: Bars,
+        progress_callback: Optional[Callable[[SimulationProgress], None]] = None,
+        use_cache: bool = True,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        profiler: Optional[Profiler] = None
+    ) -> BacktestResult:
+        """The compute half of run_backtest, over already loaded bars"""
+        profiler = profiler or Profiler.from_settings()
+        key = None
+        if use_cache:
+            key = result_key(
+                strategy_code, strategy_type, bars, self.config(), f"{ENGINE_VERSION}/{COMPILER_VERSION}"
+            )
+        if key is not None:
+            cached = get_result_cache().get(key)
+            if cached is not None:
+                if progress_callback is not None:
+                    final_equity = cached.equity_curve[-1]["equity"] if cached.equity_curve else self.initial_capital
+                    progress_callback(SimulationProgress(len(bars), len(bars), cached.total_trades, final_equity))
+                profiler.emit(bars=len(bars), cache_hit=True)
+                return cached
+        if should_cancel is not None and should_cancel():
+            raise BacktestCancelled("Cancelled before signal generation")
+                
+        engine = self._strategy_engine(strategy_code, strategy_type)
+            
+        # Generate signals
+        with profiler.stage("signals"):
+            exits = self._exit_stage(bars)
+            signals = engine.generate_signals(bars, exits)
+        
+        # Simulate trading; metrics accumulate as trades close
+        metrics = MetricsAccumulator(self.initial_capital)
+        with profiler.stage("simulate"):
+            trades, equity_curve = self._simulate_trades(
+                bars,
+                signals,
+                engine.parsed["kelly_fraction"],
+                metrics,
+                exits,
+                progress_callback=progress_callback,
+                should_cancel=should_cancel,
+            )
+        
+        # Collect metrics
+        with profiler.stage("metrics"):
+            result = self._calculate_metrics(trades, equity_curve, metrics)
+        result.timings = profiler.as_dict()
+        profiler.emit(bars=len(bars), trades=len(trades), cache_hit=False)
+        if key is not None:
+            get_result_cache().put(key, result)
+        return result
         
-        In production, this would:
-        1. Fetch real historical data from Binance/Bitfinex
-        2. Execute actual Pine Script via TV API
-        3. Use proper risk management
+    async def run_portfolio_backtest(
+        self,
+        strategy_code: str,
+        strategy_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        assets: Optional[List[str]] = None,
+        timeframe: str = "4H",
+        seed: Optional[int] = None,
+        max_positions: Optional[int] = None
+    ) -> PortfolioResult:
         """
+        Run one strategy over several assets with a shared cash pool.
         
-        # Generate synthetic price data (in production: fetch from exchange API)
-        prices = self._generate_price_data(start_date, end_date)
+        Each asset loads as in run_backtest (synthetic assets use seed + i);
+        `assets` defaults to settings.PORTFOLIO_ASSETS.
+        """
+        assets = list(assets or settings.PORTFOLIO_ASSETS)
+        bars = {
+            asset: self._load_bars(start_date, end_date, asset, timeframe, None if seed is None else seed + i)
+            for i, asset in enumerate(assets)
+        }
+        return self.run_portfolio(strategy_code, bars, strategy_type, max_positions)
+        
+    def run_portfolio(
+        self,
+        strategy_code: str,
+        bars,
+        strategy_type: str = "pine_script",
+        max_positions: Optional[int] = None
+    ) -> PortfolioResult:
+        """
+        Backtest a strategy over a Panel (or {asset: Bars}, aligned here).
+        
+        Signals for every asset come from one vectorized evaluation; trades
+        then draw on one cash pool with at most `max_positions` open at a
+        time (default: the script's maxPositions input, else
+        settings.PORTFOLIO_MAX_POSITIONS).
+        """
+        panel = bars if isinstance(bars, Panel) else Panel.align(bars)
+        engine = self._strategy_engine(strategy_code, strategy_type)
+        exits = self._exit_stage(panel)
+        codes = engine.generate_signal_codes(panel, exits)
+        if max_positions is None:
+            max_positions = engine.parsed.get("max_positions", settings.PORTFOLIO_MAX_POSITIONS)
+        
+        metrics = MetricsAccumulator(self.initial_capital)
+        trades, trade_assets, equity_curve = simulate_portfolio(
+            self, panel, codes, engine.parsed["kelly_fraction"], max_positions, metrics, exits
+        )
+        return PortfolioResult(
+            result=self._calculate_metrics(trades, equity_curve, metrics),
+            assets=panel.assets,
+            trade_assets=trade_assets,
+            max_positions=max_positions,
+        )
+        
+    def run_streaming(
+        self,
+        strategy_code: str,
+        chunks: Iterable,
+        strategy_type: str = "pine_script",
+        progress_callback: Optional[Callable[[SimulationProgress], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        profiler: Optional[Profiler] = None,
+        total_bars: Optional[int] = None
+    ) -> BacktestResult:
+        """
+        Backtest over bars pulled chunk by chunk from `chunks` (Bars or
+        close arrays, e.g. BarStore.iter_bars), in bounded memory.
+
+        Each chunk is scored, simulated and dropped; only the score window,
+        the open position, the metric accumulators, a bounded equity curve
+        (EquityCurveStream) and the trade log (which spills past
+        max_trades) carry over. Trades and metrics equal those of
+        run_backtest over the concatenated bars. Supports Pine scripts
+        without orders (the built-in rule) and no protective exits, which
+        need the whole series. Progress is reported per chunk against
+        `total_bars` if known.
+        """
+        if strategy_type != "pine_script":
+            raise ValueError("Only Pine strategies can be streamed")
+        if any(rule is not None for rule in (self.stop_loss, self.take_profit, self.time_stop_hours)):
+            raise ValueError("Protective exits need the whole series; run them with run_backtest")
+        profiler = profiler or Profiler.from_settings()
+        engine = PineScriptEngine(strategy_code, vectorized=self.vectorized)
+        signals = engine.signal_stream()
+        kelly_fraction = engine.parsed["kelly_fraction"]
+
+        state = SimulationState(equity=self.initial_capital)
+        trades = TradeLog(max_rows=self.max_trades)
+        metrics = MetricsAccumulator(self.initial_capital)
+        curve = EquityCurveStream(self.equity_points, self.initial_capital)
+        chunks = iter(chunks)
+        while True:
+            with profiler.stage("data"):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            chunk = as_bars(chunk)
+            if not len(chunk):
+                continue
+            with profiler.stage("signals"):
+                codes = signals.push(chunk.close)
+            with profiler.stage("simulate"):
+                equity = np.empty(len(chunk))
+                self._simulate_chunk(
+                    state, chunk.close, chunk.timestamp.tolist(), [SIGNALS_BY_CODE[c] for c in codes.tolist()],
+                    kelly_fraction, trades, equity, metrics
+                )
+                metrics.add_equity_array(equity)
+                curve.add(chunk.timestamp, equity)
+            if progress_callback is not None:
+                total = max(total_bars or 0, state.bars_done)
+                progress_callback(SimulationProgress(state.bars_done, total, len(trades), float(equity[-1])))
+            if should_cancel is not None and should_cancel():
+                raise BacktestCancelled(f"Cancelled after {state.bars_done} bars")
+
+        with profiler.stage("metrics"):
+            result = self._calculate_metrics(trades, curve.points(), metrics)
+        result.timings = profiler.as_dict()
+        profiler.emit(bars=state.bars_done, trades=len(trades), cache_hit=False, streaming=True)
+        return result
+
+    def _exit_stage(self, bars) -> ExitStage:
+        """A fresh exit stage with this engine's stop, target and time stop"""
+        time_stop_ms = None if self.time_stop_hours is None else int(self.time_stop_hours * MS_PER_HOUR)
+        return ExitStage(bars, self.stop_loss, self.take_profit, time_stop_ms)
         
-        # Initialize engine based on strategy type
+    def _strategy_engine(self, strategy_code: str, strategy_type: str):
         if strategy_type == "pine_script":
-            engine = PineScriptEngine(strategy_code)
-        else:
-            raise NotImplementedError("Python strategies not yet implemented")
-            
-        # Generate signals
-        signals = engine.generate_signals(prices)
+            return PineScriptEngine(strategy_code, vectorized=self.vectorized)
+        if strategy_type == "python":
+            return PythonStrategyEngine(strategy_code)
+        raise ValueError(f"Unknown strategy type: {strategy_type}")
+        
+    def _load_bars(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        asset: Optional[str],
+        timeframe: str,
+        seed: Optional[int]
+    ) -> Bars:
+        """
+        Stored history for asset/timeframe (aggregated from a finer stored
+        timeframe when it is not stored itself), or synthetic bars at
+        `timeframe` if the asset has no usable history
+        """
+        from .resample import get_resampler
+        
+        if asset:
+            resampler = get_resampler()
+            if resampler.has(asset, timeframe):
+                bars = resampler.bars(asset, timeframe, start_date, end_date)
+                if not len(bars):
+                    raise ValueError(f"No stored {asset} {timeframe} bars between {start_date} and {end_date}")
+                return bars
+        return self._generate_price_data(start_date, end_date, seed=seed, timeframe=timeframe)
+        
+    def _iter_bars(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        asset: Optional[str],
+        timeframe: str,
+        seed: Optional[int]
+    ) -> Tuple[Iterable[Bars], int]:
+        """
+        _load_bars as chunks (the store's own chunks, or aggregated or
+        synthetic bars in BACKTEST_CHUNK_BARS slices) and the expected bar
+        count, for progress
+        """
+        from .data_store import timeframe_ms
+        from .resample import get_resampler
+        
+        step = settings.BACKTEST_CHUNK_BARS
+        if asset:
+            resampler = get_resampler()
+            store = resampler.store
+            if store.has(asset, timeframe):
+                first, last = store.span(asset, timeframe)
+                lo, hi = max(first, to_epoch_ms(start_date)), min(last, to_epoch_ms(end_date))
+                expected = max((hi - lo) // timeframe_ms(timeframe) + 1, 0)
+                return store.iter_bars(asset, timeframe, start_date, end_date), expected
+            if resampler.has(asset, timeframe):
+                # Aggregates are a fraction of their base series, so they are held whole
+                bars = resampler.bars(asset, timeframe, start_date, end_date)
+                return (bars[i:i + step] for i in range(0, len(bars), step)), len(bars)
+        bars = self._generate_price_data(start_date, end_date, seed=seed, timeframe=timeframe)
+        return (bars[i:i + step] for i in range(0, len(bars), step)), len(bars)
         
-        # Simulate trading
-        trades, equity_curve = self._simulate_trades(
-            prices, signals, engine.parsed["kelly_fraction"]
+    def robustness(
+        self,
+        strategy_code: str,
+        bars: Bars,
+        n_resamples: int = 10000,
+        n_paths: int = 0,
+        model: str = "gbm",
+        confidence: float = 0.95,
+        seed: Optional[int] = None,
+    ) -> "RobustnessReport":
+        """
+        Confidence intervals for every metric and the composite score.
+        
+        Bootstraps the trade sequence of the backtest over `bars`, and, when
+        `n_paths` > 0, reruns the strategy over synthetic paths ("gbm" or
+        "regime_switching") calibrated to the drift and volatility of `bars`.
+        """
+        from .robustness import RobustnessReport, batch_metrics, bootstrap_intervals, pad_trades, summarize
+        
+        bars = as_bars(bars)
+        engine = PineScriptEngine(strategy_code, vectorized=self.vectorized)
+        kelly = engine.parsed["kelly_fraction"]
+        exits = self._exit_stage(bars)
+        trades, equity_curve = self._simulate_trades(bars, engine.generate_signals(bars, exits), kelly, exits=exits)
+        point = self._calculate_metrics(trades, equity_curve).summary()
+        
+        report = RobustnessReport(confidence=confidence, point=point)
+        report.bootstrap = bootstrap_intervals(
+            trades.pnl,
+            trades.pnl_pct,
+            self.initial_capital,
+            n_resamples=n_resamples,
+            confidence=confidence,
+            seed=seed,
+            point=point,
         )
+        report.n_resamples = n_resamples if len(trades) else 0
         
-        # Calculate metrics
-        return self._calculate_metrics(trades, equity_curve)
+        if n_paths > 0 and len(bars) > 1:
+            log_returns = np.diff(np.log(bars.close))
+            volatility = float(log_returns.std())
+            market = SyntheticMarket(seed=seed, start_price=float(bars.close[0]))
+            if model == "regime_switching":
+                paths = market.regime_switching(n_paths, len(bars), start=bars.start)
+            else:
+                drift = float(log_returns.mean()) + 0.5 * volatility ** 2
+                paths = market.gbm(n_paths, len(bars), drift=drift, volatility=volatility, start=bars.start)
+                
+            sequences = []
+            for i in range(n_paths):
+                path = paths.bars(i)
+                exits = self._exit_stage(path)
+                path_trades, _ = self._simulate_trades(path, engine.generate_signals(path, exits), kelly, exits=exits)
+                sequences.append((path_trades.pnl, path_trades.pnl_pct))
+            pnl, pnl_pct, valid = pad_trades(sequences)
+            metrics = batch_metrics(pnl, pnl_pct, self.initial_capital, valid)
+            report.monte_carlo = summarize(metrics, confidence, point)
+            report.n_paths = n_paths
+            
+        return report
         
     def _generate_price_data(
         self, 
         start_date: datetime, 
         end_date: datetime,
         volatility: float = 0.02,
-        drift: float = 0.0001
-    ) -> List[float]:
-        """Generate synthetic OHLCV data for testing"""
-        # In production: fetch from Binance API
-        days = (end_date - start_date).days
-        periods = days * 6  # 4H candles = 6 per day
+        drift: float = 0.0001,
+        seed: Optional[int] = None,
+        timeframe: str = "4H"
+    ) -> Bars:
+        """
+        Generate synthetic OHLCV data for testing (one seeded GBM path).
+        `drift` and `volatility` are per 4H bar and scaled to `timeframe`.
+        Seeded paths carry a dataset id so derived series can be cached.
+        """
+        from .data_store import timeframe_ms
         
-        price = 45000.0  # Start price
-        prices = [price]
+        # In production: fetch from Binance API
+        interval = timeframe_ms(timeframe)
+        periods = (end_date - start_date).days * 24 * MS_PER_HOUR // interval
+        scale = interval / (4 * MS_PER_HOUR)
+        drift, volatility = drift * scale, volatility * scale ** 0.5
         
-        for _ in range(periods):
-            # Random walk with drift
-            change = random.gauss(drift, volatility) * price
-            price += change
-            prices.append(max(price, 100))
-            
-        return prices
+        paths = SyntheticMarket(seed=seed).gbm(
+            n_paths=1,
+            n_bars=periods + 1,
+            drift=drift,
+            volatility=volatility,
+            start=start_date,
+            interval_ms=interval,
+        )
+        bars = paths.bars(0)
+        if seed is not None:
+            # The whole path depends on its parameters, so they are all part of the id
+            bars.dataset = f"synthetic:{seed}:{to_epoch_ms(start_date)}:{periods}:{drift}:{volatility}"
+        return bars
         
     def _simulate_trades(
         self,
-        prices: List[float],
+        bars: Bars,
         signals: List[SignalType],
-        kelly_fraction: float
-    ) -> Tuple[List[Trade], List[Dict]]:
-        """Simulate trade execution"""
-        trades = []
-        equity = self.initial_capital
-        equity_curve = [{"timestamp": i, "equity": equity} for i in range(min(10, len(prices)))]
-        
-        position = None
-        entry_price = 0
-        entry_time = None
-        position_size = 0
-        
-        for i, (price, signal) in enumerate(zip(prices, signals)):
-            timestamp = datetime.now() - timedelta(hours=len(prices)-i)
+        kelly_fraction: float,
+        metrics: Optional[MetricsAccumulator] = None,
+        exits: Optional[ExitStage] = None,
+        progress_callback: Optional[Callable[[SimulationProgress], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        chunk_bars: Optional[int] = None
+    ) -> Tuple[TradeLog, List[Dict]]:
+        """
+        Simulate trade execution at bar closes. Exits the stage `exits`
+        filled intrabar (stops, targets) take its price and reason. Trades
+        record their entry and exit bar indices and those bars' timestamps.
+        
+        Equity is marked to market at every bar close in a float64 array,
+        so drawdown is exact; the returned curve is downsampled to
+        `equity_points`. Closed trades and the full-resolution equity are
+        also fed to `metrics` if given.
+        
+        Bars are processed in chunks of `chunk_bars` (default
+        settings.BACKTEST_CHUNK_BARS) with the position carried across;
+        after each chunk `progress_callback` gets a SimulationProgress and
+        `should_cancel` is polled, raising BacktestCancelled if it is true.
+        """
+        bars = as_bars(bars)
+        closes = bars.close
+        trades = TradeLog(max_rows=self.max_trades)
+        state = SimulationState(equity=self.initial_capital)
+        equity_bars = np.empty(len(closes))
+        n = min(len(closes), len(signals))
+        chunk_bars = max(int(chunk_bars or settings.BACKTEST_CHUNK_BARS), 1)
+        
+        for start in range(0, n, chunk_bars):
+            stop = min(start + chunk_bars, n)
+            self._simulate_chunk(
+                state, closes[start:stop], bars.timestamp[start:stop].tolist(), signals[start:stop],
+                kelly_fraction, trades, equity_bars[start:stop], metrics, exits
+            )
+            if progress_callback is not None:
+                progress_callback(SimulationProgress(stop, n, len(trades), float(equity_bars[stop - 1])))
+            if should_cancel is not None and should_cancel():
+                raise BacktestCancelled(f"Cancelled after {stop} of {n} bars")
+                
+        # Bars past the last signal hold the final position
+        if state.position is not None:
+            self._mark_to_market(equity_bars, closes, n, len(closes), state.equity, state.position, state.entry_price, state.position_size)
+        else:
+            equity_bars[n:] = state.equity
             
+        if metrics is not None:
+            metrics.add_equity_array(equity_bars)
+        equity_curve = downsample_equity(bars.timestamp, equity_bars, self.equity_points, self.initial_capital)
+        return trades, equity_curve
+        
+    def _simulate_chunk(
+        self,
+        state: SimulationState,
+        closes: np.ndarray,
+        times: List[int],
+        signals: List[SignalType],
+        kelly_fraction: float,
+        trades: TradeLog,
+        equity_out: np.ndarray,
+        metrics: Optional[MetricsAccumulator] = None,
+        exits: Optional[ExitStage] = None
+    ) -> None:
+        """
+        Simulate the next chunk of bars (closes, epoch-ms times, signals)
+        from the position carried in `state`, writing each bar's marked
+        equity to `equity_out` and advancing `state`. Trade bar indices
+        and `exits` are absolute, counted from the first chunk.
+        """
+        prices = closes.tolist()
+        base = state.bars_done
+        equity = state.equity
+        position = state.position
+        entry_price = state.entry_price
+        position_size = state.position_size
+        entry_index = state.entry_index - base  # negative when opened in an earlier chunk
+        filled = 0  # equity_out[:filled] is final
+        
+        for i, price, signal in zip(range(len(prices)), prices, signals):
             # Entry
             if signal == SignalType.LONG and position is None:
                 entry_price = price * (1 + self.slippage)
                 position_size = self._calculate_position_size(equity, kelly_fraction)
                 position = "LONG"
-                entry_time = timestamp
-                
+                equity_out[filled:i] = equity
+                filled = entry_index = i
+                state.entry_time = times[i]
+            
             elif signal == SignalType.SHORT and position is None:
                 entry_price = price * (1 - self.slippage)
                 position_size = self._calculate_position_size(equity, kelly_fraction)
                 position = "SHORT"
-                entry_time = timestamp
-                
+                equity_out[filled:i] = equity
+                filled = entry_index = i
+                state.entry_time = times[i]
+            
             # Exit
             elif signal == SignalType.CLOSE and position is not None:
+                exit_reason = "Signal"
+                if exits is not None:
+                    price, exit_reason = exits.fill(base + i)
                 if position == "LONG":
                     exit_price = price * (1 - self.slippage)
                     pnl = (exit_price - entry_price) * position_size
@@ -255,32 +1105,61 @@ class BacktestEngine:
                     exit_price = price * (1 + self.slippage)
                     pnl = (entry_price - exit_price) * position_size
                     pnl_pct = (entry_price - exit_price) / entry_price * 100
-                    
+                
                 # Apply commission
                 commission = (entry_price + exit_price) * position_size * self.commission
                 pnl -= commission
                 
-                trade = Trade(
+                trades.append(
                     entry_price=entry_price,
                     exit_price=exit_price,
-                    entry_time=entry_time,
-                    exit_time=timestamp,
+                    entry_time=state.entry_time,
+                    exit_time=times[i],
                     direction=position,
                     size=position_size,
                     pnl=pnl,
                     pnl_pct=pnl_pct,
-                    exit_reason="Signal"
+                    exit_reason=exit_reason,
+                    entry_bar=base + entry_index,
+                    exit_bar=base + i
                 )
-                trades.append(trade)
+                if metrics is not None:
+                    metrics.add_trade(pnl, pnl_pct)
                 
+                # Mark the open position to market over its holding bars
+                self._mark_to_market(equity_out, closes, max(entry_index, 0), i, equity, position, entry_price, position_size)
                 equity += pnl
+                equity_out[i] = equity
+                filled = i + 1
                 position = None
                 
-            # Record equity (every 10 periods)
-            if i % 10 == 0:
-                equity_curve.append({"timestamp": i, "equity": equity})
-                
-        return trades, equity_curve
+        if position is not None:
+            self._mark_to_market(equity_out, closes, max(entry_index, 0), len(prices), equity, position, entry_price, position_size)
+        else:
+            equity_out[filled:len(prices)] = equity
+            
+        state.bars_done = base + len(prices)
+        state.equity = equity
+        state.position = position
+        state.entry_price = entry_price
+        state.position_size = position_size
+        state.entry_index = base + entry_index
+        
+        
+    def _mark_to_market(
+        self,
+        equity_bars: np.ndarray,
+        closes: np.ndarray,
+        start: int,
+        stop: int,
+        equity: float,
+        position: str,
+        entry_price: float,
+        position_size: float
+    ) -> None:
+        """Realized equity plus unrealized P&L at each close in [start, stop)"""
+        direction = 1.0 if position == "LONG" else -1.0
+        equity_bars[start:stop] = equity + direction * (closes[start:stop] - entry_price) * position_size
         
     def _calculate_position_size(self, equity: float, kelly_fraction: float) -> float:
         """Calculate position size using Kelly Criterion"""
@@ -289,92 +1168,24 @@ class BacktestEngine:
         
     def _calculate_metrics(
         self,
-        trades: List[Trade],
-        equity_curve: List[Dict]
+        trades: TradeLog,
+        equity_curve: List[Dict],
+        metrics: Optional[MetricsAccumulator] = None
     ) -> BacktestResult:
-        """Calculate all performance metrics"""
-        
-        if not trades:
-            return BacktestResult(
-                total_trades=0,
-                winning_trades=0,
-                losing_trades=0,
-                win_rate=0,
-                profit_factor=0,
-                sharpe_ratio=0,
-                sortino_ratio=0,
-                max_drawdown=0,
-                avg_trade_pnl=0,
-                total_return=0,
-                equity_curve=equity_curve,
-                trades=trades,
-                composite_score=0
-            )
-            
-        # Basic counts
-        total_trades = len(trades)
-        winning_trades = sum(1 for t in trades if t.pnl and t.pnl > 0)
-        losing_trades = total_trades - winning_trades
-        win_rate = winning_trades / total_trades * 100
-        
-        # P&L metrics
-        gross_profit = sum(t.pnl for t in trades if t.pnl and t.pnl > 0)
-        gross_loss = abs(sum(t.pnl for t in trades if t.pnl and t.pnl <= 0))
-        profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
-        
-        avg_trade_pnl = sum(t.pnl for t in trades if t.pnl) / total_trades
-        
-        # Returns
-        final_equity = equity_curve[-1]["equity"]
-        total_return = (final_equity - self.initial_capital) / self.initial_capital * 100
-        
-        # Sharpe ratio
-        returns = [t.pnl_pct for t in trades if t.pnl_pct]
-        if len(returns) > 1:
-            avg_return = statistics.mean(returns)
-            std_return = statistics.stdev(returns)
-            sharpe = avg_return / std_return * (252 ** 0.5) if std_return > 0 else 0
-            
-            # Sortino (downside deviation only)
-            downside_returns = [r for r in returns if r < 0]
-            downside_std = statistics.stdev(downside_returns) if len(downside_returns) > 1 else 1
-            sortino = avg_return / downside_std * (252 ** 0.5) if downside_std > 0 else 0
-        else:
-            sharpe = 0
-            sortino = 0
-            
-        # Max drawdown
-        peak = self.initial_capital
-        max_dd = 0
-        for point in equity_curve:
-            equity = point["equity"]
-            if equity > peak:
-                peak = equity
-            dd = (equity - peak) / peak * 100
-            max_dd = min(max_dd, dd)
-            
-        # Composite score (Clawars ranking)
-        # Score = (Sharpe × 0.4) + (Profit Factor × 0.3) + (Win Rate × 0.2) - (Max Drawdown × 0.1)
-        score = (
-            min(sharpe, 5) * 0.4 +
-            min(profit_factor, 3) * 0.3 +
-            win_rate * 0.2 -
-            abs(max_dd) * 0.1
-        )
-        score = max(0, min(100, score))  # Clamp to 0-100
-        
+        """
+        Calculate all performance metrics.
+        Uses the accumulator fed during simulation when given; otherwise
+        replays trades and equity points through a fresh one.
+        """
+        if metrics is None:
+            metrics = MetricsAccumulator(self.initial_capital)
+            for pnl, pnl_pct in zip(trades.pnl.tolist(), trades.pnl_pct.tolist()):
+                metrics.add_trade(pnl, pnl_pct)
+            for point in equity_curve:
+                metrics.add_equity(point["equity"])
+                
         return BacktestResult(
-            total_trades=total_trades,
-            winning_trades=winning_trades,
-            losing_trades=losing_trades,
-            win_rate=win_rate,
-            profit_factor=profit_factor,
-            sharpe_ratio=sharpe,
-            sortino_ratio=sortino,
-            max_drawdown=max_dd,
-            avg_trade_pnl=avg_trade_pnl,
-            total_return=total_return,
             equity_curve=equity_curve,
             trades=trades,
-            composite_score=round(score, 2)
+            **metrics.result()
         )
@@ -0,0 +1,169 @@
+"""
+CLAWARS Bar Container
+Columnar OHLCV storage on contiguous typed arrays
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+# Timestamps are int64 epoch milliseconds (UTC), matching exchange klines
+TimeLike = Union[datetime, int, np.integer]
+
+MS_PER_HOUR = 3_600_000
+
+
+def to_epoch_ms(value: TimeLike) -> int:
+    """Convert a datetime (naive = UTC) or epoch-ms integer to epoch ms"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(round(value.timestamp() * 1000))
+    return int(value)
+
+
+def from_epoch_ms(value: int) -> datetime:
+    """Epoch ms to a naive UTC datetime (the convention used across the API)"""
+    return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+class Bars:
+    """
+    OHLCV bars as parallel column arrays.
+
+    Timestamps are int64 epoch ms, prices and volume float64. Slicing by
+    position or time range returns views over the same buffers, so a Bars
+    can wrap memory-mapped columns without ever loading them.
+
+    `dataset` optionally names the series the bars were taken from (the
+    store's asset/timeframe and revision, or a seeded synthetic path);
+    slices keep it, so derived series can be cached across backtests.
+    """
+
+    COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+    PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+    def __init__(
+        self,
+        timestamp: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        dataset: Optional[str] = None,
+    ):
+        self.timestamp = _column(timestamp, np.int64)
+        self.open = _column(open, np.float64)
+        self.high = _column(high, np.float64)
+        self.low = _column(low, np.float64)
+        self.close = _column(close, np.float64)
+        self.volume = _column(volume, np.float64)
+        self.dataset = dataset
+
+        n = len(self.timestamp)
+        for name in self.PRICE_COLUMNS:
+            if len(getattr(self, name)) != n:
+                raise ValueError(f"Column '{name}' length differs from timestamp column")
+
+    @classmethod
+    def from_closes(
+        cls,
+        closes: Sequence[float],
+        start: TimeLike = 0,
+        interval_ms: int = 4 * MS_PER_HOUR,
+    ) -> "Bars":
+        """
+        Build bars from a close series.
+        Each bar opens at the previous close; high/low span open and close.
+        """
+        close = np.asarray(closes, dtype=np.float64)
+        open_ = np.empty_like(close)
+        if len(close):
+            open_[0] = close[0]
+            open_[1:] = close[:-1]
+        timestamp = to_epoch_ms(start) + np.arange(len(close), dtype=np.int64) * interval_ms
+        return cls(
+            timestamp=timestamp,
+            open=open_,
+            high=np.maximum(open_, close),
+            low=np.minimum(open_, close),
+            close=close,
+            volume=np.zeros_like(close),
+        )
+
+    @classmethod
+    def empty(cls) -> "Bars":
+        return cls(*(np.empty(0) for _ in cls.COLUMNS))
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def __getitem__(self, key: slice) -> "Bars":
+        """Positional slice; returns views (zero-copy for unit steps)"""
+        if not isinstance(key, slice):
+            raise TypeError("Bars supports slice indexing only; use the columns for scalars")
+        # A strided selection is no longer a contiguous run of the dataset
+        dataset = self.dataset if key.step in (None, 1) else None
+        return Bars(*(getattr(self, name)[key] for name in self.COLUMNS), dataset=dataset)
+
+    def index_of(self, when: TimeLike, side: str = "left") -> int:
+        """Position of the first bar at (side='left') or after (side='right') `when`"""
+        return int(np.searchsorted(self.timestamp, to_epoch_ms(when), side=side))
+
+    def between(self, start: Optional[TimeLike] = None, end: Optional[TimeLike] = None) -> "Bars":
+        """Bars with start <= timestamp <= end, as views"""
+        lo = self.index_of(start) if start is not None else 0
+        hi = self.index_of(end, side="right") if end is not None else len(self)
+        return self[lo:hi]
+
+    @property
+    def start(self) -> Optional[int]:
+        return int(self.timestamp[0]) if len(self) else None
+
+    @property
+    def end(self) -> Optional[int]:
+        return int(self.timestamp[-1]) if len(self) else None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    def save(self, path: str) -> None:
+        """Write each column as <path>/<column>.npy"""
+        os.makedirs(path, exist_ok=True)
+        for name in self.COLUMNS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "Bars":
+        """Open a directory written by save(); columns are memory-mapped read-only by default"""
+        mode = "r" if mmap else None
+        return cls(*(
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in cls.COLUMNS
+        ))
+
+    def __repr__(self) -> str:
+        return f"Bars(n={len(self)}, start={self.start}, end={self.end})"
+
+
+def as_bars(data: Union["Bars", Sequence[float], np.ndarray]) -> Bars:
+    """Accept Bars or a bare close series (bar-index timestamps)"""
+    if isinstance(data, Bars):
+        return data
+    return Bars.from_closes(data, start=0, interval_ms=1)
+
+
+def _column(values, dtype) -> np.ndarray:
+    """1-D contiguous column of the given dtype; no copy when already conforming"""
+    array = np.asarray(values)
+    if array.dtype != dtype:
+        array = array.astype(dtype)
+    if array.ndim != 1:
+        raise ValueError("Bar columns must be one-dimensional")
+    if not array.flags.c_contiguous:
+        array = np.ascontiguousarray(array)
+    return array
@@ -4,7 +4,7 @@ Environment-based settings with Pydantic
 """
 
 from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -48,7 +48,53 @@ class Settings(BaseSettings):
     BACKTEST_SLIPPAGE: float = 0.001  # 10 bps
     BACKTEST_COMMISSION: float = 0.0006  # 6 bps
     BACKTEST_MAX_TRADES: int = 10000
+    BACKTEST_EQUITY_POINTS: int = 500  # stored equity_curve size (LTTB downsampled)
+    BACKTEST_CHUNK_BARS: int = 20000  # bars simulated between progress reports / cancellation checks
+    PIPELINE_PREFETCH: int = 2  # datasets / stored chunks loaded ahead of the one computing
     
+    # Market Data
+    MARKET_DATA_DIR: str = "data/market"  # BarStore root, shared by all workers
+    RESAMPLE_CACHE_SIZE: int = 32  # aggregated (asset, timeframe) series kept in memory per process
+    
+    # Strategy Cache
+    STRATEGY_CACHE_DIR: str = "data/strategies"  # compiled Pine artifacts; "" disables the disk tier
+    STRATEGY_CACHE_SIZE: int = 256  # compiled strategies kept in memory per process
+    
+    # Indicator Cache
+    INDICATOR_CACHE_MB: int = 256  # derived series kept in memory per process (LRU)
+    INDICATOR_CACHE_DIR: str = "data/indicators"  # memory-mapped tier shared by a host's workers; "" disables
+    INDICATOR_CACHE_DISK_MB: int = 2048
+    
+    # Result Cache
+    RESULT_CACHE_DIR: str = "data/results"  # backtest results by content key; "" disables the disk tier
+    RESULT_CACHE_SIZE: int = 128  # results kept in memory per process
+    RESULT_CACHE_DISK_MB: int = 1024  # disk tier pruned oldest-first past this; 0 keeps every entry
+    
+    # Python Strategy Sandbox
+    SANDBOX_POOL_SIZE: int = 2  # pre-started interpreters per worker process
+    SANDBOX_MEMORY_MB: int = 1024  # address space limit per sandbox
+    SANDBOX_CPU_SECONDS: int = 60  # CPU budget per strategy run
+    SANDBOX_TIMEOUT_SECONDS: float = 120.0  # wall clock per strategy run
+    SANDBOX_USER: str = "nobody"  # sandboxes started by root switch to this user; "" keeps root
+    SANDBOX_SECCOMP: bool = True  # syscall filter (Linux x86_64/aarch64); sandboxes fail to start without it
+    
+    # Portfolio Backtests
+    PORTFOLIO_ASSETS: List[str] = [
+        "BTCUSDT", "ETHUSDT", "SOLUSDT", "AVAXUSDT", "NEARUSDT", "BNBUSDT", "ARBUSDT", "OPUSDT",
+    ]
+    PORTFOLIO_MAX_POSITIONS: int = 3  # open positions at once unless the script sets maxPositions
+
+    # Profiling
+    PROFILE_SLOW_STAGE_SECONDS: float = 5.0  # backtest stages slower than this are logged as slow
+    PROFILE_SAMPLE_RATE: float = 0.0  # fraction of backtests run under PROFILE_SAMPLER (several times slower)
+    PROFILE_SAMPLER: str = "cprofile"  # "cprofile" or "tracemalloc" (adds traced peak memory)
+    PROFILE_TOP: int = 15  # functions / allocation sites kept from a slow sampled stage
+    PROFILE_DIR: str = "data/profiles"  # .pstats dumps of slow sampled stages; "" keeps them in logs only
+
+    # Benchmarks
+    BENCHMARK_HISTORY_FILE: str = "data/benchmarks/history.jsonl"  # one JSON line per benchmark run
+    BENCHMARK_REGRESSION_PCT: float = 10.0  # slowdown per stage that fails `--compare`
+
     # External APIs
     BINANCE_API_URL: str = "https://api.binance.com"
     COINGECKO_API_URL: str = "https://api.coingecko.com/api/v3"
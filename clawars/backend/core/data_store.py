@@ -0,0 +1,406 @@
+"""
+CLAWARS Market Data Store
+Local chunked columnar bar history, keyed by asset and timeframe
+"""
+
+import csv
+import fcntl
+import json
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bars import Bars, MS_PER_HOUR, TimeLike, to_epoch_ms
+from .config import settings
+
+# Timeframe codes as used by strategies and the API
+TIMEFRAMES = {
+    "1m": 60_000,
+    "5m": 5 * 60_000,
+    "15m": 15 * 60_000,
+    "30m": 30 * 60_000,
+    "1H": MS_PER_HOUR,
+    "4H": 4 * MS_PER_HOUR,
+    "1D": 24 * MS_PER_HOUR,
+    "1W": 7 * 24 * MS_PER_HOUR,
+}
+
+# Bars per chunk; chunks are aligned to multiples of CHUNK_BARS * interval
+CHUNK_BARS = 50_000
+
+# Per-series revision counter and change log, bumped by every append
+_MANIFEST = ".manifest.json"
+_LOCK = ".lock"
+
+# Revisions whose earliest changed timestamp the manifest remembers
+_CHANGE_LOG = 256
+
+# Epoch units accepted by the importers
+EPOCH_UNITS = ("s", "ms", "us")
+
+# Column aliases accepted in CSV headers
+_CSV_ALIASES = {
+    "timestamp": ("timestamp", "time", "open_time", "date", "datetime"),
+    "open": ("open", "o"),
+    "high": ("high", "h"),
+    "low": ("low", "l"),
+    "close": ("close", "c"),
+    "volume": ("volume", "vol", "v"),
+}
+
+
+def timeframe_ms(timeframe: str) -> int:
+    try:
+        return TIMEFRAMES[timeframe]
+    except KeyError:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+
+
+def _normalize_epoch(values: np.ndarray, unit: Optional[str] = None) -> np.ndarray:
+    """
+    Epoch timestamps in `unit` ("s", "ms" or "us") as ms. Without a unit it
+    is read off the column's largest value: below 1e11 is seconds, below
+    1e14 milliseconds, otherwise microseconds. That holds for any data
+    reaching past March 1973; older series need an explicit unit.
+    """
+    if not len(values):
+        return values
+    if unit is None:
+        magnitude = np.abs(values).max()
+        unit = "s" if magnitude < 10 ** 11 else "ms" if magnitude < 10 ** 14 else "us"
+    if unit not in EPOCH_UNITS:
+        raise ValueError(f"Unknown epoch unit: {unit}")
+    if unit == "s":
+        return values * 1000
+    if unit == "us":
+        return values // 1000
+    return values
+
+
+class BarStore:
+    """
+    On-disk bar history under `root/<asset>/<timeframe>/<chunk>/`.
+
+    Each chunk is a Bars.save() directory of .npy columns covering a fixed
+    aligned time span, so a range query touches only the chunks it overlaps
+    and reads them memory-mapped. A query inside one chunk returns views
+    without copying; spanning chunks concatenates just the selected rows.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._chunks: Dict[Tuple[str, str], Tuple[str, List[int]]] = {}
+        self._open: Dict[str, Tuple[Tuple[str, int], Bars]] = {}
+
+    # Layout
+
+    def _series_path(self, asset: str, timeframe: str) -> str:
+        timeframe_ms(timeframe)
+        return os.path.join(self.root, asset.upper(), timeframe)
+
+    def _chunk_span(self, timeframe: str) -> int:
+        return timeframe_ms(timeframe) * CHUNK_BARS
+
+    def _read_manifest(self, series: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(series, _MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _series_state(self, asset: str, timeframe: str) -> Tuple[str, List[int]]:
+        """(revision, sorted chunk start times); chunk ids are cached per revision"""
+        path = self._series_path(asset, timeframe)
+        manifest = self._read_manifest(path)
+        if manifest is not None:
+            revision = f"{manifest['token']}.{manifest['revision']}"
+        else:
+            try:
+                # Written before manifests existed, or not yet at all
+                revision = f"mtime.{os.stat(path).st_mtime_ns}"
+            except FileNotFoundError:
+                return "", []
+        key = (asset.upper(), timeframe)
+        cached = self._chunks.get(key)
+        if cached is None or cached[0] != revision:
+            ids = sorted(int(name) for name in os.listdir(path) if not name.startswith("."))
+            cached = (revision, ids)
+            self._chunks[key] = cached
+        return cached
+
+    def _chunk_ids(self, asset: str, timeframe: str) -> List[int]:
+        return self._series_state(asset, timeframe)[1]
+
+    def dataset_id(self, asset: str, timeframe: str) -> str:
+        """
+        Identity of the series as currently stored: a token created with the
+        series and a counter every append bumps, so no two contents share it
+        """
+        revision = self._series_state(asset, timeframe)[0]
+        return f"{os.path.abspath(self.root)}:{asset.upper()}/{timeframe}@{revision}"
+
+    def first_change_since(self, asset: str, timeframe: str, dataset_id: str) -> Optional[int]:
+        """
+        Earliest timestamp written since the series was `dataset_id`, for
+        callers that can extend what they derived from the old rows; None
+        when unknown (another series, or older than the change log)
+        """
+        manifest = self._read_manifest(self._series_path(asset, timeframe))
+        prefix, _, revision = dataset_id.rpartition("@")
+        token, _, counter = revision.partition(".")
+        if (
+            manifest is None
+            or prefix != self.dataset_id(asset, timeframe).rpartition("@")[0]
+            or token != manifest["token"]
+            or not counter.isdigit()
+        ):
+            return None
+        since = int(counter)
+        changes = [first for rev, first in manifest["changes"] if rev > since]
+        if since > manifest["revision"] or len(changes) != manifest["revision"] - since:
+            return None
+        return min(changes, default=None)
+
+    def _load_chunk(self, path: str, revision: str) -> Bars:
+        """Memory-mapped chunk, reopened when the series revision or the chunk directory changes"""
+        stamp = (revision, os.stat(path).st_ino)
+        cached = self._open.get(path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, Bars.load(path, mmap=True))
+            self._open[path] = cached
+        return cached[1]
+
+    # Queries
+
+    def assets(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if not name.startswith("."))
+
+    def timeframes(self, asset: str) -> List[str]:
+        path = os.path.join(self.root, asset.upper())
+        if not os.path.isdir(path):
+            return []
+        return [tf for tf in TIMEFRAMES if os.path.isdir(os.path.join(path, tf))]
+
+    def has(self, asset: str, timeframe: str) -> bool:
+        return bool(self._chunk_ids(asset, timeframe))
+
+    def span(self, asset: str, timeframe: str) -> Optional[Tuple[int, int]]:
+        """(first, last) stored timestamp in epoch ms"""
+        revision, ids = self._series_state(asset, timeframe)
+        if not ids:
+            return None
+        series = self._series_path(asset, timeframe)
+        first = self._load_chunk(os.path.join(series, str(ids[0])), revision)
+        last = self._load_chunk(os.path.join(series, str(ids[-1])), revision)
+        return first.start, last.end
+
+    def bars(
+        self,
+        asset: str,
+        timeframe: str,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+    ) -> Bars:
+        """Bars with start <= timestamp <= end (inclusive, either bound optional)"""
+        parts = list(self._selected_chunks(asset, timeframe, start, end, keep_open=True))
+        if not parts:
+            return Bars.empty()
+        dataset = self.dataset_id(asset, timeframe)
+        if len(parts) == 1:
+            return Bars(*(getattr(parts[0], name) for name in Bars.COLUMNS), dataset=dataset)
+        return Bars(*(
+            np.concatenate([getattr(part, name) for part in parts])
+            for name in Bars.COLUMNS
+        ), dataset=dataset)
+
+    def iter_bars(
+        self,
+        asset: str,
+        timeframe: str,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+    ) -> Iterator[Bars]:
+        """
+        The bars of bars(...) as one Bars per stored chunk, for streaming
+        backtests. Chunks are mapped on demand and not kept open, so only
+        the chunk being consumed stays resident.
+        """
+        dataset = self.dataset_id(asset, timeframe)
+        for part in self._selected_chunks(asset, timeframe, start, end, keep_open=False):
+            part.dataset = dataset
+            yield part
+
+    def _selected_chunks(
+        self,
+        asset: str,
+        timeframe: str,
+        start: Optional[TimeLike],
+        end: Optional[TimeLike],
+        keep_open: bool,
+    ) -> Iterator[Bars]:
+        revision, ids = self._series_state(asset, timeframe)
+        span = self._chunk_span(timeframe)
+        lo = to_epoch_ms(start) if start is not None else None
+        hi = to_epoch_ms(end) if end is not None else None
+        series = self._series_path(asset, timeframe)
+        for chunk in ids:
+            if (hi is not None and chunk > hi) or (lo is not None and chunk + span <= lo):
+                continue
+            path = os.path.join(series, str(chunk))
+            loaded = self._load_chunk(path, revision) if keep_open else Bars.load(path, mmap=True)
+            selected = loaded.between(lo, hi)
+            if len(selected):
+                yield selected
+
+    # Writes
+
+    def append(self, asset: str, timeframe: str, bars: Bars) -> int:
+        """
+        Merge bars into the series. Rows are sorted by timestamp and
+        incoming rows replace stored rows with the same timestamp; only
+        the chunks the new rows fall into are rewritten. Returns the
+        number of rows written.
+        """
+        if not len(bars):
+            return 0
+        order = np.argsort(bars.timestamp, kind="stable")
+        ts = bars.timestamp[order]
+        # Within the batch, the last row for a timestamp wins
+        order = order[np.r_[ts[1:] != ts[:-1], True]]
+        bars = Bars(*(getattr(bars, name)[order] for name in Bars.COLUMNS))
+
+        series = self._series_path(asset, timeframe)
+        os.makedirs(series, exist_ok=True)
+        span = self._chunk_span(timeframe)
+        chunk_of = bars.timestamp // span * span
+        bounds = np.flatnonzero(np.diff(chunk_of)) + 1
+        with self._locked(series):
+            for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(bars)]):
+                self._write_chunk(series, int(chunk_of[lo]), bars[int(lo):int(hi)])
+            self._bump_revision(series, int(bars.timestamp[0]))
+        return len(bars)
+
+    @contextmanager
+    def _locked(self, series: str) -> Iterator[None]:
+        """One writer per series at a time, across processes"""
+        with open(os.path.join(series, _LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _bump_revision(self, series: str, first_changed: int) -> None:
+        manifest = self._read_manifest(series) or {"token": uuid.uuid4().hex, "revision": 0, "changes": []}
+        manifest["revision"] += 1
+        manifest["changes"] = (manifest["changes"] + [[manifest["revision"], first_changed]])[-_CHANGE_LOG:]
+        staging = os.path.join(series, f"{_MANIFEST}.{os.getpid()}.tmp")
+        with open(staging, "w") as f:
+            json.dump(manifest, f)
+        os.replace(staging, os.path.join(series, _MANIFEST))
+
+    def _write_chunk(self, series: str, chunk: int, new: Bars) -> None:
+        path = os.path.join(series, str(chunk))
+        if os.path.isdir(path):
+            old = Bars.load(path, mmap=False)
+            # Stored rows not overwritten by an incoming timestamp, then merge by time
+            keep = ~np.isin(old.timestamp, new.timestamp)
+            merged = {
+                name: np.concatenate([getattr(old, name)[keep], getattr(new, name)])
+                for name in Bars.COLUMNS
+            }
+            order = np.argsort(merged["timestamp"], kind="stable")
+            new = Bars(*(merged[name][order] for name in Bars.COLUMNS))
+
+        # Write beside the target and swap in, so readers never see a partial chunk
+        staging = os.path.join(series, f".{chunk}.{os.getpid()}.tmp")
+        retired = os.path.join(series, f".{chunk}.{os.getpid()}.old")
+        new.save(staging)
+        if os.path.isdir(path):
+            os.rename(path, retired)
+        os.rename(staging, path)
+        shutil.rmtree(retired, ignore_errors=True)
+        self._open.pop(path, None)
+
+    # Bulk import
+
+    def import_csv(self, asset: str, timeframe: str, path: str, unit: Optional[str] = None) -> int:
+        """
+        Import a CSV of bars. A header row naming the columns (timestamp/
+        open_time/date, open, high, low, close, volume) is optional; without
+        one the first six columns are read in kline order. Timestamps may be
+        epoch s/ms/us (`unit`, detected when omitted) or ISO-8601 dates.
+        """
+        with open(path, newline="") as f:
+            first = next(csv.reader(f), None)
+        if first is None:
+            return 0
+
+        header = None
+        try:
+            float(first[0])
+        except ValueError:
+            try:
+                datetime.fromisoformat(first[0])
+            except ValueError:
+                header = [name.strip().lower() for name in first]
+
+        if header is None:
+            columns = list(range(6))
+        else:
+            columns = []
+            for name, aliases in _CSV_ALIASES.items():
+                match = next((header.index(a) for a in aliases if a in header), None)
+                if match is None:
+                    raise ValueError(f"CSV {path} has no '{name}' column")
+                columns.append(match)
+
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            if header is not None:
+                next(reader)
+            rows = [[row[i] for i in columns] for row in reader if row]
+        return self.import_klines(asset, timeframe, rows, unit)
+
+    def import_klines(
+        self, asset: str, timeframe: str, klines: Iterable[Sequence], unit: Optional[str] = None
+    ) -> int:
+        """
+        Import exchange klines ([open_time, open, high, low, close, volume, ...],
+        as returned by the Binance REST API and its data dumps). Epoch open
+        times are in `unit` ("s", "ms" or "us"); see _normalize_epoch for
+        how it is detected when omitted.
+        """
+        if unit is not None and unit not in EPOCH_UNITS:
+            raise ValueError(f"Unknown epoch unit: {unit}")
+        rows = [row[:6] for row in klines]
+        if not rows:
+            return 0
+        times = [row[0] for row in rows]
+        try:
+            epochs = np.array([int(float(t)) for t in times], dtype=np.int64)
+        except ValueError:
+            timestamp = np.array([to_epoch_ms(datetime.fromisoformat(t)) for t in times], dtype=np.int64)
+        else:
+            timestamp = _normalize_epoch(epochs, unit)
+        values = np.array([row[1:6] for row in rows], dtype=np.float64)
+        bars = Bars(timestamp, *values.T)
+        return self.append(asset, timeframe, bars)
+
+
+_default_store: Optional[BarStore] = None
+
+
+def get_bar_store() -> BarStore:
+    """Process-wide store rooted at settings.MARKET_DATA_DIR"""
+    global _default_store
+    if _default_store is None:
+        _default_store = BarStore(settings.MARKET_DATA_DIR)
+    return _default_store
@@ -0,0 +1,160 @@
+"""
+CLAWARS Equity Curves
+Shape-preserving downsampling of bar-resolution equity for storage and the API
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets point selection over an evenly spaced x.
+
+    Keeps the first and last points and, from each interior bucket, the
+    point forming the largest triangle with the previous pick and the
+    next bucket's average. Returns sorted indices into `y`.
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1], dtype=np.int64)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # interior buckets
+    picks = np.empty(n_out, dtype=np.int64)
+    picks[0] = 0
+    picks[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+        # Average of the following bucket (last bucket looks at the final point)
+        if b + 2 < len(edges):
+            nxt_lo, nxt_hi = edges[b + 1], max(edges[b + 2], edges[b + 1] + 1)
+        else:
+            nxt_lo, nxt_hi = n - 1, n
+        avg_x = (nxt_lo + nxt_hi - 1) / 2.0
+        avg_y = y[nxt_lo:nxt_hi].mean()
+
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        picks[b + 1] = a
+    return picks
+
+
+def running_peak_index(equity: np.ndarray, initial: float) -> np.ndarray:
+    """For every bar, the index of the bar setting its running peak (-1 while the peak is `initial`)"""
+    peak = np.fmax.accumulate(np.fmax(equity, initial))
+    record = np.where(equity >= peak, np.arange(len(equity)), -1)
+    return np.maximum.accumulate(record) if len(record) else record
+
+
+def max_drawdown_index(equity: np.ndarray, initial: float) -> Optional[int]:
+    """Index of the bar with the deepest drawdown, or None if equity never drops"""
+    if not len(equity):
+        return None
+    peak = np.fmax.accumulate(np.fmax(equity, initial))
+    with np.errstate(invalid="ignore"):
+        drawdown = (equity - peak) / peak
+    if np.isnan(drawdown).all():
+        return None
+    trough = int(np.nanargmin(drawdown))
+    return trough if drawdown[trough] < 0 else None
+
+
+def downsample_equity(
+    timestamps: np.ndarray,
+    equity: np.ndarray,
+    max_points: int,
+    initial: float,
+) -> List[Dict]:
+    """
+    Equity curve points for storage: LTTB selection plus the max-drawdown
+    trough, each accompanied by the bar that set its running peak. Every
+    stored point therefore sees its true peak on replay, so drawdown and
+    total return recomputed from the stored points equal the bar-resolution
+    values. At most 2 * (max_points + 1) points are returned.
+    """
+    picks = lttb_indices(equity, max_points)
+    trough = max_drawdown_index(equity, initial)
+    if trough is not None:
+        picks = np.append(picks, trough)
+    peaks = running_peak_index(equity, initial)[picks]
+    picks = np.union1d(picks, peaks[peaks >= 0]).astype(np.int64)
+    ts = timestamps[picks].tolist()
+    values = equity[picks].tolist()
+    return [{"timestamp": t, "equity": v} for t, v in zip(ts, values)]
+
+
+class EquityCurveStream:
+    """
+    downsample_equity over equity that arrives in consecutive blocks of
+    any size, holding at most about 50 * max_points bars and 8 * max_points
+    reduced points.
+
+    Bars are reduced in blocks, keeping each block's trough and the bar
+    that set the running peak at its end. The stored points therefore keep
+    downsample_equity's guarantee: drawdown and total return replayed from
+    them equal the bar-resolution values. The point selection differs from
+    a single pass over the whole curve.
+    """
+
+    def __init__(self, max_points: int, initial: float):
+        self.max_points = max_points
+        self.initial = initial
+        self.block_bars = 50 * max(max_points, 1)
+        self._peak = initial
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []  # bars not yet reduced
+        self._pending_bars = 0
+        self._timestamps: List[np.ndarray] = []
+        self._equity: List[np.ndarray] = []
+        self._size = 0
+
+    def add(self, timestamps: np.ndarray, equity: np.ndarray) -> None:
+        if not len(equity):
+            return
+        self._pending.append((timestamps, equity))
+        self._pending_bars += len(equity)
+        if self._pending_bars >= self.block_bars:
+            self._reduce()
+
+    def _reduce(self) -> None:
+        if not self._pending:
+            return
+        timestamps = np.concatenate([t for t, _ in self._pending])
+        equity = np.concatenate([e for _, e in self._pending])
+        self._pending, self._pending_bars = [], 0
+        picks = lttb_indices(equity, self.max_points)
+        trough = max_drawdown_index(equity, self._peak)
+        peaks = running_peak_index(equity, self._peak)
+        extra = [peaks[-1]] if peaks[-1] >= 0 else []
+        if trough is not None:
+            extra.append(trough)
+        picks = np.union1d(np.append(picks, extra), peaks[picks][peaks[picks] >= 0]).astype(np.int64)
+        self._peak = float(np.fmax(np.fmax.accumulate(equity)[-1], self._peak))
+        self._timestamps.append(timestamps[picks])
+        self._equity.append(equity[picks])
+        self._size += len(picks)
+        if self._size > 8 * (self.max_points + 1):
+            self._compact(2 * self.max_points)
+
+    def _compact(self, max_points: int) -> None:
+        timestamps = np.concatenate(self._timestamps)
+        equity = np.concatenate(self._equity)
+        points = downsample_equity(timestamps, equity, max_points, self.initial)
+        self._timestamps = [np.array([p["timestamp"] for p in points], dtype=np.int64)]
+        self._equity = [np.array([p["equity"] for p in points])]
+        self._size = len(points)
+
+    def points(self) -> List[Dict]:
+        """The curve so far, in downsample_equity's format"""
+        self._reduce()
+        if not self._size:
+            return []
+        self._compact(self.max_points)
+        return [
+            {"timestamp": t, "equity": v}
+            for t, v in zip(self._timestamps[0].tolist(), self._equity[0].tolist())
+        ]
@@ -0,0 +1,178 @@
+"""
+CLAWARS Exit Stage
+Vectorized stop-loss, take-profit and time-stop fills from bar highs and lows
+"""
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .trade_log import EXIT_REASONS
+
+# First scan window after an entry; doubled until the position exits
+_SCAN_BARS = 64
+
+_STOP_LOSS = EXIT_REASONS.index("stop_loss")
+_TAKE_PROFIT = EXIT_REASONS.index("take_profit")
+_TIME_STOP = EXIT_REASONS.index("time_stop")
+
+
+class ExitStage:
+    """
+    Protective exits for the positions of one backtest.
+
+    A position opened at an entry bar's close is watched from the next bar
+    on: the stop trades when a bar's low (high, for shorts) reaches it, the
+    target when its high (low) does, both filled at the level or at the
+    open if the bar gapped through it. A bar that trades both is assumed to
+    hit the stop first. Levels are `stop_loss` / `take_profit` fractions of
+    the entry close unless the strategy supplies its own (Pine
+    strategy.exit). The time stop closes the position at the first bar
+    close `time_stop_ms` or more after entry.
+
+    Bars are scanned as array windows that double from _SCAN_BARS, so
+    finding an exit costs array operations over the holding period only.
+    State machines call `exit` for each entry they take; the fills they
+    cause are recorded per bar for the trade simulation. Record a fresh
+    stage per backtest. Accepts Bars or a Panel (one row per asset).
+    """
+
+    def __init__(
+        self,
+        bars,
+        stop_loss: Optional[float] = None,
+        take_profit: Optional[float] = None,
+        time_stop_ms: Optional[int] = None,
+    ):
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.time_stop_ms = time_stop_ms
+        self.timestamp = bars.timestamp
+        self.open = np.atleast_2d(bars.open)
+        self.high = np.atleast_2d(bars.high)
+        self.low = np.atleast_2d(bars.low)
+        self.close = np.atleast_2d(bars.close)
+        self.price = np.full(self.close.shape, np.nan)  # fill price, NaN = the bar close
+        self.reason = np.zeros(self.close.shape, dtype=np.int8)  # index into EXIT_REASONS
+
+    @property
+    def active(self) -> bool:
+        """Whether any rule applies without strategy-supplied levels"""
+        return any(rule is not None for rule in (self.stop_loss, self.take_profit, self.time_stop_ms))
+
+    def exit(
+        self,
+        entry: int,
+        direction: int,
+        signal_exit: Optional[int],
+        row: int = 0,
+        stop: float = np.nan,
+        limit: float = np.nan,
+    ) -> Optional[int]:
+        """
+        Bar at whose close (or intrabar fill) the position opened at `entry`
+        exits, given the strategy's own exit bar (None if it never exits).
+        `stop` / `limit` override the percentage levels when not NaN.
+        """
+        reference = float(self.close[row, entry])
+        if math.isnan(stop) and self.stop_loss is not None:
+            stop = reference * (1 - direction * self.stop_loss)
+        if math.isnan(limit) and self.take_profit is not None:
+            limit = reference * (1 + direction * self.take_profit)
+
+        n = self.close.shape[1]
+        last = n - 1 if signal_exit is None else signal_exit
+        timed = None
+        if self.time_stop_ms is not None:
+            # Never the entry bar itself, whose signal slot holds the entry
+            timed = max(int(self.timestamp.searchsorted(self.timestamp[entry] + self.time_stop_ms)), entry + 1)
+            if timed <= last:
+                last = timed
+            else:
+                timed = None
+
+        if not (math.isnan(stop) and math.isnan(limit)):
+            hit = self._first_touch(row, entry + 1, last + 1, direction, stop, limit)
+            if hit is not None:
+                return hit
+        if timed is not None:
+            self.price[row, timed] = np.nan
+            self.reason[row, timed] = _TIME_STOP
+            return timed
+        return signal_exit
+
+    def _first_touch(
+        self, row: int, start: int, stop_at: int, direction: int, stop: float, limit: float
+    ) -> Optional[int]:
+        adverse, favorable = (self.low[row], self.high[row]) if direction > 0 else (self.high[row], self.low[row])
+        width = _SCAN_BARS
+        while start < stop_at:
+            end = min(start + width, stop_at)
+            # NaN levels never compare true, so a missing stop or target is skipped
+            if direction > 0:
+                touched = (adverse[start:end] <= stop) | (favorable[start:end] >= limit)
+            else:
+                touched = (adverse[start:end] >= stop) | (favorable[start:end] <= limit)
+            k = int(touched.argmax())
+            if touched[k]:
+                bar = start + k
+                self._record(row, bar, direction, stop, limit)
+                return bar
+            start = end
+            width *= 2
+        return None
+
+    def _record(self, row: int, bar: int, direction: int, stop: float, limit: float) -> None:
+        opened = self.open[row, bar]
+        adverse = self.low[row, bar] if direction > 0 else self.high[row, bar]
+        if direction * (opened - stop) <= 0:
+            price, reason = opened, _STOP_LOSS  # gapped through the stop
+        elif direction * (opened - limit) >= 0:
+            price, reason = opened, _TAKE_PROFIT  # gapped through the target
+        elif direction * (adverse - stop) <= 0:
+            price, reason = stop, _STOP_LOSS
+        else:
+            price, reason = limit, _TAKE_PROFIT
+        self.price[row, bar] = price
+        self.reason[row, bar] = reason
+
+    def fill(self, bar: int, row: int = 0) -> Tuple[float, str]:
+        """Raw exit price and reason of a position closed at `bar`"""
+        price = self.price[row, bar]
+        if np.isnan(price):
+            price = self.close[row, bar]
+        return float(price), EXIT_REASONS[self.reason[row, bar]]
+
+    def apply(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Impose the stage on codes from a state machine that did not consult
+        it (Python strategies): positions close at the earlier of their
+        signal exit and a protective exit. Returns new codes.
+        """
+        from .backtest_engine import SIGNAL_CODES, SignalType
+
+        close_code = SIGNAL_CODES[SignalType.CLOSE]
+        long_code = SIGNAL_CODES[SignalType.LONG]
+        result = np.array(codes, dtype=np.int8)
+        rows = np.atleast_2d(result)
+        for r, row in enumerate(rows):
+            entries = np.flatnonzero((row != 0) & (row != close_code))
+            closes = np.flatnonzero(row == close_code)
+            out = np.zeros_like(row)
+            i = 0
+            while True:
+                k = entries.searchsorted(i)
+                if k == len(entries):
+                    break
+                entry = int(entries[k])
+                out[entry] = row[entry]
+                j = closes.searchsorted(entry + 1)
+                signal_exit = int(closes[j]) if j < len(closes) else None
+                exit_bar = self.exit(entry, 1 if row[entry] == long_code else -1, signal_exit, r)
+                if exit_bar is None:
+                    break
+                out[exit_bar] = close_code
+                i = exit_bar + 1
+            rows[r] = out
+        return result
@@ -0,0 +1,290 @@
+"""
+CLAWARS Indicator Cache
+Derived series shared across backtests over the same dataset
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars
+from .config import settings
+
+# (first timestamp, last timestamp, bar count) of a cached window
+Window = Tuple[int, int, int]
+
+
+def indicator_key(name: str, params: Tuple) -> str:
+    """Stable digest of an indicator and its parameters"""
+    return hashlib.sha256(repr((name, params)).encode("utf-8")).hexdigest()
+
+
+class IndicatorCache:
+    """
+    Series computed over a dataset window, keyed by (dataset id, indicator,
+    parameters) and stored read-only.
+
+    A request over the exact cached window returns the stored array. When
+    the indicator has a finite `history` (bars of lookback its value at a
+    bar depends on), a request inside a larger cached window is answered by
+    slicing: bars past the first `history` are taken from the cache and the
+    warm-up prefix is recomputed over the request itself, so the result is
+    what computing over the request would give. Indicators with unbounded
+    history (recursive averages, cumulative sums) only hit on exact windows.
+
+    The memory tier is an LRU bounded by `max_bytes`. With a `root`, series
+    are also written as .npy files and read back memory-mapped, so engines
+    in every worker process on the host share one copy through the page
+    cache; the directory is pruned oldest-first past `max_disk_bytes`.
+    Bars without a dataset id are never cached.
+    """
+
+    def __init__(self, max_bytes: int, root: Optional[str] = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.root = root
+        self.max_disk_bytes = max_disk_bytes
+        self._entries: "OrderedDict[Tuple[str, str, Window], Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._windows: Dict[Tuple[str, str], List[Window]] = {}
+        self._bytes = 0
+        self._written = 0
+        self.hits = 0
+        self.slices = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def series(
+        self,
+        bars: Bars,
+        name: str,
+        params: Tuple,
+        compute: Callable[[Bars], Any],
+        history: Optional[int] = 0,
+    ):
+        """
+        `compute(bars)` over `bars`, from the cache when possible. `compute`
+        must be causal (a bar's value depends only on bars up to it).
+        """
+        dataset = bars.dataset
+        if dataset is None or not len(bars):
+            return compute(bars)
+        key = indicator_key(name, params)
+        timestamp = bars.timestamp
+        request = (int(timestamp[0]), int(timestamp[-1]), len(bars))
+
+        found = self._find(dataset, key, request, history)
+        if found is not None:
+            window_ts, values = found
+            if request == self._window_of(window_ts):
+                self.hits += 1
+                return values
+            offset = int(np.searchsorted(window_ts, request[0]))
+            self.slices += 1
+            return self._slice(bars, compute, values[offset:offset + request[2]], history)
+
+        self.misses += 1
+        values = compute(bars)
+        if isinstance(values, np.ndarray) and values.shape == (len(bars),):
+            values = values.view()
+            values.flags.writeable = False
+            self._remember(dataset, key, request, timestamp, values)
+            self._write(dataset, key, request, timestamp, values)
+        return values
+
+    @staticmethod
+    def _window_of(timestamp: np.ndarray) -> Window:
+        return int(timestamp[0]), int(timestamp[-1]), len(timestamp)
+
+    @staticmethod
+    def _contains(window: Window, request: Window, window_ts: np.ndarray) -> bool:
+        if not (window[0] <= request[0] and request[1] <= window[1] and request[2] <= window[2]):
+            return False
+        # Same dataset and sorted timestamps: a contiguous run iff both ends line up
+        offset = int(np.searchsorted(window_ts, request[0]))
+        last = offset + request[2] - 1
+        return (
+            last < len(window_ts)
+            and window_ts[offset] == request[0]
+            and window_ts[last] == request[1]
+        )
+
+    @staticmethod
+    def _slice(bars: Bars, compute: Callable, cached: np.ndarray, history: int) -> np.ndarray:
+        if history <= 0:
+            return cached
+        warmup = min(history, len(bars))
+        prefix = np.asarray(compute(bars[:warmup]))
+        return np.concatenate([prefix[:warmup], cached[warmup:]])
+
+    def _find(
+        self, dataset: str, key: str, request: Window, history: Optional[int]
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        # Memory tier: exact window first, then the smallest containing one
+        windows = self._windows.get((dataset, key), [])
+        if request in windows:
+            self._entries.move_to_end((dataset, key, request))
+            return self._entries[(dataset, key, request)]
+        if history is not None:
+            for window in sorted(windows, key=lambda w: w[2]):
+                entry = self._entries[(dataset, key, window)]
+                if self._contains(window, request, entry[0]):
+                    self._entries.move_to_end((dataset, key, window))
+                    return entry
+
+        found = self._read(dataset, key, request, history)
+        if found is not None:
+            self.disk_hits += 1
+            window_ts, values = found
+            self._remember(dataset, key, self._window_of(window_ts), window_ts, values)
+        return found
+
+    def _remember(
+        self, dataset: str, key: str, window: Window, timestamp: np.ndarray, values: np.ndarray
+    ) -> None:
+        if values.nbytes > self.max_bytes:
+            return
+        self._entries[(dataset, key, window)] = (timestamp, values)
+        self._windows.setdefault((dataset, key), []).append(window)
+        self._bytes += values.nbytes
+        while self._bytes > self.max_bytes:
+            (old_dataset, old_key, old_window), (_, old_values) = self._entries.popitem(last=False)
+            self._windows[(old_dataset, old_key)].remove(old_window)
+            if not self._windows[(old_dataset, old_key)]:
+                del self._windows[(old_dataset, old_key)]
+            self._bytes -= old_values.nbytes
+
+    # Disk tier: <root>/<dataset digest>/<first>_<last>_<count>/{timestamp,<key>}.npy
+
+    def _dataset_path(self, dataset: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(dataset.encode("utf-8")).hexdigest()[:32])
+
+    def _read(
+        self, dataset: str, key: str, request: Window, history: Optional[int]
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        if not self.root:
+            return None
+        path = self._dataset_path(dataset)
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:
+            return None
+        windows = []
+        for name in names:
+            try:
+                window = tuple(int(part) for part in name.split("_"))
+            except ValueError:
+                continue
+            if window == request or (history is not None and len(window) == 3
+                                     and window[0] <= request[0] and request[1] <= window[1]):
+                windows.append(window)
+        for window in sorted(windows, key=lambda w: (w != request, w[2])):
+            directory = os.path.join(path, "_".join(str(part) for part in window))
+            try:
+                values = np.load(os.path.join(directory, f"{key}.npy"), mmap_mode="r")
+                window_ts = np.load(os.path.join(directory, "timestamp.npy"), mmap_mode="r")
+            except (OSError, ValueError):
+                continue  # absent, pruned or partially written
+            if window == request or self._contains(window, request, window_ts):
+                return window_ts, values
+        return None
+
+    def _write(
+        self, dataset: str, key: str, window: Window, timestamp: np.ndarray, values: np.ndarray
+    ) -> None:
+        if not self.root or values.dtype == object:
+            return
+        directory = os.path.join(self._dataset_path(dataset), "_".join(str(part) for part in window))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if not os.path.exists(os.path.join(directory, "timestamp.npy")):
+                self._save(directory, "timestamp", timestamp)
+            self._save(directory, key, values)
+        except OSError:
+            return  # a full or read-only cache directory only costs recomputation
+        self._written += values.nbytes
+        if self.max_disk_bytes and self._written > self.max_disk_bytes // 8:
+            self._written = 0
+            self.prune()
+
+    @staticmethod
+    def _save(directory: str, name: str, array: np.ndarray) -> None:
+        # Written beside the target and renamed in, so readers never map a partial file
+        staging = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        with open(staging, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(staging, os.path.join(directory, f"{name}.npy"))
+
+    def prune(self) -> None:
+        """Delete the least recently written series until the disk tier fits"""
+        if not self.root or not os.path.isdir(self.root):
+            return
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((info.st_mtime_ns, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            if os.path.basename(path) == "timestamp.npy":
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            directory = os.path.dirname(path)
+            if os.listdir(directory) == ["timestamp.npy"]:
+                total -= os.path.getsize(os.path.join(directory, "timestamp.npy"))
+                try:
+                    os.remove(os.path.join(directory, "timestamp.npy"))
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    # Metrics
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.slices + self.misses
+        return (self.hits + self.slices) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "slices": self.slices,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def clear(self) -> None:
+        """Drop the memory tier and reset counters (disk files are kept)"""
+        self._entries.clear()
+        self._windows.clear()
+        self._bytes = 0
+        self.hits = self.slices = self.disk_hits = self.misses = 0
+
+
+_default_cache: Optional[IndicatorCache] = None
+
+
+def get_indicator_cache() -> IndicatorCache:
+    """Process-wide cache configured by settings.INDICATOR_CACHE_*"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IndicatorCache(
+            settings.INDICATOR_CACHE_MB * 1024 * 1024,
+            settings.INDICATOR_CACHE_DIR,
+            settings.INDICATOR_CACHE_DISK_MB * 1024 * 1024,
+        )
+    return _default_cache
@@ -0,0 +1,224 @@
+"""
+CLAWARS Streaming Metrics
+O(1)-per-update performance metrics for backtests and live portfolios
+"""
+
+import math
+from typing import Dict, Optional
+
+import numpy as np
+
+SQRT_252 = 252 ** 0.5
+
+# Every finite double is an integer multiple of 2**-1074
+_SCALE_BITS = 1074
+_SQRT_BIT_WIDTH = 2 * 53 + 3
+
+
+def _scaled(x: float) -> int:
+    """x * 2**1074 as an exact integer"""
+    numerator, denominator = x.as_integer_ratio()
+    return numerator << (_SCALE_BITS - denominator.bit_length() + 1)
+
+
+def _sqrt_of_ratio(n: int, m: int) -> float:
+    """Correctly rounded float sqrt(n / m) for non-negative integers"""
+    def rto(n: int, m: int) -> int:
+        # Integer square root of n/m, round-to-odd
+        a = math.isqrt(n // m)
+        return a | (a * a * m != n)
+
+    q = (n.bit_length() - m.bit_length() - _SQRT_BIT_WIDTH) // 2
+    if q >= 0:
+        return (rto(n, m << 2 * q) << q) / 1
+    return rto(n << -2 * q, m) / (1 << -q)
+
+
+class ExactMoments:
+    """
+    Running count, mean and sample standard deviation computed from exact
+    integer sums. Results are bit-identical to statistics.mean/stdev over
+    the same values, at O(1) per update.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sx = 0   # sum of x, scaled by 2**1074
+        self.sxx = 0  # sum of x*x, scaled by 2**2148
+        self.nonfinite: Optional[float] = None  # nan/inf contaminate like in statistics
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        if not math.isfinite(x):
+            self.nonfinite = x if self.nonfinite is None else self.nonfinite + x
+            return
+        scaled = _scaled(x)
+        self.sx += scaled
+        self.sxx += scaled * scaled
+
+    @property
+    def mean(self) -> float:
+        if self.nonfinite is not None:
+            return self.nonfinite
+        return self.sx / (self.count << _SCALE_BITS)
+
+    @property
+    def stdev(self) -> float:
+        """Sample standard deviation (requires count >= 2)"""
+        if self.nonfinite is not None:
+            return math.nan
+        n = self.count
+        ssd = n * self.sxx - self.sx * self.sx  # n * sum of squared deviations, scaled
+        return _sqrt_of_ratio(ssd, (n * (n - 1)) << (2 * _SCALE_BITS))
+
+    def get_state(self) -> Dict:
+        return {"count": self.count, "sx": self.sx, "sxx": self.sxx, "nonfinite": self.nonfinite}
+
+    def set_state(self, state: Dict) -> None:
+        self.count = state["count"]
+        self.sx = state["sx"]
+        self.sxx = state["sxx"]
+        self.nonfinite = state["nonfinite"]
+
+
+class MetricsAccumulator:
+    """
+    Backtest metrics updated per closed trade and per equity point.
+
+    Produces the same numbers as the batch formulas in
+    BacktestEngine._calculate_metrics; the result is available at any
+    moment, so live portfolios can keep one of these alive indefinitely.
+    """
+
+    def __init__(self, initial_capital: float):
+        self.initial_capital = initial_capital
+        self.total_trades = 0
+        self.winning_trades = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.net_pnl = 0.0
+        self.returns = ExactMoments()           # non-zero pnl_pct
+        self.downside_returns = ExactMoments()  # negative pnl_pct
+        self.peak = initial_capital
+        self.max_drawdown = 0.0
+        self.last_equity: Optional[float] = None
+
+    def add_trade(self, pnl: float, pnl_pct: float) -> None:
+        """Account one closed trade"""
+        self.total_trades += 1
+        if pnl:
+            if pnl > 0:
+                self.winning_trades += 1
+                self.gross_profit += pnl
+            elif pnl <= 0:
+                self.gross_loss += pnl
+            self.net_pnl += pnl
+        if pnl_pct:
+            self.returns.add(pnl_pct)
+            if pnl_pct < 0:
+                self.downside_returns.add(pnl_pct)
+
+    def add_equity(self, equity: float) -> None:
+        """Account one equity-curve point"""
+        if equity > self.peak:
+            self.peak = equity
+        drawdown = (equity - self.peak) / self.peak * 100
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        self.last_equity = equity
+
+    def add_equity_array(self, equity: np.ndarray) -> None:
+        """Account a block of consecutive equity points in one vectorized step"""
+        if not len(equity):
+            return
+        # fmax/nanmin skip NaN points exactly as the comparisons in add_equity do
+        peak = np.fmax.accumulate(np.fmax(equity, self.peak))
+        with np.errstate(invalid="ignore"):
+            drawdown = (equity - peak) / peak * 100
+        if not np.isnan(drawdown).all():
+            self.max_drawdown = min(self.max_drawdown, float(np.nanmin(drawdown)))
+        self.peak = float(peak[-1])
+        self.last_equity = float(equity[-1])
+
+    def result(self) -> Dict[str, float]:
+        """Current metrics, keyed as BacktestResult.summary()"""
+        if not self.total_trades:
+            return {
+                "total_trades": 0,
+                "winning_trades": 0,
+                "losing_trades": 0,
+                "win_rate": 0,
+                "profit_factor": 0,
+                "sharpe_ratio": 0,
+                "sortino_ratio": 0,
+                "max_drawdown": 0,
+                "avg_trade_pnl": 0,
+                "total_return": 0,
+                "composite_score": 0,
+            }
+
+        total = self.total_trades
+        win_rate = self.winning_trades / total * 100
+        gross_loss = abs(self.gross_loss)
+        profit_factor = self.gross_profit / gross_loss if gross_loss > 0 else 0
+        avg_trade_pnl = self.net_pnl / total
+
+        final_equity = self.last_equity if self.last_equity is not None else self.initial_capital
+        total_return = (final_equity - self.initial_capital) / self.initial_capital * 100
+
+        if self.returns.count > 1:
+            avg_return = self.returns.mean
+            std_return = self.returns.stdev
+            sharpe = avg_return / std_return * SQRT_252 if std_return > 0 else 0
+            downside_std = self.downside_returns.stdev if self.downside_returns.count > 1 else 1
+            sortino = avg_return / downside_std * SQRT_252 if downside_std > 0 else 0
+        else:
+            sharpe = 0
+            sortino = 0
+
+        # Composite score (Clawars ranking), clamped to 0-100
+        score = (
+            min(sharpe, 5) * 0.4 +
+            min(profit_factor, 3) * 0.3 +
+            win_rate * 0.2 -
+            abs(self.max_drawdown) * 0.1
+        )
+        score = max(0, min(100, score))
+
+        return {
+            "total_trades": total,
+            "winning_trades": self.winning_trades,
+            "losing_trades": total - self.winning_trades,
+            "win_rate": win_rate,
+            "profit_factor": profit_factor,
+            "sharpe_ratio": sharpe,
+            "sortino_ratio": sortino,
+            "max_drawdown": self.max_drawdown,
+            "avg_trade_pnl": avg_trade_pnl,
+            "total_return": total_return,
+            "composite_score": round(score, 2),
+        }
+
+    def get_state(self) -> Dict:
+        state = {
+            key: getattr(self, key)
+            for key in (
+                "initial_capital", "total_trades", "winning_trades", "gross_profit",
+                "gross_loss", "net_pnl", "peak", "max_drawdown", "last_equity",
+            )
+        }
+        state["returns"] = self.returns.get_state()
+        state["downside_returns"] = self.downside_returns.get_state()
+        return state
+
+    def set_state(self, state: Dict) -> None:
+        for key, value in state.items():
+            if key in ("returns", "downside_returns"):
+                getattr(self, key).set_state(value)
+            else:
+                setattr(self, key, value)
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "MetricsAccumulator":
+        obj = cls(state["initial_capital"])
+        obj.set_state(state)
+        return obj
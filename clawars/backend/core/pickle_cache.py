@@ -0,0 +1,197 @@
+"""
+CLAWARS Pickle Cache
+Per-process LRU over signed pickles in a directory shared by a host's workers
+"""
+
+import hashlib
+import hmac
+import os
+import pickle
+import shutil
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+_DIGEST = hashlib.sha256().digest_size
+
+
+class PickleCache:
+    """
+    Two-tier cache base: a per-process LRU of `max_entries` values, over
+    pickled entries under `root/v<version>/<key[:2]>/<key>.pkl` that every
+    worker sharing the directory can read. Entries are written beside their
+    target and renamed in; unreadable ones count as misses and are
+    replaced by the caller's next write.
+
+    Like the indicator cache, the disk tier is pruned as it is written:
+    directories of other versions (which no key of this build can reach)
+    go first, then the least recently written entries past
+    `max_disk_bytes` (0 keeps them all).
+
+    Unpickling runs arbitrary code, so each file carries an HMAC-SHA256 of
+    its payload keyed by `secret` (default settings.SECRET_KEY), checked
+    before anything is loaded. Only processes holding the secret can plant
+    an entry; anyone else with write access to the directory can at most
+    delete entries or force recomputation.
+
+    Subclasses turn values into picklable entries with `_encode` and back
+    with `_decode` (None rejects the entry). Cached values are shared, so
+    callers must not mutate them.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        max_entries: int = 128,
+        secret: Optional[str] = None,
+        version: str = "0",
+        max_disk_bytes: int = 0,
+    ):
+        self.root = root
+        self.max_entries = max_entries
+        self.version = version
+        self.max_disk_bytes = max_disk_bytes
+        self._written: Optional[int] = None  # bytes since the last prune; None until the first write
+        self._secret = (settings.SECRET_KEY if secret is None else secret).encode("utf-8")
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _fetch(self, key: str) -> Optional[Any]:
+        """The value for `key` from either tier, counting the lookup as a hit or miss"""
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+        value = self._read(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.disk_hits += 1
+        self._remember(key, value)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        self._remember(key, value)
+        self._write(key, value)
+
+    def _remember(self, key: str, value: Any) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _encode(self, value: Any) -> Any:
+        return value
+
+    def _decode(self, entry: Any) -> Optional[Any]:
+        return entry
+
+    # Disk tier
+
+    def _version_path(self) -> str:
+        return os.path.join(self.root, f"v{self.version}")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._version_path(), key[:2], f"{key}.pkl")
+
+    def _sign(self, payload: bytes) -> bytes:
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()
+
+    def _read(self, key: str) -> Optional[Any]:
+        if not self.root:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        signature, payload = data[:_DIGEST], data[_DIGEST:]
+        if not hmac.compare_digest(signature, self._sign(payload)):
+            return None  # truncated, from another secret or tampered with
+        try:
+            return self._decode(pickle.loads(payload))
+        except Exception:
+            return None  # from an incompatible build: recompute
+
+    def _write(self, key: str, value: Any) -> None:
+        if not self.root:
+            return
+        payload = pickle.dumps(self._encode(value), protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(key)
+        staging = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(staging, "wb") as f:
+                f.write(self._sign(payload))
+                f.write(payload)
+            os.replace(staging, path)
+        except OSError:
+            # A read-only or full cache directory only costs recomputation
+            try:
+                os.remove(staging)
+            except OSError:
+                pass
+            return
+        if self._written is None or (
+            self.max_disk_bytes and self._written + len(payload) > self.max_disk_bytes // 8
+        ):
+            self._written = 0
+            self.prune()
+        else:
+            self._written += len(payload)
+
+    def prune(self) -> None:
+        """Delete other versions' entries, then the least recently written until the disk tier fits"""
+        if not self.root or not os.path.isdir(self.root):
+            return
+        current = os.path.basename(self._version_path())
+        for name in os.listdir(self.root):
+            # Version directories, and two-hex-digit shards from before versioning
+            stale = name.startswith("v") or (len(name) == 2 and all(c in "0123456789abcdef" for c in name))
+            if stale and name != current:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        if not self.max_disk_bytes:
+            return
+        files = []
+        for directory, _, names in os.walk(self._version_path()):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    info = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((info.st_mtime_ns, info.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    # Metrics
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+        }
+
+    def clear(self) -> None:
+        """Drop the memory tier and reset counters (disk entries are kept)"""
+        self._memory.clear()
+        self.memory_hits = self.disk_hits = self.misses = 0
@@ -0,0 +1,1294 @@
+"""
+CLAWARS Pine Script Compiler
+Lowers parsed Pine into a graph of vectorized series operations
+"""
+
+import hashlib
+import itertools
+import math
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars, MS_PER_HOUR
+from .pine_parser import (
+    Assign, Binary, Bool, Call, ExprStmt, FuncDef, If, Index, Na, Name, Num,
+    PineCompileError, PineSyntaxError, Script, Str, Ternary, TupleExpr, Unary, parse,
+)
+from .resample import WEEK_OFFSET_MS, resample
+
+if TYPE_CHECKING:
+    from .exits import ExitStage
+    from .indicator_cache import IndicatorCache
+
+# Bump when lowering changes so cached artifacts (core.strategy_cache) are rebuilt
+COMPILER_VERSION = "3"
+
+# Rows of sliding windows reduced per step, bounding temporary size
+_WINDOW_BLOCK = 16384
+
+# Bars per block of a recursive average; the decay kernel is this square
+_RECURRENCE_BLOCK = 64
+
+_MS_PER_DAY = 24 * MS_PER_HOUR
+
+# Calls made for their side effects on the chart; they never affect orders
+_DISPLAY_CALLS = ("plot", "plotshape", "plotchar", "plotarrow", "plotbar", "plotcandle",
+                  "hline", "fill", "bgcolor", "barcolor", "alert", "alertcondition")
+_DISPLAY_NAMESPACES = ("label.", "line.", "box.", "table.", "linefill.", "polyline.", "log.")
+
+# Strategy state visible to the script; evaluated once per position state
+_STATE = {
+    "strategy.position_size": "position",
+    "strategy.opentrades": "position",
+    "strategy.closedtrades": "closed",
+}
+_UNSUPPORTED_STATE = ("strategy.equity", "strategy.netprofit", "strategy.openprofit",
+                      "strategy.position_avg_price", "strategy.wintrades", "strategy.losstrades",
+                      "strategy.grossprofit", "strategy.grossloss", "strategy.max_drawdown")
+
+_SOURCES = ("open", "high", "low", "close", "volume", "time", "hl2", "hlc3", "ohlc4", "hlcc4",
+            "bar_index", "barstate.isfirst", "barstate.islast", "barstate.isconfirmed",
+            "barstate.ishistory", "barstate.isrealtime", "barstate.isnew")
+_TIME_PARTS = ("hour", "minute", "second", "dayofweek", "dayofmonth", "month", "year", "weekofyear")
+_UTC_NAMES = ("UTC", "GMT", "Etc/UTC", "UTC+0", "GMT+0")
+
+
+@dataclass(eq=False)
+class Node:
+    """One vectorized operation; `args` are child nodes, `params` static values"""
+
+    op: str
+    args: Tuple["Node", ...] = ()
+    params: Tuple = ()
+    deps: FrozenSet[str] = frozenset()  # strategy state the value depends on
+    line: int = 0
+    id: int = field(default_factory=itertools.count().__next__)
+
+    @property
+    def is_const(self) -> bool:
+        return self.op == "const"
+
+    @property
+    def value(self):
+        return self.params[0]
+
+
+def _const(value, line: int = 0) -> Node:
+    return Node("const", params=(value,), line=line)
+
+
+def _node(op: str, args=(), params=(), line: int = 0) -> Node:
+    deps = frozenset().union(*(a.deps for a in args)) if args else frozenset()
+    return Node(op, tuple(args), tuple(params), deps, line)
+
+
+@dataclass
+class PineInput:
+    name: str
+    kind: str  # int, float, bool, string, source
+    default: Any
+    value: Any
+    title: Optional[str] = None
+    minval: Optional[float] = None
+    maxval: Optional[float] = None
+    step: Optional[float] = None
+
+
+@dataclass
+class Bracket:
+    """strategy.exit price levels, read at the entry bar and applied by core.exits.ExitStage"""
+
+    entry_id: Optional[str]
+    direction: Optional[str]
+    stop: Optional[Node]
+    limit: Optional[Node]
+    guard: Node
+
+
+# ---------------------------------------------------------------------------
+# Vectorized primitives
+
+def _series(x, shape: Tuple[int, ...]) -> np.ndarray:
+    if isinstance(x, np.ndarray):
+        return x.astype(np.float64, copy=False)
+    return np.full(shape, np.nan if x is None else float(x))
+
+
+def _truth(x):
+    """Pine bool coercion: na and 0 are false"""
+    if isinstance(x, np.ndarray):
+        if x.dtype == bool:
+            return x
+        return np.nan_to_num(x, nan=0.0) != 0
+    if x is None or (isinstance(x, float) and math.isnan(x)):
+        return False
+    return bool(x)
+
+
+def _block_rows(shape: Tuple[int, ...]) -> int:
+    """Windows per block along the bar axis, so a block spans _WINDOW_BLOCK rows in total"""
+    return max(1, _WINDOW_BLOCK // max(1, int(np.prod(shape[:-1]))))
+
+
+def _rolling(x: np.ndarray, length: int, reduce: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+    """
+    Apply `reduce` to every full window along the bar (last) axis; bars
+    before the first window are na. Leading axes are independent series.
+    """
+    n = x.shape[-1]
+    out = np.full(x.shape, np.nan)
+    if length < 1:
+        raise PineCompileError(f"length must be positive, got {length}")
+    if n < length:
+        return out
+    windows = np.lib.stride_tricks.sliding_window_view(x, length, axis=-1)
+    block = _block_rows(x.shape)
+    for lo in range(0, n - length + 1, block):
+        hi = min(lo + block, n - length + 1)
+        out[..., length - 1 + lo:length - 1 + hi] = reduce(windows[..., lo:hi, :])
+    return out
+
+
+def _shift(x, k: int):
+    if not isinstance(x, np.ndarray) or k == 0:
+        return x
+    fill = False if x.dtype == bool else np.nan
+    if k >= x.shape[-1]:
+        return np.full(x.shape, fill)
+    out = np.empty_like(x, dtype=bool if x.dtype == bool else np.float64)
+    out[..., :k] = fill
+    out[..., k:] = x[..., :-k]
+    return out
+
+
+def _first_order(u: np.ndarray, gain: float, start: float) -> np.ndarray:
+    """
+    y[i] = gain * y[i - 1] + u[i] with y[-1] = start, over a finite 1-D u.
+    Each block of _RECURRENCE_BLOCK bars is one product with the decay
+    kernel; only the block ends carry sequentially, by the same recurrence
+    one level up.
+    """
+    n = len(u)
+    block = min(_RECURRENCE_BLOCK, n)
+    if not block:
+        return np.empty(0)
+    blocks = -(-n // block)
+    padded = np.zeros(blocks * block)
+    padded[:n] = u
+    lags = np.arange(block)
+    distance = lags[:, None] - lags[None, :]
+    kernel = np.where(distance >= 0, gain ** np.maximum(distance, 0), 0.0)
+    inner = padded.reshape(blocks, block) @ kernel.T  # as if each block started from zero
+    if blocks > 1:
+        ends = _first_order(inner[:-1, -1], gain ** block, start)
+        carried = np.r_[start, ends]
+    else:
+        carried = np.array([start])
+    return (inner + np.outer(carried, gain ** (lags + 1))).ravel()[:n]
+
+
+def _recursive_average(x: np.ndarray, length: int, alpha: float) -> np.ndarray:
+    """
+    Pine's ta.ema/ta.rma recurrence: seeded with the SMA of the first full
+    window, then alpha * x + (1 - alpha) * previous; an na input restarts it.
+    core.rolling.EMA follows the same convention bar by bar.
+    """
+    if length < 1:
+        raise PineCompileError(f"length must be positive, got {length}")
+    if x.ndim > 1:
+        return np.stack([_recursive_average(row, length, alpha) for row in x])
+    out = np.full(x.shape, np.nan)
+    edges = np.flatnonzero(np.diff(np.r_[False, np.isfinite(x), False].astype(np.int8)))
+    for start, end in zip(edges[::2], edges[1::2]):  # runs of bars between na
+        seed = start + length - 1
+        if seed >= end:
+            continue
+        out[seed] = x[start:seed + 1].sum() / length
+        out[seed + 1:end] = _first_order(alpha * x[seed + 1:end], 1.0 - alpha, out[seed])
+    return out
+
+
+def _sma(x, length):
+    return _rolling(x, length, lambda w: w.sum(axis=-1) / length)
+
+
+def _variance(x, length, biased=True):
+    def reduce(w):
+        mean = w.sum(axis=-1) / length
+        deviations = w - mean[..., None]
+        return np.einsum("...j,...j->...", deviations, deviations) / (length if biased else length - 1)
+    return _rolling(x, length, reduce)
+
+
+def _correlation(a, b, length):
+    shape = np.broadcast_shapes(a.shape, b.shape)
+    n = shape[-1]
+    out = np.full(shape, np.nan)
+    if n < length:
+        return out
+    windows_a = np.lib.stride_tricks.sliding_window_view(a, length, axis=-1)
+    windows_b = np.lib.stride_tricks.sliding_window_view(b, length, axis=-1)
+    block = _block_rows(shape)
+    for lo in range(0, n - length + 1, block):
+        wa, wb = windows_a[..., lo:lo + block, :], windows_b[..., lo:lo + block, :]
+        da = wa - (wa.sum(axis=-1) / length)[..., None]
+        db = wb - (wb.sum(axis=-1) / length)[..., None]
+        cov = np.einsum("...j,...j->...", da, db)
+        var_a = np.einsum("...j,...j->...", da, da)
+        var_b = np.einsum("...j,...j->...", db, db)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[..., length - 1 + lo:length - 1 + lo + cov.shape[-1]] = cov / np.sqrt(var_a * var_b)
+    return out
+
+
+def _true_range(high, low, close, handle_na):
+    prev = _shift(close, 1)
+    tr = np.fmax(high - low, np.fmax(np.abs(high - prev), np.abs(low - prev)))
+    if tr.shape[-1]:
+        tr[..., 0] = (high[..., 0] - low[..., 0]) if handle_na else np.nan
+    return tr
+
+
+def _rsi(x, length):
+    change = x - _shift(x, 1)
+    up = _recursive_average(np.where(np.isnan(change), np.nan, np.maximum(change, 0)), length, 1 / length)
+    down = _recursive_average(np.where(np.isnan(change), np.nan, np.maximum(-change, 0)), length, 1 / length)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + up / down)
+    rsi = np.where(down == 0, 100.0, np.where(up == 0, 0.0, rsi))
+    return np.where(np.isnan(up) | np.isnan(down), np.nan, rsi)
+
+
+def _divide(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.true_divide(a, b)
+    # Pine: division by zero yields na
+    return np.where(np.asarray(b) == 0, np.nan, result) if np.ndim(result) else (
+        math.nan if b == 0 else float(result))
+
+
+def _ffill(x: np.ndarray) -> np.ndarray:
+    index = np.where(np.isnan(x), -1, np.arange(x.shape[-1]))
+    index = np.maximum.accumulate(index, axis=-1)
+    return np.where(index >= 0, np.take_along_axis(x, np.maximum(index, 0), axis=-1), np.nan)
+
+
+def _first(x):
+    """Value on the first bar; a column per series when there are several"""
+    if not isinstance(x, np.ndarray) or not x.shape[-1]:
+        return x
+    return x[0] if x.ndim == 1 else x[..., :1]
+
+
+def _time_part(time: np.ndarray, part: str) -> np.ndarray:
+    moments = time.astype("datetime64[ms]")
+    if part == "hour":
+        return (time // MS_PER_HOUR) % 24
+    if part == "minute":
+        return (time // 60_000) % 60
+    if part == "second":
+        return (time // 1000) % 60
+    if part == "dayofweek":
+        return (time // _MS_PER_DAY + 4) % 7 + 1  # 1 = Sunday
+    if part == "dayofmonth":
+        return (moments.astype("datetime64[D]") - moments.astype("datetime64[M]")).astype(np.int64) + 1
+    if part == "month":
+        return moments.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    if part == "year":
+        return moments.astype("datetime64[Y]").astype(np.int64) + 1970
+    if part == "weekofyear":
+        days = moments.astype("datetime64[D]")
+        # ISO week number: week containing the year's first Thursday is week 1
+        thursday = days - ((days.astype(np.int64) + 3) % 7) + 3
+        start = thursday.astype("datetime64[Y]").astype("datetime64[D]")
+        return (thursday - start).astype(np.int64) // 7 + 1
+    raise PineCompileError(f"unsupported time part {part}")
+
+
+def _timeframe_ms(timeframe: str, line: int) -> Tuple[int, int]:
+    """Pine timeframe string to (period ms, alignment offset ms)"""
+    tf = timeframe.strip().upper()
+    count, unit = "", ""
+    for i, ch in enumerate(tf):
+        if not ch.isdigit():
+            count, unit = tf[:i], tf[i:]
+            break
+    else:
+        count, unit = tf, ""
+    count = int(count) if count else 1
+    if unit == "":
+        return count * 60_000, 0
+    if unit == "H":
+        return count * MS_PER_HOUR, 0
+    if unit == "D":
+        return count * _MS_PER_DAY, 0
+    if unit == "W":
+        return count * 7 * _MS_PER_DAY, WEEK_OFFSET_MS
+    raise PineCompileError(f"timeframe {timeframe!r} is not supported", line)
+
+
+# ---------------------------------------------------------------------------
+# Operations: name -> (implementation, number of static params)
+
+def _binary(fn):
+    return lambda ctx, args, params: fn(*args)
+
+
+def _logical(fn):
+    return lambda ctx, args, params: fn(_truth(args[0]), _truth(args[1]))
+
+
+def _rolling_op(fn):
+    return lambda ctx, args, params: fn(_series(args[0], ctx.shape), *params)
+
+
+_OPS: Dict[str, Callable] = {
+    "+": _binary(lambda a, b: a + b),
+    "-": _binary(lambda a, b: a - b),
+    "*": _binary(lambda a, b: a * b),
+    "/": _binary(_divide),
+    "%": _binary(lambda a, b: np.fmod(a, b)),
+    "==": _binary(lambda a, b: a == b),
+    "!=": _binary(lambda a, b: a != b),
+    "<": _binary(lambda a, b: a < b),
+    ">": _binary(lambda a, b: a > b),
+    "<=": _binary(lambda a, b: a <= b),
+    ">=": _binary(lambda a, b: a >= b),
+    "and": _logical(np.logical_and),
+    "or": _logical(np.logical_or),
+    "not": lambda ctx, args, params: np.logical_not(_truth(args[0])),
+    "neg": lambda ctx, args, params: -args[0],
+    "where": lambda ctx, args, params: np.where(_truth(args[0]), args[1], args[2]),
+    "shift": lambda ctx, args, params: _shift(args[0], params[0]),
+    "item": lambda ctx, args, params: args[0][params[0]],
+    "ta.sma": _rolling_op(_sma),
+    "ta.ema": lambda ctx, args, params: _recursive_average(_series(args[0], ctx.shape), params[0], 2 / (params[0] + 1)),
+    "ta.rma": lambda ctx, args, params: _recursive_average(_series(args[0], ctx.shape), params[0], 1 / params[0]),
+    "ta.wma": lambda ctx, args, params: _rolling(
+        _series(args[0], ctx.shape), params[0],
+        lambda w: w @ np.arange(1, params[0] + 1) / (params[0] * (params[0] + 1) / 2)),
+    "ta.stdev": lambda ctx, args, params: np.sqrt(_variance(_series(args[0], ctx.shape), *params)),
+    "ta.variance": _rolling_op(_variance),
+    "ta.correlation": lambda ctx, args, params: _correlation(
+        _series(args[0], ctx.shape), _series(args[1], ctx.shape), params[0]),
+    "ta.highest": _rolling_op(lambda x, n: _rolling(x, n, lambda w: w.max(axis=-1))),
+    "ta.lowest": _rolling_op(lambda x, n: _rolling(x, n, lambda w: w.min(axis=-1))),
+    "math.sum": _rolling_op(lambda x, n: _rolling(x, n, lambda w: w.sum(axis=-1))),
+    "ta.tr": lambda ctx, args, params: _true_range(ctx.high, ctx.low, ctx.close, params[0]),
+    "ta.rsi": _rolling_op(_rsi),
+    "ta.cum": lambda ctx, args, params: np.cumsum(_series(args[0], ctx.shape), axis=-1),
+    "fixnan": lambda ctx, args, params: _ffill(_series(args[0], ctx.shape)),
+    "nz": lambda ctx, args, params: (
+        np.where(np.isnan(args[0]), args[1], args[0]) if isinstance(args[0], np.ndarray)
+        else (args[1] if args[0] is None or args[0] != args[0] else args[0])),
+    "na": lambda ctx, args, params: (
+        np.isnan(args[0]) if isinstance(args[0], np.ndarray) and args[0].dtype != bool
+        else args[0] is None or args[0] != args[0]),
+    "math.abs": _binary(np.abs),
+    "math.sqrt": _binary(np.sqrt),
+    "math.exp": _binary(np.exp),
+    "math.log": _binary(np.log),
+    "math.log10": _binary(np.log10),
+    "math.pow": _binary(np.power),
+    "math.sign": _binary(np.sign),
+    "math.floor": _binary(np.floor),
+    "math.ceil": _binary(np.ceil),
+    "math.round": _binary(lambda x: np.sign(x) * np.floor(np.abs(x) + 0.5)),  # half away from zero
+    "math.max": lambda ctx, args, params: _reduce_args(np.fmax, args),
+    "math.min": lambda ctx, args, params: _reduce_args(np.fmin, args),
+    "math.avg": lambda ctx, args, params: _reduce_args(np.add, args) / len(args),
+    "time_part": lambda ctx, args, params: _time_part(ctx.time, params[0]),
+    "source": lambda ctx, args, params: ctx.source(params[0]),
+    "state": lambda ctx, args, params: ctx.state(params[0]),
+    "var_prev": lambda ctx, args, params: _var_previous(args[0], args[1::2], args[2::2], ctx.shape),
+    "first": lambda ctx, args, params: _first(args[0]),
+    "security": lambda ctx, args, params: ctx.security(params[0], params[1], params[2]),
+}
+
+
+def _reduce_args(fn, args):
+    result = args[0]
+    for arg in args[1:]:
+        result = fn(result, arg)
+    return result
+
+
+def _var_previous(initial, guards, values, shape: Tuple[int, ...]):
+    """
+    Value of a `var` variable at the start of each bar: the last value
+    assigned on an earlier bar (later assignments in a bar win), else the
+    initial value.
+    """
+    n = shape[-1]
+    assigned = np.zeros(shape, dtype=bool)
+    latest = np.broadcast_to(initial, shape)
+    for guard, value in zip(guards, values):
+        guard = np.broadcast_to(_truth(guard), shape)
+        latest = np.where(guard, value, latest)
+        assigned |= guard
+    index = np.maximum.accumulate(np.where(assigned, np.arange(n), -1), axis=-1)
+    latest = np.broadcast_to(latest, shape)
+    end = np.where(index >= 0, np.take_along_axis(latest, np.maximum(index, 0), axis=-1), initial)
+    first = np.broadcast_to(initial, shape[:-1] + (1,)).astype(end.dtype)
+    return np.concatenate([first, end[..., :-1]], axis=-1) if n else end
+
+
+# Ops whose all-constant applications are folded at compile time
+_FOLDABLE = {"+", "-", "*", "/", "%", "==", "!=", "<", ">", "<=", ">=", "and", "or", "not", "neg",
+             "where", "nz", "na", "math.abs", "math.sqrt", "math.exp", "math.log", "math.log10",
+             "math.pow", "math.sign", "math.floor", "math.ceil", "math.round", "math.max",
+             "math.min", "math.avg"}
+
+# Builtins with static length parameters: name -> (series args, static param names, defaults)
+_INDICATORS = {
+    "ta.sma": (1, ("length",), ()),
+    "ta.ema": (1, ("length",), ()),
+    "ta.rma": (1, ("length",), ()),
+    "ta.wma": (1, ("length",), ()),
+    "ta.stdev": (1, ("length", "biased"), (True,)),
+    "ta.variance": (1, ("length", "biased"), (True,)),
+    "ta.correlation": (2, ("length",), ()),
+    "ta.rsi": (1, ("length",), ()),
+    "math.sum": (1, ("length",), ()),
+    "ta.cum": (1, (), ()),
+    "fixnan": (1, (), ()),
+}
+# Ops whose results are shared across backtests through an IndicatorCache
+_CACHED = set(_INDICATORS) | {"ta.highest", "ta.lowest", "security"}
+# Finite-lookback ops: value at a bar depends on `length` bars up to it
+_WINDOWED = {"ta.sma", "ta.wma", "ta.stdev", "ta.variance", "ta.correlation", "ta.highest",
+             "ta.lowest", "math.sum"}
+# Ops computed bar by bar from their arguments
+_PER_BAR = _FOLDABLE | {"tuple", "item", "time_part"}
+_PER_BAR_SOURCES = ("open", "high", "low", "close", "volume", "time", "hl2", "hlc3", "ohlc4", "hlcc4")
+_VARIADIC = {"math.max", "math.min", "math.avg"}
+_MATH = {"math.abs", "math.sqrt", "math.exp", "math.log", "math.log10", "math.pow", "math.sign",
+         "math.floor", "math.ceil", "math.round", "nz", "na"}
+
+
+# ---------------------------------------------------------------------------
+# Lowering
+
+class _Scope:
+    def __init__(self, parent: Optional["_Scope"] = None):
+        self.parent = parent
+        self.names: Dict[str, Node] = {}
+        self.persistent: Dict[str, Node] = {}  # var name -> previous-bar placeholder
+        self.functions: Dict[str, FuncDef] = {}
+
+    def lookup(self, name: str) -> Optional["_Scope"]:
+        scope = self
+        while scope is not None:
+            if name in scope.names:
+                return scope
+            scope = scope.parent
+        return None
+
+    def function(self, name: str) -> Optional[FuncDef]:
+        scope = self
+        while scope is not None:
+            if name in scope.functions:
+                return scope.functions[name]
+            scope = scope.parent
+        return None
+
+
+@dataclass
+class _Order:
+    kind: str  # entry, close, close_all
+    entry_id: Optional[str]
+    direction: Optional[str]
+    guard: Node
+
+
+class _Compiler:
+    def __init__(self, script: Script, overrides: Dict[str, Any]):
+        self.script = script
+        self.overrides = dict(overrides)
+        self.inputs: Dict[str, PineInput] = {}
+        self.declaration: Dict[str, Any] = {}
+        self.orders: List[_Order] = []
+        self.brackets: List[Bracket] = []
+        self.globals = _Scope()
+        self.var_updates: Dict[int, Tuple[str, Node, List]] = {}
+        self.depth = 0
+
+    # Statements
+
+    def run(self) -> None:
+        self.block(self.script.body, self.globals, None)
+        self.finish_vars()
+        unknown = set(self.overrides) - set(self.inputs)
+        if unknown:
+            raise PineCompileError(f"unknown input(s): {', '.join(sorted(unknown))}")
+
+    def block(self, statements, scope: _Scope, guard: Optional[Node]) -> Optional[Node]:
+        """Lower statements; returns the value of the last one (function bodies)"""
+        result = None
+        for statement in statements:
+            result = self.statement(statement, scope, guard)
+        return result
+
+    def statement(self, st, scope: _Scope, guard: Optional[Node]) -> Optional[Node]:
+        if isinstance(st, Assign):
+            return self.assign(st, scope, guard)
+        if isinstance(st, If):
+            cond = self.expr(st.cond, scope)
+            self.block(st.body, _Scope(scope), self.conjoin(guard, cond))
+            if st.orelse:
+                self.block(st.orelse, _Scope(scope), self.conjoin(guard, self.apply("not", [cond], st.line)))
+            return None
+        if isinstance(st, FuncDef):
+            scope.functions[st.name] = st
+            return None
+        if isinstance(st, ExprStmt):
+            if isinstance(st.expr, Call) and self.side_effect(st.expr, scope, guard):
+                return None
+            return self.expr(st.expr, scope)
+        raise PineCompileError(f"unsupported statement {type(st).__name__}", getattr(st, "line", None))
+
+    def conjoin(self, guard: Optional[Node], cond: Node) -> Node:
+        return cond if guard is None else self.apply("and", [guard, cond], cond.line)
+
+    def assign(self, st: Assign, scope: _Scope, guard: Optional[Node]) -> Node:
+        if isinstance(st.value, Call) and st.value.func.startswith("input") and len(st.targets) == 1:
+            value = self.input(st.targets[0], st.value, scope)
+        else:
+            value = self.expr(st.value, scope)
+
+        if len(st.targets) > 1:
+            if value.op != "tuple":
+                raise PineCompileError("right-hand side is not a tuple", st.line)
+            if len(value.args) != len(st.targets):
+                raise PineCompileError(
+                    f"expected {len(value.args)} names, got {len(st.targets)}", st.line)
+            for name, item in zip(st.targets, value.args):
+                scope.names[name] = item
+            return value
+
+        name = st.targets[0]
+        if st.op == "=":
+            if st.var:
+                initial = value if value.is_const else self.apply("first", [value], st.line)
+                # Placeholder for the value carried in from the previous bar; its
+                # updates are attached once the whole script has been lowered
+                value = Node("var_prev", (initial,), (), frozenset(), st.line)
+                scope.persistent[name] = value
+                self.var_updates[value.id] = (name, value, [])
+            scope.names[name] = value
+            return value
+
+        owner = scope.lookup(name)
+        if owner is None:
+            raise PineCompileError(f"'{name}' is not declared", st.line)
+        current = owner.names[name]
+        if st.op != ":=":
+            value = self.apply(st.op[0], [current, value], st.line)
+
+        if name in owner.persistent:
+            updates = self.var_updates[owner.persistent[name].id][2]
+            updates.append((guard if guard is not None else _const(True), value, st.line))
+        owner.names[name] = value if guard is None else self.apply("where", [guard, value, current], st.line)
+        return owner.names[name]
+
+    def finish_vars(self) -> None:
+        """Attach each var's assignments to its previous-bar placeholder"""
+        for name, previous, updates in self.var_updates.values():
+            args = [previous.args[0]]
+            for guard, value, line in updates:
+                if self.references(guard, previous) or self.references(value, previous):
+                    raise PineCompileError(
+                        f"'var {name}' updates that depend on its own previous value are not supported", line)
+                if guard.deps or value.deps:
+                    raise PineCompileError(f"'var {name}' updates may not depend on strategy state", line)
+                args.extend((guard, value))
+            previous.args = tuple(args)
+
+    @staticmethod
+    def references(root: Node, target: Node) -> bool:
+        stack, seen = [root], set()
+        while stack:
+            node = stack.pop()
+            if node is target:
+                return True
+            if node.id in seen:
+                continue
+            seen.add(node.id)
+            stack.extend(node.args)
+        return False
+
+    def input(self, name: str, call: Call, scope: _Scope) -> Node:
+        kind = call.func.split(".", 1)[1] if "." in call.func else "auto"
+        if kind not in ("int", "float", "bool", "string", "source", "auto"):
+            raise PineCompileError(f"{call.func} is not supported", call.line)
+        defval = call.args[0] if call.args else call.kwargs.get("defval")
+        if defval is None:
+            raise PineCompileError(f"{call.func} needs a default value", call.line)
+
+        def static(key, position):
+            expr = call.kwargs.get(key, call.args[position] if len(call.args) > position else None)
+            if expr is None:
+                return None
+            node = self.expr(expr, scope)
+            return node.value if node.is_const else None
+
+        if kind == "source" or (kind == "auto" and isinstance(defval, Name)):
+            default = defval.id if isinstance(defval, Name) else None
+            if default not in _SOURCES:
+                raise PineCompileError("input.source default must be a price source", call.line)
+            value = self.overrides.pop(name, default)
+            if value not in _SOURCES:
+                raise PineCompileError(f"input '{name}' must name a price source", call.line)
+            self.inputs[name] = PineInput(name, "source", default, value, static("title", 1))
+            return _node("source", params=(value,), line=call.line)
+
+        default_node = self.expr(defval, scope)
+        if not default_node.is_const:
+            raise PineCompileError(f"input '{name}' default must be a constant", call.line)
+        default = default_node.value
+        if kind == "auto":
+            kind = type(default).__name__ if not isinstance(default, str) else "string"
+        value = self.overrides.pop(name, default)
+        if kind == "int":
+            value = int(value)
+        elif kind == "float":
+            value = float(value)
+        elif kind == "bool":
+            value = bool(value)
+        self.inputs[name] = PineInput(
+            name, kind, default, value,
+            title=static("title", 1),
+            minval=static("minval", 99),
+            maxval=static("maxval", 99),
+            step=static("step", 99),
+        )
+        return _const(value, call.line)
+
+    def side_effect(self, call: Call, scope: _Scope, guard: Optional[Node]) -> bool:
+        """Handle order and display calls; False for calls that produce a value"""
+        func = call.func
+        if func in ("strategy", "indicator", "study"):
+            self.declaration = {"type": func}
+            for key, expr in call.kwargs.items():
+                node = self.expr(expr, scope)
+                if node.is_const:
+                    self.declaration[key] = node.value
+            if call.args:
+                title = self.expr(call.args[0], scope)
+                self.declaration["title"] = title.value if title.is_const else None
+            return True
+        if func in _DISPLAY_CALLS or func.startswith(_DISPLAY_NAMESPACES):
+            return True
+        if func in ("strategy.cancel", "strategy.cancel_all"):
+            return True
+        if func.startswith("strategy."):
+            self.order(call, scope, guard)
+            return True
+        return False
+
+    def order(self, call: Call, scope: _Scope, guard: Optional[Node]) -> None:
+        func = call.func
+        when = call.kwargs.get("when")
+        if when is not None:
+            guard = self.conjoin(guard, self.expr(when, scope))
+        if guard is None:
+            guard = _const(True, call.line)
+
+        def arg(position, key):
+            expr = call.kwargs.get(key, call.args[position] if len(call.args) > position else None)
+            return None if expr is None else self.expr(expr, scope)
+
+        def static_str(node, what):
+            if node is None:
+                return None
+            if not node.is_const or not isinstance(node.value, str):
+                raise PineCompileError(f"{func} {what} must be a constant", call.line)
+            return node.value
+
+        if func == "strategy.entry":
+            entry_id = static_str(arg(0, "id"), "id")
+            direction = static_str(arg(1, "direction"), "direction")
+            if direction not in ("strategy.long", "strategy.short"):
+                raise PineCompileError("strategy.entry direction must be strategy.long or strategy.short", call.line)
+            self.orders.append(_Order("entry", entry_id, direction.split(".")[1], guard))
+        elif func == "strategy.close":
+            self.orders.append(_Order("close", static_str(arg(0, "id"), "id"), None, guard))
+        elif func == "strategy.close_all":
+            self.orders.append(_Order("close_all", None, None, guard))
+        elif func == "strategy.exit":
+            from_entry = static_str(arg(1, "from_entry"), "from_entry")
+            self.brackets.append(Bracket(from_entry, None, arg(99, "stop"), arg(99, "limit"), guard))
+        else:
+            raise PineCompileError(f"{func} is not supported", call.line)
+
+    # Expressions
+
+    def expr(self, e, scope: _Scope) -> Node:
+        if isinstance(e, Num):
+            return _const(int(e.value) if e.is_int else e.value)
+        if isinstance(e, Str):
+            return _const(e.value)
+        if isinstance(e, Bool):
+            return _const(e.value)
+        if isinstance(e, Na):
+            return _const(math.nan)
+        if isinstance(e, Name):
+            return self.name(e, scope)
+        if isinstance(e, Unary):
+            operand = self.expr(e.operand, scope)
+            if e.op == "+":
+                return operand
+            return self.apply("not" if e.op == "not" else "neg", [operand])
+        if isinstance(e, Binary):
+            left, right = self.expr(e.left, scope), self.expr(e.right, scope)
+            if e.op == "+" and left.is_const and right.is_const and (
+                    isinstance(left.value, str) or isinstance(right.value, str)):
+                return _const(f"{left.value}{right.value}")
+            return self.apply(e.op, [left, right])
+        if isinstance(e, Ternary):
+            return self.apply("where", [self.expr(e.cond, scope), self.expr(e.then, scope), self.expr(e.orelse, scope)])
+        if isinstance(e, Index):
+            return self.index(e, scope)
+        if isinstance(e, TupleExpr):
+            return _node("tuple", [self.expr(item, scope) for item in e.items])
+        if isinstance(e, Call):
+            return self.call(e, scope)
+        raise PineCompileError(f"unsupported expression {type(e).__name__}")
+
+    def apply(self, op: str, args: List[Node], line: int = 0) -> Node:
+        if op in _FOLDABLE and all(a.is_const for a in args):
+            try:
+                with np.errstate(all="ignore"):
+                    value = _OPS[op](None, [a.value for a in args], ())
+            except TypeError:
+                return _node("unsupported", args, (f"operator {op} on these operands",), line)
+            if isinstance(value, (np.generic, np.ndarray)) and np.ndim(value) == 0:
+                value = value.item()
+            return _const(value, line)
+        return _node(op, args, line=line)
+
+    def name(self, e: Name, scope: _Scope) -> Node:
+        owner = scope.lookup(e.id)
+        if owner is not None:
+            return owner.names[e.id]
+        if e.id in _STATE:
+            return Node("state", (), (e.id,), frozenset((_STATE[e.id],)), e.line)
+        if e.id in _UNSUPPORTED_STATE:
+            return _node("unsupported", params=(f"{e.id} is not supported",), line=e.line)
+        if e.id in _SOURCES:
+            return _node("source", params=(e.id,), line=e.line)
+        if e.id in _TIME_PARTS:
+            return _node("time_part", params=(e.id,), line=e.line)
+        if e.id == "ta.tr":
+            return _node("ta.tr", params=(False,), line=e.line)
+        if e.id == "math.pi":
+            return _const(math.pi)
+        if e.id == "math.e":
+            return _const(math.e)
+        if "." in e.id:
+            # Enumerations and constants: strategy.long, color.red, syminfo.ticker, ...
+            return _const(e.id, e.line)
+        raise PineCompileError(f"'{e.id}' is not declared", e.line)
+
+    def index(self, e: Index, scope: _Scope) -> Node:
+        value = self.expr(e.value, scope)
+        offset = self.expr(e.offset, scope)
+        if not offset.is_const or not isinstance(offset.value, int) or offset.value < 0:
+            raise PineCompileError("history offset must be a non-negative integer constant", e.line)
+        if value.op == "tuple":
+            # Element access on tuple results (e.g. ta.bb(...)[1])
+            if offset.value >= len(value.args):
+                raise PineCompileError("tuple index out of range", e.line)
+            return value.args[offset.value]
+        if value.is_const or offset.value == 0:
+            return value
+        return _node("shift", [value], (offset.value,), e.line)
+
+    def call(self, e: Call, scope: _Scope) -> Node:
+        func = e.func
+        user = scope.function(func)
+        if user is not None:
+            return self.inline(user, e, scope)
+
+        if func in _INDICATORS:
+            n_series, names, defaults = _INDICATORS[func]
+            series = [self.expr(a, scope) for a in e.args[:n_series]]
+            if len(series) < n_series:
+                raise PineCompileError(f"{func} expects {n_series} source argument(s)", e.line)
+            params = self.static_params(e, scope, n_series, names, defaults)
+            return _node(func, series, params, e.line)
+        if func in _VARIADIC or func in _MATH:
+            return self.apply(func, [self.expr(a, scope) for a in e.args], e.line)
+        if func in ("ta.highest", "ta.lowest"):
+            # ta.highest(length) reads high/low; ta.highest(source, length) a source
+            if len(e.args) == 1 and not e.kwargs:
+                source = _node("source", params=("high" if func == "ta.highest" else "low",))
+                params = self.static_params(e, scope, 0, ("length",), ())
+            else:
+                source = self.expr(e.args[0], scope)
+                params = self.static_params(e, scope, 1, ("length",), ())
+            return _node(func, [source], params, e.line)
+        if func == "ta.tr":
+            handle = self.static_params(e, scope, 0, ("handle_na",), (False,))
+            return _node("ta.tr", params=handle, line=e.line)
+        if func == "ta.atr":
+            (length,) = self.static_params(e, scope, 0, ("length",), ())
+            return _node("ta.rma", [_node("ta.tr", params=(True,), line=e.line)], (length,), e.line)
+        if func in ("ta.change", "ta.mom", "ta.roc"):
+            source = self.expr(e.args[0], scope)
+            (length,) = self.static_params(e, scope, 1, ("length",), (1,))
+            previous = _node("shift", [source], (length,), e.line)
+            change = self.apply("-", [source, previous], e.line)
+            if func == "ta.roc":
+                return self.apply("*", [_const(100), self.apply("/", [change, previous], e.line)], e.line)
+            return change
+        if func in ("ta.crossover", "ta.crossunder"):
+            a, b = (self.expr(arg, scope) for arg in e.args[:2])
+            above, was = (">", "<=") if func == "ta.crossover" else ("<", ">=")
+            now = self.apply(above, [a, b], e.line)
+            before = self.apply(was, [_node("shift", [a], (1,)), _node("shift", [b], (1,))], e.line)
+            return self.apply("and", [now, before], e.line)
+        if func == "ta.bb":
+            source = self.expr(e.args[0], scope)
+            length, mult = self.static_params(e, scope, 1, ("length", "mult"), ())
+            basis = _node("ta.sma", [source], (length,), e.line)
+            deviation = self.apply("*", [_const(mult), _node("ta.stdev", [source], (length, True), e.line)], e.line)
+            return _node("tuple", [basis, self.apply("+", [basis, deviation]), self.apply("-", [basis, deviation])])
+        if func == "ta.macd":
+            source = self.expr(e.args[0], scope)
+            fast, slow, signal = self.static_params(e, scope, 1, ("fastlen", "slowlen", "siglen"), ())
+            macd = self.apply("-", [_node("ta.ema", [source], (fast,)), _node("ta.ema", [source], (slow,))], e.line)
+            signal_line = _node("ta.ema", [macd], (signal,), e.line)
+            return _node("tuple", [macd, signal_line, self.apply("-", [macd, signal_line])])
+        if func == "ta.stoch":
+            source, high, low = (self.expr(arg, scope) for arg in e.args[:3])
+            (length,) = self.static_params(e, scope, 3, ("length",), ())
+            highest = _node("ta.highest", [high], (length,), e.line)
+            lowest = _node("ta.lowest", [low], (length,), e.line)
+            return self.apply("*", [_const(100), self.apply(
+                "/", [self.apply("-", [source, lowest]), self.apply("-", [highest, lowest])])])
+        if func in _TIME_PARTS:
+            if e.args:
+                source = e.args[0]
+                if not (isinstance(source, Name) and source.id == "time"):
+                    raise PineCompileError(f"{func}() is only supported on `time`", e.line)
+            timezone = e.args[1] if len(e.args) > 1 else e.kwargs.get("timezone")
+            if timezone is not None:
+                tz = self.expr(timezone, scope)
+                if not tz.is_const or tz.value not in _UTC_NAMES:
+                    raise PineCompileError(f"{func}() supports the UTC timezone only", e.line)
+            return _node("time_part", params=(func,), line=e.line)
+        if func == "request.security":
+            return self.security(e, scope)
+        if func.startswith("input"):
+            raise PineCompileError("inputs must be assigned directly to a variable", e.line)
+        # Anything else is only an error if an order depends on it
+        return _node("unsupported", params=(f"{func}() is not supported",), line=e.line)
+
+    def static_params(self, e: Call, scope: _Scope, first: int, names, defaults) -> Tuple:
+        values = []
+        for i, name in enumerate(names):
+            expr = e.args[first + i] if len(e.args) > first + i else e.kwargs.get(name)
+            if expr is None:
+                default_index = i - (len(names) - len(defaults))
+                if default_index < 0:
+                    raise PineCompileError(f"{e.func} is missing '{name}'", e.line)
+                values.append(defaults[default_index])
+                continue
+            node = self.expr(expr, scope)
+            if not node.is_const:
+                raise PineCompileError(f"{e.func} '{name}' must be a constant or input", e.line)
+            values.append(node.value)
+        return tuple(values)
+
+    def inline(self, function: FuncDef, e: Call, scope: _Scope) -> Node:
+        if len(e.args) != len(function.params) or e.kwargs:
+            raise PineCompileError(f"{function.name}() expects {len(function.params)} positional arguments", e.line)
+        self.depth += 1
+        if self.depth > 32:
+            raise PineCompileError("recursive functions are not supported", e.line)
+        local = _Scope(self.globals)
+        for param, arg in zip(function.params, e.args):
+            local.names[param] = self.expr(arg, scope)
+        result = self.block(function.body, local, None)
+        self.depth -= 1
+        if result is None:
+            raise PineCompileError(f"{function.name}() does not return a value", function.line)
+        return result
+
+    def security(self, e: Call, scope: _Scope) -> Node:
+        symbol = self.expr(e.args[0] if e.args else e.kwargs["symbol"], scope)
+        if not symbol.is_const or symbol.value not in ("syminfo.tickerid", "syminfo.ticker"):
+            raise PineCompileError("request.security supports the chart symbol only", e.line)
+        timeframe = self.expr(e.args[1] if len(e.args) > 1 else e.kwargs["timeframe"], scope)
+        if not timeframe.is_const or not isinstance(timeframe.value, str):
+            raise PineCompileError("request.security timeframe must be a constant", e.line)
+        period, offset = _timeframe_ms(timeframe.value, e.line)
+        inner = self.expr(e.args[2] if len(e.args) > 2 else e.kwargs["expression"], scope)
+        if inner.deps:
+            raise PineCompileError("strategy state is not available inside request.security", e.line)
+        return Node("security", (), (period, offset, inner), frozenset(), e.line)
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+
+def _structure(node: Node, memo: Dict[int, str]) -> str:
+    """Digest of what a node computes, independent of node ids and processes"""
+    if node.id not in memo:
+        params = tuple(_structure(p, memo) if isinstance(p, Node) else p for p in node.params)
+        text = repr((node.op, params, tuple(_structure(a, memo) for a in node.args)))
+        memo[node.id] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return memo[node.id]
+
+
+def _history(node: Node, memo: Dict[int, Optional[int]]) -> Optional[int]:
+    """
+    Bars of lookback a node's value depends on, or None when it depends on
+    the whole series (recursive averages, bar_index, strategy state, ...).
+    """
+    if node.id in memo:
+        return memo[node.id]
+    args = [_history(a, memo) for a in node.args]
+    if None in args or node.deps:
+        result = None
+    elif node.op == "const":
+        result = 0
+    elif node.op == "source":
+        result = 0 if node.params[0] in _PER_BAR_SOURCES else None
+    elif node.op == "shift":
+        result = max(args) + node.params[0]
+    elif node.op in _WINDOWED:
+        result = max(args) + node.params[0] - 1
+    elif node.op == "ta.tr":
+        result = 1
+    elif node.op in _PER_BAR:
+        result = max(args, default=0)
+    else:
+        result = None
+    memo[node.id] = result
+    return result
+
+
+class _Context:
+    """
+    Evaluates nodes over one bar series with memoization per strategy state.
+    With an IndicatorCache, indicator values are also shared with other
+    backtests over the same dataset.
+    """
+
+    def __init__(self, bars: Bars, cache: Optional["IndicatorCache"] = None):
+        self.bars = bars
+        self.cache = cache if bars.dataset is not None else None
+        self.structures: Dict[int, str] = {}
+        self.histories: Dict[int, Optional[int]] = {}
+        self.n = len(bars)
+        self.shape = bars.close.shape  # (bars,) or (assets, bars) for a Panel
+        self.high, self.low, self.close = bars.high, bars.low, bars.close
+        self.time = bars.timestamp
+        self.memo: Dict[Tuple, Any] = {}
+        # Values depending on the closed-trade count; dropped when the count moves on
+        self.closed_memo: Dict[Tuple, Any] = {}
+        self.current_state: Dict[str, int] = {"position": 0, "closed": 0}
+        self.timeframes: Dict[Tuple[int, int], "_Context"] = {}
+        self.group: Optional[np.ndarray] = None  # source bar -> bucket, for resampled contexts
+
+    def evaluate(self, node: Node, position: int = 0, closed: int = 0):
+        if closed != self.current_state["closed"]:
+            self.closed_memo.clear()
+        self.current_state = {"position": position, "closed": closed}
+        return self._eval(node)
+
+    def _eval(self, node: Node):
+        memo = self.closed_memo if "closed" in node.deps else self.memo
+        key = (node.id, self.current_state["position"]) if "position" in node.deps else (node.id,)
+        if key in memo:
+            return memo[key]
+        if node.op == "const":
+            value = node.value
+        elif node.op == "tuple":
+            value = tuple(self._eval(a) for a in node.args)
+        elif node.op == "unsupported":
+            raise PineCompileError(node.params[0], node.line)
+        elif self.cache is not None and node.op in _CACHED and not node.deps:
+            value = self.cache.series(
+                self.bars,
+                f"pine/{COMPILER_VERSION}",
+                (_structure(node, self.structures),),
+                lambda bars: self._apply(node) if bars is self.bars else _Context(bars).evaluate(node),
+                history=_history(node, self.histories),
+            )
+        else:
+            value = self._apply(node)
+        memo[key] = value
+        return value
+
+    def _apply(self, node: Node):
+        args = [self._eval(a) for a in node.args]
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            return _OPS[node.op](self, args, node.params)
+
+    def source(self, name: str):
+        bars = self.bars
+        if name in ("open", "high", "low", "close", "volume"):
+            return getattr(bars, name)
+        if name == "time":
+            return bars.timestamp
+        if name == "hl2":
+            return (bars.high + bars.low) / 2
+        if name == "hlc3":
+            return (bars.high + bars.low + bars.close) / 3
+        if name == "ohlc4":
+            return (bars.open + bars.high + bars.low + bars.close) / 4
+        if name == "hlcc4":
+            return (bars.high + bars.low + 2 * bars.close) / 4
+        if name == "bar_index":
+            return np.arange(self.n)
+        flags = np.zeros(self.n, dtype=bool)
+        if name == "barstate.isfirst" and self.n:
+            flags[0] = True
+        elif name == "barstate.islast" and self.n:
+            flags[-1] = True
+        elif name in ("barstate.isconfirmed", "barstate.ishistory", "barstate.isnew"):
+            flags[:] = True
+        return flags
+
+    def state(self, name: str) -> int:
+        position = self.current_state["position"]
+        if name == "strategy.position_size":
+            return position
+        if name == "strategy.opentrades":
+            return abs(position)
+        return self.current_state["closed"]
+
+    def security(self, period: int, offset: int, inner: Node):
+        """Evaluate `inner` on resampled bars; each bar sees the last completed higher-timeframe value"""
+        key = (period, offset)
+        if key not in self.timeframes:
+            resampled, group = resample(self.bars, period, offset)
+            sub = _Context(resampled)
+            sub.group = group
+            self.timeframes[key] = sub
+        sub = self.timeframes[key]
+        values = sub._eval(inner)
+        if not isinstance(values, np.ndarray):
+            return values
+        # A bucket is complete once a later bar starts or this bar closes at its boundary
+        interval = int(np.median(np.diff(self.time))) if self.n > 1 else period
+        bucket_end = sub.bars.timestamp[sub.group] + period
+        complete = self.time + interval >= bucket_end
+        index = np.where(complete, sub.group, sub.group - 1)
+        fill = False if values.dtype == bool else np.nan
+        return np.where(index >= 0, values[np.maximum(index, 0)], fill)
+
+
+# ---------------------------------------------------------------------------
+# Compiled strategy
+
+class CompiledStrategy:
+    """
+    A Pine script lowered to a dataflow graph.
+
+    Orders are reduced to four condition series (long/short entry and
+    exit); the engine's state machine consumes them. Strategy state
+    (strategy.position_size, strategy.opentrades, strategy.closedtrades)
+    is evaluated per state, so only nodes depending on it are recomputed.
+    Positions do not pyramid or reverse: entries are taken only when flat.
+    """
+
+    def __init__(self, script: Script, compiler: _Compiler):
+        self.version = script.version
+        self.declaration = compiler.declaration
+        self.inputs = compiler.inputs
+        self.variables = dict(compiler.globals.names)
+        self.brackets = compiler.brackets
+        self.has_orders = any(order.kind == "entry" for order in compiler.orders)
+        self.outputs = self._conditions(compiler)
+        self._validate()
+
+    def _conditions(self, compiler: _Compiler) -> Dict[str, Node]:
+        directions = {o.entry_id: o.direction for o in compiler.orders if o.kind == "entry"}
+        guards: Dict[str, List[Node]] = {
+            "long_entry": [], "short_entry": [], "long_exit": [], "short_exit": [],
+        }
+        for order in compiler.orders:
+            if order.kind == "entry":
+                guards[f"{order.direction}_entry"].append(order.guard)
+            else:
+                direction = directions.get(order.entry_id) if order.kind == "close" else None
+                for side in ((direction,) if direction else ("long", "short")):
+                    guards[f"{side}_exit"].append(order.guard)
+        for bracket in compiler.brackets:
+            bracket.direction = directions.get(bracket.entry_id)
+        outputs = {}
+        for name, nodes in guards.items():
+            node = _const(False)
+            for guard in nodes:
+                node = compiler.apply("or", [node, guard])
+            outputs[name] = node
+        return outputs
+
+    def _validate(self) -> None:
+        """Every node an order depends on must be supported"""
+        self.resamples = False
+        roots = list(self.outputs.values())
+        for bracket in self.brackets:
+            roots.extend(n for n in (bracket.stop, bracket.limit, bracket.guard) if n is not None)
+        stack, seen = roots, set()
+        while stack:
+            node = stack.pop()
+            if node.id in seen:
+                continue
+            seen.add(node.id)
+            if node.op == "unsupported":
+                raise PineCompileError(node.params[0], node.line)
+            stack.extend(node.args)
+            if node.op == "security":
+                self.resamples = True
+                stack.append(node.params[2])
+
+    def series(self, bars: Bars, name: str, cache: Optional["IndicatorCache"] = None):
+        """Value of a top-level variable over `bars` (flat position state)"""
+        if name not in self.variables:
+            raise KeyError(name)
+        return _Context(bars, cache).evaluate(self.variables[name])
+
+    def signal_codes(
+        self,
+        bars: Bars,
+        cache: Optional["IndicatorCache"] = None,
+        exits: Optional["ExitStage"] = None,
+    ) -> np.ndarray:
+        """
+        int8 signal codes (see backtest_engine.SIGNAL_CODES), jumping from
+        event to event; condition arrays are recomputed only when they
+        depend on the number of closed trades. Indicators are looked up in
+        and added to `cache` when the bars carry a dataset id.
+
+        Each position also closes at the first stop, target or time stop of
+        `exits`, with strategy.exit levels of the entry bar taking precedence;
+        the stage records the fills. Scripts with strategy.exit get a stage
+        of their own when none is given.
+
+        Given a Panel (core.portfolio), every asset is evaluated at once on
+        the 2-D columns and an (assets, bars) array is returned; events
+        only fall on bars an asset actually has. request.security needs
+        one series, so scripts using it are evaluated asset by asset.
+        """
+        if exits is None and self.brackets:
+            from .exits import ExitStage
+            exits = ExitStage(bars)
+        if bars.close.ndim == 1:
+            return self._codes(_Context(bars, cache), 1, None, exits)[0]
+        if not self.resamples:
+            return self._codes(_Context(bars), len(bars.assets), bars.present, exits)
+        return np.concatenate([
+            self._codes(_Context(bars.row(r)), 1, bars.present[r:r + 1], exits, r)
+            for r in range(len(bars.assets))
+        ])
+
+    def _codes(
+        self,
+        ctx: _Context,
+        rows: int,
+        present: Optional[np.ndarray],
+        exits: Optional["ExitStage"],
+        first_row: int = 0,
+    ) -> np.ndarray:
+        from .backtest_engine import SIGNAL_CODES, SignalType
+
+        n = ctx.n
+        codes = np.zeros((rows, n), dtype=np.int8)
+        positions = {"long_entry": 0, "short_entry": 0, "long_exit": 1, "short_exit": -1}
+        found: Dict[Tuple, List[np.ndarray]] = {}
+
+        def events(name: str, closed: int) -> List[np.ndarray]:
+            """Event bars of one condition, per row"""
+            node = self.outputs[name]
+            key = (name, closed if "closed" in node.deps else None)
+            if key not in found:
+                if key[1] is not None:
+                    for stale in [k for k in found if k[1] is not None and k[1] != closed]:
+                        del found[stale]
+                value = np.broadcast_to(_truth(ctx.evaluate(node, positions[name], closed)), (rows, n))
+                if present is not None:
+                    value = value & present
+                found[key] = [np.flatnonzero(row) for row in value]
+            return found[key]
+
+        values: Dict[Tuple, np.ndarray] = {}
+
+        def value_at(node: Node, closed: int, r: int, i: int):
+            """A bracket expression at one bar, as seen when flat at entry"""
+            key = (node.id, closed if "closed" in node.deps else None)
+            if key not in values:
+                values[key] = np.broadcast_to(ctx.evaluate(node, 0, closed), (rows, n))
+            return values[key][r, i]
+
+        def levels(is_long: bool, closed: int, r: int, entry: int) -> Tuple[float, float]:
+            side = "long" if is_long else "short"
+            for bracket in self.brackets:
+                if bracket.direction in (None, side) and _truth(value_at(bracket.guard, closed, r, entry)):
+                    stop, limit = (
+                        np.nan if node is None else float(_series(value_at(node, closed, r, entry), ()))
+                        for node in (bracket.stop, bracket.limit)
+                    )
+                    return stop, limit
+            return np.nan, np.nan
+
+        def next_event(indices: np.ndarray, i: int) -> Optional[int]:
+            k = indices.searchsorted(i)
+            return int(indices[k]) if k < len(indices) else None
+
+        # Rows advance in lockstep, one trade per round, so conditions that
+        # depend on the closed-trade count are evaluated once per count
+        cursor = [0] * rows
+        active, closed = list(range(rows)), 0
+        while active:
+            long_entries, short_entries = events("long_entry", closed), events("short_entry", closed)
+            still_trading = []
+            for r in active:
+                long_at = next_event(long_entries[r], cursor[r])
+                short_at = next_event(short_entries[r], cursor[r])
+                if long_at is None and short_at is None:
+                    continue
+                is_long = short_at is None or (long_at is not None and long_at <= short_at)
+                entry = long_at if is_long else short_at
+                codes[r, entry] = SIGNAL_CODES[SignalType.LONG if is_long else SignalType.SHORT]
+                exits_at = events("long_exit" if is_long else "short_exit", closed)[r]
+                exit_bar = next_event(exits_at, entry + 1)
+                if exits is not None:
+                    stop, limit = levels(is_long, closed, r, entry)
+                    exit_bar = exits.exit(entry, 1 if is_long else -1, exit_bar, first_row + r, stop, limit)
+                if exit_bar is None:
+                    continue
+                codes[r, exit_bar] = SIGNAL_CODES[SignalType.CLOSE]
+                cursor[r] = exit_bar + 1
+                still_trading.append(r)
+            active, closed = still_trading, closed + 1
+        return codes
+
+
+def compile_pine(source: str, inputs: Optional[Dict[str, Any]] = None) -> CompiledStrategy:
+    """
+    Parse and lower a Pine v5 script. `inputs` overrides input defaults by
+    variable name. Raises PineSyntaxError / PineCompileError (ValueErrors).
+    """
+    script = parse(source)
+    compiler = _Compiler(script, inputs or {})
+    compiler.run()
+    return CompiledStrategy(script, compiler)
+
+
+__all__ = [
+    "Bracket",
+    "COMPILER_VERSION",
+    "CompiledStrategy",
+    "Node",
+    "PineCompileError",
+    "PineInput",
+    "PineSyntaxError",
+    "compile_pine",
+]
@@ -0,0 +1,526 @@
+"""
+CLAWARS Pine Script Parser
+Tokenizer and recursive-descent parser for the supported Pine v5 subset
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class PineError(ValueError):
+    """Base class for errors raised while reading a strategy"""
+
+    def __init__(self, message: str, line: Optional[int] = None):
+        self.line = line
+        super().__init__(f"line {line}: {message}" if line else message)
+
+
+class PineSyntaxError(PineError):
+    """Source is not valid Pine"""
+
+
+class PineCompileError(PineError):
+    """Valid Pine that uses something outside the supported subset"""
+
+
+# ---------------------------------------------------------------------------
+# AST
+
+@dataclass
+class Num:
+    value: float
+    is_int: bool = False
+
+
+@dataclass
+class Str:
+    value: str
+
+
+@dataclass
+class Bool:
+    value: bool
+
+
+@dataclass
+class Na:
+    pass
+
+
+@dataclass
+class Name:
+    id: str  # dotted names ("ta.sma", "strategy.long") are one identifier
+    line: int = 0
+
+
+@dataclass
+class Call:
+    func: str
+    args: List[Any]
+    kwargs: Dict[str, Any]
+    line: int = 0
+
+
+@dataclass
+class Index:
+    value: Any
+    offset: Any
+    line: int = 0
+
+
+@dataclass
+class Unary:
+    op: str
+    operand: Any
+
+
+@dataclass
+class Binary:
+    op: str
+    left: Any
+    right: Any
+
+
+@dataclass
+class Ternary:
+    cond: Any
+    then: Any
+    orelse: Any
+
+
+@dataclass
+class TupleExpr:
+    items: List[Any]
+
+
+@dataclass
+class Assign:
+    targets: List[str]
+    op: str  # "=", ":=", "+=", "-=", "*=", "/="
+    value: Any
+    var: bool = False  # declared with var/varip
+    line: int = 0
+
+
+@dataclass
+class ExprStmt:
+    expr: Any
+    line: int = 0
+
+
+@dataclass
+class If:
+    cond: Any
+    body: List[Any]
+    orelse: List[Any] = field(default_factory=list)
+    line: int = 0
+
+
+@dataclass
+class FuncDef:
+    name: str
+    params: List[str]
+    body: List[Any]
+    line: int = 0
+
+
+@dataclass
+class Script:
+    version: Optional[int]
+    body: List[Any]
+
+
+# ---------------------------------------------------------------------------
+# Tokens and logical lines
+
+_TOKEN = re.compile(r"""
+    (?P<space>[ \t]+)
+  | (?P<comment>//[^\n]*)
+  | (?P<newline>\r?\n)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<color>\#[0-9A-Fa-f]{6}(?:[0-9A-Fa-f]{2})?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>:=|==|!=|<=|>=|=>|\+=|-=|\*=|/=|[-+*/%<>=?:,()\[\].])
+""", re.VERBOSE)
+
+_UNSUPPORTED_STATEMENTS = ("for", "while", "switch", "import", "export", "type", "method")
+_DECLARATION_MODIFIERS = ("var", "varip")
+_QUALIFIERS = ("const", "simple", "series", "input")
+
+# Operators after which a line always continues on the next one
+_CONTINUATION_OPS = {"+", "-", "*", "/", "%", "?", ":", ",", "and", "or", "not",
+                     "==", "!=", "<", ">", "<=", ">=", "=", ":="}
+
+
+@dataclass
+class Token:
+    kind: str  # number, string, name, op
+    value: str
+    line: int
+
+
+@dataclass
+class _Line:
+    indent: int
+    tokens: List[Token]
+    number: int
+
+
+def _logical_lines(source: str) -> Tuple[Optional[int], List[_Line]]:
+    """
+    Tokenize and join wrapped lines. A physical line continues the previous
+    one inside brackets, after a trailing operator, or when it is indented
+    by a non-multiple of four (Pine's wrapping rule).
+    """
+    version = None
+    match = re.search(r"//\s*@version\s*=\s*(\d+)", source)
+    if match:
+        version = int(match.group(1))
+
+    physical: List[_Line] = []
+    current: List[Token] = []
+    indent = 0
+    at_line_start = True
+    line = 1
+    pos = 0
+    while pos < len(source):
+        m = _TOKEN.match(source, pos)
+        if m is None:
+            raise PineSyntaxError(f"unexpected character {source[pos]!r}", line)
+        kind = m.lastgroup
+        text = m.group()
+        pos = m.end()
+        if kind == "space":
+            if at_line_start:
+                indent = len(text.replace("\t", "    "))
+            continue
+        if kind == "comment":
+            continue
+        if kind == "newline":
+            if current:
+                physical.append(_Line(indent, current, current[0].line))
+            current = []
+            indent = 0
+            at_line_start = True
+            line += 1
+            continue
+        if at_line_start:
+            at_line_start = False
+        if kind == "color":
+            kind = "string"
+        current.append(Token(kind, text, line))
+    if current:
+        physical.append(_Line(indent, current, current[0].line))
+
+    lines: List[_Line] = []
+    depth = 0
+    for phys in physical:
+        continues = lines and (
+            depth > 0
+            or (lines[-1].tokens[-1].kind in ("op", "name") and lines[-1].tokens[-1].value in _CONTINUATION_OPS)
+            or phys.indent % 4 != 0
+        )
+        if continues:
+            lines[-1].tokens.extend(phys.tokens)
+        else:
+            lines.append(_Line(phys.indent, list(phys.tokens), phys.number))
+        for token in phys.tokens:
+            if token.kind == "op" and token.value in "([":
+                depth += 1
+            elif token.kind == "op" and token.value in ")]":
+                depth = max(depth - 1, 0)
+    return version, lines
+
+
+# ---------------------------------------------------------------------------
+# Parser
+
+class _Expr:
+    """Recursive-descent expression parser over one logical line"""
+
+    def __init__(self, tokens: List[Token], line: int):
+        self.tokens = tokens
+        self.pos = 0
+        self.line = line
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else None
+
+    def at(self, value: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token.kind in ("op", "name") and token.value == value
+
+    def take(self, value: Optional[str] = None) -> Token:
+        token = self.peek()
+        if token is None:
+            raise PineSyntaxError("unexpected end of line", self.line)
+        if value is not None and token.value != value:
+            raise PineSyntaxError(f"expected {value!r}, found {token.value!r}", token.line)
+        self.pos += 1
+        return token
+
+    def done(self) -> bool:
+        return self.pos >= len(self.tokens)
+
+    def expect_end(self) -> None:
+        if not self.done():
+            token = self.peek()
+            raise PineSyntaxError(f"unexpected {token.value!r}", token.line)
+
+    # Precedence climbing: ?: < or < and < equality < comparison < + - < * / % < unary < postfix
+
+    def expression(self):
+        cond = self.binary(0)
+        if self.at("?"):
+            self.take("?")
+            then = self.expression()
+            self.take(":")
+            orelse = self.expression()
+            return Ternary(cond, then, orelse)
+        return cond
+
+    _LEVELS = (("or",), ("and",), ("==", "!="), ("<", ">", "<=", ">="), ("+", "-"), ("*", "/", "%"))
+
+    def binary(self, level: int):
+        if level == len(self._LEVELS):
+            return self.unary()
+        left = self.binary(level + 1)
+        while self.peek() is not None and self.peek().kind in ("op", "name") and self.peek().value in self._LEVELS[level]:
+            op = self.take().value
+            left = Binary(op, left, self.binary(level + 1))
+        return left
+
+    def unary(self):
+        if self.at("not") or self.at("-") or self.at("+"):
+            op = self.take().value
+            return Unary(op, self.unary())
+        return self.postfix(self.primary())
+
+    def postfix(self, node):
+        while self.at("["):
+            token = self.take("[")
+            offset = self.expression()
+            self.take("]")
+            node = Index(node, offset, token.line)
+        return node
+
+    def primary(self):
+        token = self.take()
+        if token.kind == "number":
+            is_int = re.fullmatch(r"\d+", token.value) is not None
+            return Num(float(token.value), is_int)
+        if token.kind == "string":
+            return Str(_unquote(token.value))
+        if token.kind == "op" and token.value == "(":
+            node = self.expression()
+            self.take(")")
+            return node
+        if token.kind == "op" and token.value == "[":
+            items = [] if self.at("]") else self.arguments("]")[0]
+            self.take("]")
+            return TupleExpr(items)
+        if token.kind == "name":
+            if token.value == "true":
+                return Bool(True)
+            if token.value == "false":
+                return Bool(False)
+            if token.value == "na":
+                return Na()
+            name = token.value
+            while self.at(".") and self.peek(1) is not None and self.peek(1).kind == "name":
+                self.take(".")
+                name += "." + self.take().value
+            if self.at("("):
+                self.take("(")
+                args, kwargs = self.arguments(")") if not self.at(")") else ([], {})
+                self.take(")")
+                return Call(name, args, kwargs, token.line)
+            return Name(name, token.line)
+        raise PineSyntaxError(f"unexpected {token.value!r}", token.line)
+
+    def arguments(self, closing: str) -> Tuple[List[Any], Dict[str, Any]]:
+        args, kwargs = [], {}
+        while True:
+            token, after = self.peek(), self.peek(1)
+            if token is not None and token.kind == "name" and after is not None and after.value == "=":
+                self.take()
+                self.take("=")
+                kwargs[token.value] = self.expression()
+            else:
+                if kwargs:
+                    raise PineSyntaxError("positional argument after keyword argument", self.line)
+                args.append(self.expression())
+            if not self.at(","):
+                return args, kwargs
+            self.take(",")
+            if self.at(closing):
+                return args, kwargs
+
+
+def _unquote(text: str) -> str:
+    body = text[1:-1] if text[0] in "'\"" else text
+    return re.sub(r"\\(.)", lambda m: {"n": "\n", "t": "\t"}.get(m.group(1), m.group(1)), body)
+
+
+class Parser:
+    """Statements and indentation blocks over logical lines"""
+
+    def __init__(self, source: str):
+        self.version, self.lines = _logical_lines(source)
+        self.pos = 0
+
+    def parse(self) -> Script:
+        body = self.block(0)
+        if self.pos < len(self.lines):
+            line = self.lines[self.pos]
+            raise PineSyntaxError("unexpected indentation", line.number)
+        return Script(self.version, body)
+
+    def block(self, indent: int) -> List[Any]:
+        statements = []
+        while self.pos < len(self.lines) and self.lines[self.pos].indent == indent:
+            statements.append(self.statement(indent))
+        return statements
+
+    def child_block(self, indent: int, line: int) -> List[Any]:
+        if self.pos >= len(self.lines) or self.lines[self.pos].indent <= indent:
+            raise PineSyntaxError("expected an indented block", line)
+        return self.block(self.lines[self.pos].indent)
+
+    def statement(self, indent: int):
+        line = self.lines[self.pos]
+        self.pos += 1
+        expr = _Expr(line.tokens, line.number)
+        first = line.tokens[0]
+
+        if first.kind == "name" and first.value in _UNSUPPORTED_STATEMENTS:
+            raise PineCompileError(f"'{first.value}' is not supported", line.number)
+
+        if expr.at("if"):
+            return self.if_statement(expr, indent, line.number)
+        if expr.at("else"):
+            raise PineSyntaxError("'else' without 'if'", line.number)
+
+        function = self.function_header(expr)
+        if function is not None:
+            name, params = function
+            if expr.done():
+                body = self.child_block(indent, line.number)
+            else:
+                body = [ExprStmt(expr.expression(), line.number)]
+                expr.expect_end()
+            return FuncDef(name, params, body, line.number)
+
+        assignment = self.assignment(expr, line.number)
+        if assignment is not None:
+            return assignment
+
+        value = expr.expression()
+        expr.expect_end()
+        return ExprStmt(value, line.number)
+
+    def if_statement(self, expr: _Expr, indent: int, number: int) -> If:
+        expr.take("if")
+        cond = expr.expression()
+        expr.expect_end()
+        node = If(cond, self.child_block(indent, number), line=number)
+        if self.pos < len(self.lines) and self.lines[self.pos].indent == indent:
+            following = _Expr(self.lines[self.pos].tokens, self.lines[self.pos].number)
+            if following.at("else"):
+                number = self.lines[self.pos].number
+                self.pos += 1
+                following.take("else")
+                if following.at("if"):
+                    node.orelse = [self.if_statement(following, indent, number)]
+                else:
+                    following.expect_end()
+                    node.orelse = self.child_block(indent, number)
+        return node
+
+    def function_header(self, expr: _Expr) -> Optional[Tuple[str, List[str]]]:
+        """`name(a, b) =>` ; consumes the header when present"""
+        if not (expr.peek() is not None and expr.peek().kind == "name" and expr.at("(", 1)):
+            return None
+        depth, i = 0, 1
+        while expr.peek(i) is not None:
+            value = expr.peek(i).value
+            if value == "(":
+                depth += 1
+            elif value == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+            i += 1
+        if not expr.at("=>", i + 1):
+            return None
+        name = expr.take().value
+        expr.take("(")
+        params = []
+        while not expr.at(")"):
+            token = expr.take()
+            # Optional type annotations: `float x`
+            if expr.peek() is not None and expr.peek().kind == "name":
+                token = expr.take()
+            if expr.at("="):
+                raise PineCompileError("default parameter values are not supported", token.line)
+            params.append(token.value)
+            if expr.at(","):
+                expr.take(",")
+        expr.take(")")
+        expr.take("=>")
+        return name, params
+
+    def assignment(self, expr: _Expr, number: int) -> Optional[Assign]:
+        """Declarations (`[var] [type] x = ...`, `[a, b] = ...`) and reassignments"""
+        start = expr.pos
+        var = False
+        if expr.at("var") or expr.at("varip"):
+            expr.take()
+            var = True
+
+        if expr.at("["):
+            # Tuple destructuring
+            j, names = 1, []
+            while expr.peek(j) is not None and expr.peek(j).kind == "name":
+                names.append(expr.peek(j).value)
+                if expr.at(",", j + 1):
+                    j += 2
+                else:
+                    j += 1
+                    break
+            if names and expr.at("]", j) and expr.at("=", j + 1):
+                expr.pos += j + 2
+                value = expr.expression()
+                expr.expect_end()
+                return Assign(names, "=", value, var, number)
+            expr.pos = start
+            return None
+
+        # Skip qualifiers and a type name: `series float x = ...`, `var table t = ...`
+        j = 0
+        while expr.peek(j) is not None and expr.peek(j).kind == "name" and expr.peek(j).value in _QUALIFIERS:
+            j += 1
+        if (expr.peek(j) is not None and expr.peek(j).kind == "name"
+                and expr.peek(j + 1) is not None and expr.peek(j + 1).kind == "name"
+                and expr.at("=", j + 2)):
+            j += 1
+        token = expr.peek(j)
+        op = expr.peek(j + 1)
+        if (token is None or token.kind != "name" or op is None
+                or op.value not in ("=", ":=", "+=", "-=", "*=", "/=")):
+            expr.pos = start
+            return None
+        if var and op.value != "=":
+            raise PineSyntaxError("'var' requires '='", number)
+        expr.pos += j + 2
+        value = expr.expression()
+        expr.expect_end()
+        return Assign([token.value], op.value, value, var, number)
+
+
+def parse(source: str) -> Script:
+    """Parse Pine source into a Script AST"""
+    return Parser(source).parse()
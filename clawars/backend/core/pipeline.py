@@ -0,0 +1,212 @@
+"""
+CLAWARS Backtest Pipeline
+Read-ahead of data chunks and queued backtests' datasets, so storage I/O
+overlaps the CPU work of the backtest in front of it
+"""
+
+import multiprocessing
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars
+from .config import settings
+from .profiling import Profiler
+
+if TYPE_CHECKING:
+    from .backtest_engine import BacktestEngine, BacktestResult
+
+_DONE = object()
+
+
+def prefetch(items: Iterable, depth: int, prepare: Optional[Callable[[Any], Any]] = None) -> Iterator:
+    """
+    Iterate `items` with up to `depth` of them read ahead, and passed
+    through `prepare`, by a background thread. An exception raised while
+    reading surfaces at the position it occurred. Closing the iterator
+    early stops the reader. `depth` <= 0 reads inline.
+    """
+    if depth <= 0:
+        for item in items:
+            yield item if prepare is None else prepare(item)
+        return
+
+    buffer: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry: Tuple[Any, Optional[BaseException]]) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read() -> None:
+        try:
+            for item in items:
+                if not put((item if prepare is None else prepare(item), None)):
+                    return
+        except BaseException as exc:
+            put((_DONE, exc))
+            return
+        put((_DONE, None))
+
+    threading.Thread(target=read, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+@contextmanager
+def process_pool(workers: int) -> Iterator[Optional[ProcessPoolExecutor]]:
+    """
+    A pool of `workers` processes, or None when the work should run inline:
+    one worker, or a daemonic process (Celery prefork children), which may
+    not start children of its own.
+    """
+    if workers <= 1 or multiprocessing.current_process().daemon:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield pool
+
+
+def resident(bars: Bars) -> Bars:
+    """Copy memory-mapped columns into memory, so their pages are read by the caller's thread"""
+    if not any(isinstance(getattr(bars, name), np.memmap) for name in Bars.COLUMNS):
+        return bars
+    return Bars(*(np.array(getattr(bars, name)) for name in Bars.COLUMNS), dataset=bars.dataset)
+
+
+@dataclass
+class BacktestJob:
+    """One queued backtest: the run_backtest arguments"""
+    strategy_code: str
+    strategy_type: str
+    start_date: datetime
+    end_date: datetime
+    asset: Optional[str] = None
+    timeframe: str = "4H"
+    seed: Optional[int] = None
+
+    @property
+    def dataset_key(self) -> Tuple:
+        """Jobs with equal keys backtest the same bars"""
+        asset = self.asset.upper() if self.asset else None
+        return asset, self.timeframe, self.start_date, self.end_date, self.seed
+
+
+@dataclass
+class JobOutcome:
+    job: BacktestJob
+    result: Optional["BacktestResult"] = None
+    error: Optional[BaseException] = None  # the job failed; later jobs still ran
+
+
+class BacktestPipeline:
+    """
+    Runs backtests back to back while a reader thread loads the datasets
+    of the next `depth` jobs (default settings.PIPELINE_PREFETCH).
+    Consecutive jobs with the same dataset_key share one load, so callers
+    that order jobs by dataset load each dataset once.
+
+    Jobs compute in the calling thread, or with `max_workers` > 1 in a
+    process pool with at most that many in flight. Outcomes come back in
+    job order; a failing job yields a JobOutcome with its error.
+    """
+
+    def __init__(
+        self,
+        engine: Optional["BacktestEngine"] = None,
+        depth: Optional[int] = None,
+        max_workers: int = 1,
+    ):
+        from .backtest_engine import BacktestEngine
+
+        self.engine = engine or BacktestEngine()
+        self.depth = settings.PIPELINE_PREFETCH if depth is None else depth
+        self.max_workers = max_workers
+        self.loads = 0
+        self._last: Optional[Tuple[Tuple, Any]] = None  # (dataset_key, bars or load error), reader thread only
+
+    def _load(self, job: BacktestJob) -> Tuple[BacktestJob, Any]:
+        key = job.dataset_key
+        if self._last is None or self._last[0] != key:
+            try:
+                bars = self.engine._load_bars(job.start_date, job.end_date, job.asset, job.timeframe, job.seed)
+                loaded = resident(bars)
+            except Exception as exc:
+                loaded = exc
+            self.loads += 1
+            self._last = (key, loaded)
+        return job, self._last[1]
+
+    def run(self, jobs: Iterable[BacktestJob], use_cache: bool = True) -> Iterator[JobOutcome]:
+        self._last = None
+        loaded = prefetch(jobs, self.depth, self._load)
+        with process_pool(self.max_workers) as pool:
+            if pool is not None:
+                yield from self._run_pool(pool, loaded, use_cache)
+                return
+            while True:
+                profiler = Profiler.from_settings()
+                with profiler.stage("data"):  # time spent waiting on the reader
+                    entry = next(loaded, None)
+                if entry is None:
+                    return
+                job, bars = entry
+                if isinstance(bars, Exception):
+                    yield JobOutcome(job, error=bars)
+                    continue
+                try:
+                    result = self.engine.run_bars(
+                        job.strategy_code, job.strategy_type, bars, use_cache=use_cache, profiler=profiler
+                    )
+                except Exception as exc:
+                    yield JobOutcome(job, error=exc)
+                    continue
+                yield JobOutcome(job, result=result)
+
+    def _run_pool(self, pool: ProcessPoolExecutor, loaded: Iterator, use_cache: bool) -> Iterator[JobOutcome]:
+        config = self.engine.config()
+        pending: Deque[Tuple[BacktestJob, Any]] = deque()
+        for job, bars in loaded:
+            if not isinstance(bars, Exception):
+                bars = pool.submit(_run_job, config, job, bars, use_cache)
+            pending.append((job, bars))
+            if len(pending) >= self.max_workers:
+                yield _outcome(*pending.popleft())
+        while pending:
+            yield _outcome(*pending.popleft())
+
+
+def _outcome(job: BacktestJob, work: Any) -> JobOutcome:
+    if not isinstance(work, Future):
+        return JobOutcome(job, error=work)
+    try:
+        return JobOutcome(job, result=work.result())
+    except Exception as exc:
+        return JobOutcome(job, error=exc)
+
+
+def _run_job(config: Dict, job: BacktestJob, bars: Bars, use_cache: bool) -> "BacktestResult":
+    """Worker: one job over bars loaded by the parent"""
+    from .backtest_engine import BacktestEngine
+
+    return BacktestEngine(**config).run_bars(job.strategy_code, job.strategy_type, bars, use_cache=use_cache)
@@ -0,0 +1,226 @@
+"""
+CLAWARS Portfolio Backtests
+Several assets on one time index, sharing a cash pool
+"""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars
+from .equity import downsample_equity
+from .metrics import MetricsAccumulator
+from .trade_log import TradeLog
+
+if TYPE_CHECKING:
+    from .backtest_engine import BacktestEngine, BacktestResult
+    from .exits import ExitStage
+
+
+class Panel:
+    """
+    Bars of several assets on a shared timestamp index.
+
+    `timestamp` is one int64 column; open/high/low/close/volume are
+    (assets, bars) float64 arrays and `present[a, t]` marks the bars asset
+    `a` actually has. Once an asset has started trading, bars it is missing
+    are filled flat at its previous close with zero volume; before its
+    first bar every column is NaN. Signal engines accept a Panel wherever
+    they accept Bars and return one row of codes per asset.
+    """
+
+    dataset = None  # derived series of a panel are not cached
+
+    def __init__(
+        self,
+        assets: List[str],
+        timestamp: np.ndarray,
+        open: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        close: np.ndarray,
+        volume: np.ndarray,
+        present: np.ndarray,
+        sources: Optional[List[Bars]] = None,
+    ):
+        self.assets = list(assets)
+        self.timestamp = np.ascontiguousarray(timestamp, dtype=np.int64)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.present = present
+        self._sources = sources
+
+        shape = (len(self.assets), len(self.timestamp))
+        for name in Bars.PRICE_COLUMNS + ("present",):
+            if getattr(self, name).shape != shape:
+                raise ValueError(f"Column '{name}' is not shaped {shape}")
+
+    @classmethod
+    def align(cls, bars_by_asset: Dict[str, Bars]) -> "Panel":
+        """Align each asset's bars on the union of their timestamps"""
+        if not bars_by_asset:
+            raise ValueError("A portfolio needs at least one asset")
+        assets = list(bars_by_asset)
+        sources = [bars_by_asset[asset] for asset in assets]
+        timestamp = np.unique(np.concatenate([bars.timestamp for bars in sources]))
+        shape = (len(assets), len(timestamp))
+
+        columns = {name: np.full(shape, np.nan) for name in Bars.PRICE_COLUMNS}
+        present = np.zeros(shape, dtype=bool)
+        for a, bars in enumerate(sources):
+            index = np.searchsorted(timestamp, bars.timestamp)
+            present[a, index] = True
+            for name in Bars.PRICE_COLUMNS:
+                columns[name][a, index] = getattr(bars, name)
+
+        # Index of each asset's latest real bar at every step, -1 before its first
+        latest = np.maximum.accumulate(np.where(present, np.arange(shape[1]), -1), axis=1)
+        started = latest >= 0
+        previous = np.take_along_axis(columns["close"], np.maximum(latest, 0), axis=1)
+        gap = started & ~present
+        for name in ("open", "high", "low", "close"):
+            columns[name] = np.where(gap, previous, columns[name])
+        columns["volume"] = np.where(gap, 0.0, columns["volume"])
+        return cls(assets, timestamp, present=present, sources=sources, **columns)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    def row(self, r: int) -> Bars:
+        """Asset `r` on the shared index (filled gaps, NaN before its first bar)"""
+        return Bars(self.timestamp, *(getattr(self, name)[r] for name in Bars.PRICE_COLUMNS))
+
+    def asset_bars(self, r: int) -> Bars:
+        """Asset `r`'s own bars, as loaded"""
+        if self._sources is not None:
+            return self._sources[r]
+        mask = self.present[r]
+        return Bars(self.timestamp[mask], *(getattr(self, name)[r][mask] for name in Bars.PRICE_COLUMNS))
+
+    def __repr__(self) -> str:
+        return f"Panel(assets={self.assets}, n={len(self)})"
+
+
+@dataclass
+class PortfolioResult:
+    result: "BacktestResult"  # portfolio-level metrics, trades and equity
+    assets: List[str]
+    trade_assets: np.ndarray  # index into `assets` of each trade
+    max_positions: int
+
+    def trades_by_asset(self) -> Dict[str, int]:
+        counts = np.bincount(self.trade_assets, minlength=len(self.assets))
+        return dict(zip(self.assets, counts.tolist()))
+
+
+def simulate_portfolio(
+    engine: "BacktestEngine",
+    panel: Panel,
+    codes: np.ndarray,
+    kelly_fraction: float,
+    max_positions: int,
+    metrics: Optional[MetricsAccumulator] = None,
+    exits: Optional["ExitStage"] = None,
+) -> Tuple[TradeLog, np.ndarray, List[Dict]]:
+    """
+    Execute (assets, bars) signal codes at bar closes with one cash pool.
+
+    Only bars with a signal are visited; within a bar, exits are filled
+    before entries, so freed cash and position slots are usable at once.
+    An entry is skipped while `max_positions` positions are open or the
+    asset already has one. Positions are sized on marked-to-market equity
+    as in the single-asset engine and capped by uncommitted cash; exits
+    filled intrabar by the stage `exits` take its price and reason. Returns
+    the trade log, the asset index of each trade and the equity curve.
+
+    The single-asset engine has no cash cap (its size may be leveraged),
+    so a one-asset portfolio matches BacktestEngine.run_bars only while
+    every entry's notional fits in equity; where the cap binds, trades
+    open and close on the same bars with smaller sizes.
+    """
+    from .backtest_engine import SIGNAL_CODES, SignalType
+
+    long_code = SIGNAL_CODES[SignalType.LONG]
+    close_code = SIGNAL_CODES[SignalType.CLOSE]
+    closes = panel.close
+    timestamps = panel.timestamp
+    n = len(panel)
+
+    rows, bars = np.nonzero(codes)
+    kinds = codes[rows, bars]
+    order = np.lexsort((rows, kinds != close_code, bars))
+
+    trades = TradeLog(max_rows=engine.max_trades)
+    trade_assets: List[int] = []
+    realized = engine.initial_capital
+    committed = 0.0  # entry notional of open positions
+    realized_at = np.zeros(n)  # realized P&L booked at each bar; the first holds the capital
+    realized_at[:1] = engine.initial_capital
+    open_positions: Dict[int, Tuple[float, float, float, int]] = {}  # row -> direction, entry price, size, entry bar
+    spans = []
+
+    for k in order.tolist():
+        r, i, kind = int(rows[k]), int(bars[k]), int(kinds[k])
+        price = float(closes[r, i])
+        if kind == close_code:
+            if r not in open_positions:
+                continue
+            exit_reason = "Signal"
+            if exits is not None:
+                price, exit_reason = exits.fill(i, r)
+            direction, entry_price, size, entry_index = open_positions.pop(r)
+            exit_price = price * (1 - direction * engine.slippage)
+            pnl = direction * (exit_price - entry_price) * size
+            pnl_pct = direction * (exit_price - entry_price) / entry_price * 100
+            pnl -= (entry_price + exit_price) * size * engine.commission
+            trades.append(
+                entry_price=entry_price,
+                exit_price=exit_price,
+                entry_time=int(timestamps[entry_index]),
+                exit_time=int(timestamps[i]),
+                direction="LONG" if direction > 0 else "SHORT",
+                size=size,
+                pnl=pnl,
+                pnl_pct=pnl_pct,
+                exit_reason=exit_reason,
+                entry_bar=entry_index,
+                exit_bar=i,
+            )
+            trade_assets.append(r)
+            if metrics is not None:
+                metrics.add_trade(pnl, pnl_pct)
+            realized += pnl
+            committed -= entry_price * size
+            realized_at[i] += pnl
+            spans.append((r, entry_index, i, direction, entry_price, size))
+        else:
+            if r in open_positions or len(open_positions) >= max_positions:
+                continue
+            direction = 1.0 if kind == long_code else -1.0
+            entry_price = price * (1 + direction * engine.slippage)
+            equity = realized
+            for held, (d, e, s, _) in open_positions.items():
+                equity += d * (float(closes[held, i]) - e) * s
+            size = engine._calculate_position_size(equity, kelly_fraction)
+            size = min(size, max(realized - committed, 0.0) / entry_price)
+            if size <= 0:
+                continue
+            open_positions[r] = (direction, entry_price, size, i)
+            committed += entry_price * size
+
+    for r, (direction, entry_price, size, entry_index) in open_positions.items():
+        spans.append((r, entry_index, n, direction, entry_price, size))
+
+    # Realized equity, plus each position's unrealized P&L over its holding bars
+    equity_bars = np.cumsum(realized_at)
+    for r, start, stop, direction, entry_price, size in spans:
+        equity_bars[start:stop] += direction * (closes[r, start:stop] - entry_price) * size
+
+    if metrics is not None:
+        metrics.add_equity_array(equity_bars)
+    equity_curve = downsample_equity(timestamps, equity_bars, engine.equity_points, engine.initial_capital)
+    return trades, np.asarray(trade_assets, dtype=np.int64), equity_curve
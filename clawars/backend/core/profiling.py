@@ -0,0 +1,236 @@
+"""
+CLAWARS Profiling
+Per-stage wall time, CPU time and memory of a backtest, with sampled
+cProfile / tracemalloc captures of slow stages
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import structlog
+
+from .config import settings
+
+logger = structlog.get_logger()
+
+SAMPLERS = ("cprofile", "tracemalloc")
+
+# Writing "5" resets the process's RSS high-water mark (VmHWM) to its current RSS
+_CLEAR_REFS = "/proc/self/clear_refs"
+_STATUS = "/proc/self/status"
+
+
+def _reset_peak_rss() -> bool:
+    """Start a new RSS high-water mark; False where the kernel offers none (non-Linux)"""
+    try:
+        with open(_CLEAR_REFS, "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def _peak_rss() -> Optional[int]:
+    """VmHWM in bytes: the process's peak RSS since the last reset"""
+    try:
+        with open(_STATUS, "rb") as f:
+            for line in f:
+                if line.startswith(b"VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+@dataclass
+class StageTiming:
+    stage: str
+    wall_seconds: float
+    cpu_seconds: float  # of the thread that ran the stage
+    # Peak RSS during the stage (Linux). The figure is process-wide: memory
+    # held by other threads counts, and concurrent stages reset each other's mark
+    process_peak_rss_bytes: Optional[int] = None
+    peak_bytes: Optional[int] = None  # traced peak within the stage (tracemalloc sampler only)
+    profile: Optional[str] = None  # top functions or allocation sites, when the stage was slow
+    profile_path: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+        }
+        if self.process_peak_rss_bytes is not None:
+            data["process_peak_rss_bytes"] = self.process_peak_rss_bytes
+        if self.peak_bytes is not None:
+            data["peak_bytes"] = self.peak_bytes
+        if self.profile_path is not None:
+            data["profile_path"] = self.profile_path
+        return data
+
+
+class Profiler:
+    """
+    Records a StageTiming for each `with profiler.stage(name):` block.
+
+    Wall time, the running thread's CPU time (a prefetching reader thread
+    is not billed to the stage) and, on Linux, the process's peak RSS
+    within the stage are always recorded; they cost a few clock reads and
+    two small /proc accesses per stage. With a `sampler`, each stage also
+    runs under cProfile or tracemalloc (the latter adds the traced peak
+    allocation). Both slow the stage down several times, which is why
+    from_settings only samples a fraction of runs. A sampled stage that
+    takes longer than `slow_seconds` keeps its top `top` entries in
+    StageTiming.profile and, for cProfile with a `dump_dir`, a .pstats
+    file. Hooks are called with every finished StageTiming.
+    """
+
+    def __init__(
+        self,
+        sampler: Optional[str] = None,
+        slow_seconds: Optional[float] = None,
+        top: int = 15,
+        dump_dir: Optional[str] = None,
+        hooks: Optional[List[Callable[[StageTiming], None]]] = None,
+        **context: Any,
+    ):
+        if sampler is not None and sampler not in SAMPLERS:
+            raise ValueError(f"Unknown sampler: {sampler}")
+        self.sampler = sampler
+        self.slow_seconds = slow_seconds
+        self.top = top
+        self.dump_dir = dump_dir
+        self.hooks = list(hooks or [])
+        self.context = context  # bound to every log line
+        self.stages: List[StageTiming] = []
+
+    @classmethod
+    def from_settings(cls, **context: Any) -> "Profiler":
+        """Profiler configured by the PROFILE_* settings; samples PROFILE_SAMPLE_RATE of runs"""
+        sampled = settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+        return cls(
+            sampler=settings.PROFILE_SAMPLER if sampled else None,
+            slow_seconds=settings.PROFILE_SLOW_STAGE_SECONDS,
+            top=settings.PROFILE_TOP,
+            dump_dir=settings.PROFILE_DIR or None,
+            **context,
+        )
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        profile = traced = None
+        if self.sampler == "cprofile":
+            profile = cProfile.Profile()
+        elif self.sampler == "tracemalloc":
+            traced = not tracemalloc.is_tracing()
+            if traced:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        rss = _reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            timing = StageTiming(
+                stage=name,
+                wall_seconds=time.perf_counter() - wall,
+                cpu_seconds=time.thread_time() - cpu,
+                process_peak_rss_bytes=_peak_rss() if rss else None,
+            )
+            slow = self.slow_seconds is not None and timing.wall_seconds > self.slow_seconds
+            if profile is not None and slow:
+                timing.profile = self._top_functions(profile)
+                timing.profile_path = self._dump(profile, name)
+            if traced is not None:
+                timing.peak_bytes = tracemalloc.get_traced_memory()[1]
+                if slow:
+                    timing.profile = self._top_allocations(tracemalloc.take_snapshot())
+                if traced:
+                    tracemalloc.stop()
+            self._finish(timing, slow)
+
+    def _finish(self, timing: StageTiming, slow: bool) -> None:
+        self.stages.append(timing)
+        if slow:
+            logger.warning(
+                "Slow backtest stage",
+                stage=timing.stage,
+                wall_seconds=round(timing.wall_seconds, 3),
+                sampler=self.sampler,
+                profile=timing.profile,
+                profile_path=timing.profile_path,
+                **self.context,
+            )
+        for hook in self.hooks:
+            hook(timing)
+
+    def _top_functions(self, profile: cProfile.Profile) -> str:
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.top)
+        return out.getvalue()
+
+    def _top_allocations(self, snapshot: tracemalloc.Snapshot) -> str:
+        return "\n".join(str(stat) for stat in snapshot.statistics("lineno")[:self.top])
+
+    def _dump(self, profile: cProfile.Profile, stage: str) -> Optional[str]:
+        if not self.dump_dir:
+            return None
+        label = "-".join(str(value) for value in self.context.values()) or "backtest"
+        path = os.path.join(self.dump_dir, f"{label}-{stage}-{int(time.time() * 1000)}.pstats")
+        try:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            profile.dump_stats(path)
+        except OSError:
+            return None  # the summary is still in the log line
+        return path
+
+    # Results
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(timing.wall_seconds for timing in self.stages)
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Stage name -> timings, in run order (attached to BacktestResult.timings).
+        A stage entered repeatedly (once per chunk when streaming) sums its
+        times, keeps its largest memory figures and counts its `calls`.
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        for timing in self.stages:
+            entry = timing.to_dict()
+            total = stages.get(timing.stage)
+            if total is None:
+                stages[timing.stage] = entry
+                continue
+            total["calls"] = total.get("calls", 1) + 1
+            for name in ("wall_seconds", "cpu_seconds"):
+                total[name] = round(total[name] + entry[name], 6)
+            for name in ("process_peak_rss_bytes", "peak_bytes"):
+                if name in entry:
+                    total[name] = max(total.get(name, 0), entry[name])
+            if "profile_path" in entry:
+                total["profile_path"] = entry["profile_path"]
+        return stages
+
+    def emit(self, **fields: Any) -> None:
+        """Log the stage breakdown as one structlog event"""
+        logger.info(
+            "Backtest stages",
+            total_seconds=round(self.total_seconds, 6),
+            stages=self.as_dict(),
+            sampler=self.sampler,
+            **self.context,
+            **fields,
+        )
@@ -0,0 +1,210 @@
+"""
+CLAWARS Resampler
+Higher-timeframe OHLCV built from one stored base resolution, cached per
+(asset, timeframe) and extended incrementally as base bars arrive
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars, MS_PER_HOUR, TimeLike
+from .config import settings
+
+if TYPE_CHECKING:
+    from .data_store import BarStore
+
+
+# Weekly buckets start on Monday 00:00 UTC; the epoch fell on a Thursday
+WEEK_OFFSET_MS = 4 * 24 * MS_PER_HOUR
+
+
+def resample(bars: Bars, period: int, offset: int = 0) -> Tuple[Bars, np.ndarray]:
+    """
+    Aggregate bars into `period` buckets aligned to `offset` with one
+    reduceat per column; returns the bars and each source bar's bucket index
+    """
+    bucket = (bars.timestamp - offset) // period
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+    resampled = Bars(
+        timestamp=bucket[starts] * period + offset,
+        open=bars.open[starts],
+        high=np.maximum.reduceat(bars.high, starts),
+        low=np.minimum.reduceat(bars.low, starts),
+        close=bars.close[ends],
+        volume=np.add.reduceat(bars.volume, starts),
+    )
+    group = np.cumsum(np.r_[True, bucket[1:] != bucket[:-1]]) - 1
+    return resampled, group
+
+
+def timeframe_bucket(timeframe: str) -> Tuple[int, int]:
+    """(period ms, alignment offset ms) of a TIMEFRAMES code"""
+    from .data_store import timeframe_ms
+
+    period = timeframe_ms(timeframe)
+    return period, WEEK_OFFSET_MS if timeframe == "1W" else 0
+
+
+@dataclass
+class _Aggregate:
+    bars: Bars  # the last bucket may still be filling
+    revision: str  # base dataset id it reflects
+    closed: int  # leading buckets whose base bars are all in; the rest is served once they are
+
+
+def _closed(bars: Bars, source: Bars, period: int, base_period: int) -> int:
+    """Buckets of `bars` (aggregated from `source`) the base series has reached the end of"""
+    if not len(bars):
+        return 0
+    through = int(source.timestamp[-1]) + base_period  # end of the last base bar
+    return len(bars) if through >= int(bars.timestamp[-1]) + period else len(bars) - 1
+
+
+class Resampler:
+    """
+    Any timeframe of a stored asset, built from its finest stored series
+    that divides the timeframe.
+
+    Aggregates are kept per (asset, timeframe) in an LRU of `max_entries`.
+    When the base series changes, only the last (possibly partial) bucket
+    onward is re-aggregated, provided the store reports every write since
+    the cached revision at or after that bucket; any other change, or one
+    the store cannot account for, rebuilds the aggregate. A last bucket
+    the base series has not reached the end of is kept for extension but
+    not served, so backtests never see a bar that is still forming.
+    """
+
+    def __init__(self, store: Optional["BarStore"] = None, max_entries: int = 32):
+        self._store = store
+        self._bound: Optional["BarStore"] = None  # store the cached aggregates came from
+        self.max_entries = max_entries
+        self._lock = threading.RLock()  # backtests load on worker threads
+        self._aggregates: "OrderedDict[Tuple[str, str], _Aggregate]" = OrderedDict()
+        self.builds = 0
+        self.extensions = 0
+        self.hits = 0
+
+    @property
+    def store(self) -> "BarStore":
+        """The given store, or the current default one"""
+        store = self._store
+        if store is None:
+            from .data_store import get_bar_store
+
+            store = get_bar_store()
+        with self._lock:
+            if store is not self._bound:
+                self._aggregates.clear()
+                self._bound = store
+        return store
+
+    def base_timeframe(self, asset: str, timeframe: str) -> Optional[str]:
+        """Finest stored timeframe `timeframe` can be built from (itself if stored)"""
+        if self.store.has(asset, timeframe):
+            return timeframe
+        period, offset = timeframe_bucket(timeframe)
+        for candidate in self.store.timeframes(asset):  # finest first
+            base = timeframe_bucket(candidate)[0]
+            if period % base == 0 and offset % base == 0 and self.store.has(asset, candidate):
+                return candidate
+        return None
+
+    def has(self, asset: str, timeframe: str) -> bool:
+        return self.base_timeframe(asset, timeframe) is not None
+
+    def bars(
+        self,
+        asset: str,
+        timeframe: str,
+        start: Optional[TimeLike] = None,
+        end: Optional[TimeLike] = None,
+    ) -> Bars:
+        """Bars of `timeframe` with start <= timestamp <= end, stored or aggregated"""
+        base = self.base_timeframe(asset, timeframe)
+        if base is None:
+            return Bars.empty()
+        if base == timeframe:
+            return self.store.bars(asset, timeframe, start, end)
+        with self._lock:
+            aggregate = self._aggregate(asset.upper(), base, timeframe)
+            aggregated = aggregate.bars
+            if aggregate.closed < len(aggregated):
+                aggregated = aggregated[:aggregate.closed]
+        return aggregated.between(start, end)
+
+    # Aggregation
+
+    def _aggregate(self, asset: str, base: str, timeframe: str) -> _Aggregate:
+        key = (asset, timeframe)
+        revision = self.store.dataset_id(asset, base)
+        aggregate = self._aggregates.get(key)
+        if aggregate is not None and aggregate.revision == revision:
+            self.hits += 1
+        elif aggregate is not None and self._extend(aggregate, asset, base, timeframe, revision):
+            self.extensions += 1
+        else:
+            aggregate = self._build(asset, base, timeframe, revision)
+            self.builds += 1
+        self._aggregates[key] = aggregate
+        self._aggregates.move_to_end(key)
+        while len(self._aggregates) > self.max_entries:
+            self._aggregates.popitem(last=False)
+        return aggregate
+
+    def _build(self, asset: str, base: str, timeframe: str, revision: str) -> _Aggregate:
+        source = self.store.bars(asset, base)
+        period, offset = timeframe_bucket(timeframe)
+        resampled, _ = resample(source, period, offset)
+        resampled.dataset = f"{revision}>{timeframe}"
+        return _Aggregate(resampled, revision, _closed(resampled, source, period, timeframe_bucket(base)[0]))
+
+    def _extend(self, aggregate: _Aggregate, asset: str, base: str, timeframe: str, revision: str) -> bool:
+        """Re-aggregate from the last cached bucket on, if no base bar before it was written since"""
+        cached = aggregate.bars
+        if not len(cached):
+            return False
+        last = int(cached.timestamp[-1])
+        first = self.store.first_change_since(asset, base, aggregate.revision)
+        if first is None or first < last:
+            return False
+        tail = self.store.bars(asset, base, start=last)
+        period, offset = timeframe_bucket(timeframe)
+        resampled, _ = resample(tail, period, offset)
+        aggregate.bars = Bars(*(
+            np.concatenate([getattr(cached, name)[:-1], getattr(resampled, name)]) for name in Bars.COLUMNS
+        ), dataset=f"{revision}>{timeframe}")
+        aggregate.revision = revision
+        aggregate.closed = len(cached) - 1 + _closed(resampled, tail, period, timeframe_bucket(base)[0])
+        return True
+
+    # Metrics
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._aggregates),
+                "builds": self.builds,
+                "extensions": self.extensions,
+                "hits": self.hits,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._aggregates.clear()
+            self.builds = self.extensions = self.hits = 0
+
+
+_default_resampler: Optional[Resampler] = None
+
+
+def get_resampler() -> Resampler:
+    """Process-wide resampler over the default bar store"""
+    global _default_resampler
+    if _default_resampler is None:
+        _default_resampler = Resampler(max_entries=settings.RESAMPLE_CACHE_SIZE)
+    return _default_resampler
@@ -0,0 +1,93 @@
+"""
+CLAWARS Result Cache
+Backtest results keyed by strategy, data version, engine version and costs
+"""
+
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from .bars import Bars
+from .config import settings
+from .pickle_cache import PickleCache
+from .strategy_cache import code_hash
+from .trade_log import TradeLog
+
+if TYPE_CHECKING:
+    from .backtest_engine import BacktestResult
+
+
+def result_key(
+    code: str,
+    strategy_type: str,
+    bars: Bars,
+    engine_config: Dict[str, Any],
+    engine_version: str,
+) -> Optional[str]:
+    """
+    Digest of everything a backtest result depends on, or None when the
+    bars have no dataset id (unseeded synthetic data is never reused).
+    The dataset id carries the store revision, so new data changes the key.
+    """
+    if bars.dataset is None or not len(bars):
+        return None
+    window = (int(bars.timestamp[0]), int(bars.timestamp[-1]), len(bars))
+    content = json.dumps(
+        [engine_version, strategy_type, code_hash(code), bars.dataset, window, engine_config],
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ResultCache(PickleCache):
+    """
+    BacktestResult objects by result_key, with trades stored in TradeLog's
+    binary form. Results from another engine or data version are never
+    looked up again, since both are part of the key; get_result_cache
+    also files entries under the engine version so prune drops old ones.
+    """
+
+    def get(self, key: str) -> Optional["BacktestResult"]:
+        """The stored result for `key`, counting the lookup as a hit or miss"""
+        return self._fetch(key)
+
+    def put(self, key: str, result: "BacktestResult") -> None:
+        self._store(key, result)
+
+    def _encode(self, result: "BacktestResult") -> Dict[str, Any]:
+        return {
+            "metrics": result.summary(),
+            "equity_curve": result.equity_curve,
+            "trades": result.trades.to_bytes(),
+            "timings": result.timings,
+        }
+
+    def _decode(self, entry: Dict[str, Any]) -> "BacktestResult":
+        from .backtest_engine import BacktestResult
+
+        return BacktestResult(
+            equity_curve=entry["equity_curve"],
+            trades=TradeLog.from_bytes(entry["trades"]),
+            timings=entry.get("timings", {}),
+            **entry["metrics"],
+        )
+
+
+_default_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache rooted at settings.RESULT_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        from .backtest_engine import ENGINE_VERSION
+        from .pine_compiler import COMPILER_VERSION
+
+        _default_cache = ResultCache(
+            settings.RESULT_CACHE_DIR,
+            settings.RESULT_CACHE_SIZE,
+            version=f"{ENGINE_VERSION}.{COMPILER_VERSION}",
+            max_disk_bytes=settings.RESULT_CACHE_DISK_MB * 1024 * 1024,
+        )
+    return _default_cache
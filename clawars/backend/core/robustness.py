@@ -0,0 +1,185 @@
+"""
+CLAWARS Robustness Analysis
+Bootstrap and Monte Carlo confidence intervals for backtest metrics
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import numpy as np
+
+SQRT_252 = 252 ** 0.5
+
+# Resampled trades per bootstrap block; bounds batch_metrics' (block, trades) temporaries
+_BOOTSTRAP_CELLS = 1 << 20
+
+METRICS = (
+    "win_rate",
+    "profit_factor",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "max_drawdown",
+    "avg_trade_pnl",
+    "total_return",
+    "composite_score",
+)
+
+
+@dataclass
+class MetricInterval:
+    point: Optional[float]  # value from the original backtest, if any
+    mean: float
+    lower: float
+    upper: float
+
+
+@dataclass
+class RobustnessReport:
+    confidence: float
+    point: Dict[str, float]
+    bootstrap: Dict[str, MetricInterval] = field(default_factory=dict)
+    monte_carlo: Dict[str, MetricInterval] = field(default_factory=dict)
+    n_resamples: int = 0
+    n_paths: int = 0
+
+
+def batch_metrics(
+    pnl: np.ndarray,
+    pnl_pct: np.ndarray,
+    initial_capital: float,
+    valid: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    BacktestEngine._calculate_metrics for many trade sequences at once.
+
+    `pnl` and `pnl_pct` are (samples, trades); `valid` masks padding when
+    samples have different trade counts. Drawdown is measured on the
+    trade-by-trade equity path.
+    """
+    if valid is None:
+        valid = np.ones(pnl.shape, dtype=bool)
+    pnl = np.where(valid, pnl, 0.0)
+    pnl_pct = np.where(valid, pnl_pct, 0.0)
+    total = valid.sum(axis=1)
+    safe_total = np.maximum(total, 1)
+
+    wins = pnl > 0
+    win_rate = wins.sum(axis=1) / safe_total * 100
+    gross_profit = np.where(wins, pnl, 0.0).sum(axis=1)
+    gross_loss = np.abs(np.where(valid & ~wins, pnl, 0.0).sum(axis=1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        profit_factor = np.where(gross_loss > 0, gross_profit / gross_loss, 0.0)
+    net = pnl.sum(axis=1)
+    avg_trade_pnl = net / safe_total
+    total_return = net / initial_capital * 100
+
+    # Sharpe / Sortino over non-zero percentage returns
+    returns = pnl_pct != 0
+    mean, std, count = _masked_mean_std(pnl_pct, returns)
+    down_mean, down_std, down_count = _masked_mean_std(pnl_pct, returns & (pnl_pct < 0))
+    downside_std = np.where(down_count > 1, down_std, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where((count > 1) & (std > 0), mean / std * SQRT_252, 0.0)
+        sortino = np.where((count > 1) & (downside_std > 0), mean / downside_std * SQRT_252, 0.0)
+
+    # Max drawdown along the equity path, peak seeded with initial capital
+    equity = initial_capital + np.cumsum(pnl, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, initial_capital), axis=1)
+    drawdown = np.minimum(((equity - peak) / peak * 100).min(axis=1, initial=0.0), 0.0)
+
+    score = (
+        np.minimum(sharpe, 5) * 0.4 +
+        np.minimum(profit_factor, 3) * 0.3 +
+        win_rate * 0.2 -
+        np.abs(drawdown) * 0.1
+    )
+    score = np.round(np.clip(score, 0, 100), 2)
+
+    empty = total == 0
+    metrics = {
+        "win_rate": win_rate,
+        "profit_factor": profit_factor,
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "max_drawdown": drawdown,
+        "avg_trade_pnl": avg_trade_pnl,
+        "total_return": total_return,
+        "composite_score": score,
+    }
+    return {name: np.where(empty, 0.0, values) for name, values in metrics.items()}
+
+
+def _masked_mean_std(values: np.ndarray, mask: np.ndarray):
+    """Row-wise mean and sample std over masked entries"""
+    count = mask.sum(axis=1)
+    safe = np.maximum(count, 1)
+    mean = np.where(mask, values, 0.0).sum(axis=1) / safe
+    deviations = np.where(mask, values - mean[:, None], 0.0)
+    var = (deviations * deviations).sum(axis=1) / np.maximum(count - 1, 1)
+    return mean, np.sqrt(var), count
+
+
+def bootstrap_intervals(
+    pnl: np.ndarray,
+    pnl_pct: np.ndarray,
+    initial_capital: float,
+    n_resamples: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    point: Optional[Dict[str, float]] = None,
+) -> Dict[str, MetricInterval]:
+    """
+    Resample the trade sequence with replacement (pnl and pnl_pct together)
+    and summarize every metric across all resamples. Resamples are drawn
+    and measured in blocks of about _BOOTSTRAP_CELLS trades, so memory
+    stays bounded while only the per-resample metrics are kept.
+    """
+    pnl = np.asarray(pnl, dtype=np.float64)
+    pnl_pct = np.asarray(pnl_pct, dtype=np.float64)
+    if len(pnl) == 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    metrics = {name: np.empty(n_resamples) for name in METRICS}
+    block = max(1, _BOOTSTRAP_CELLS // len(pnl))
+    for lo in range(0, n_resamples, block):
+        hi = min(lo + block, n_resamples)
+        picks = rng.integers(0, len(pnl), size=(hi - lo, len(pnl)))
+        for name, values in batch_metrics(pnl[picks], pnl_pct[picks], initial_capital).items():
+            metrics[name][lo:hi] = values
+    return summarize(metrics, confidence, point)
+
+
+def summarize(
+    metrics: Dict[str, np.ndarray],
+    confidence: float,
+    point: Optional[Dict[str, float]] = None,
+) -> Dict[str, MetricInterval]:
+    """Percentile intervals per metric; non-finite samples are ignored"""
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name in METRICS:
+        values = metrics[name]
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            continue
+        lower, upper = np.percentile(values, [tail, 100 - tail])
+        intervals[name] = MetricInterval(
+            point=point.get(name) if point else None,
+            mean=float(values.mean()),
+            lower=float(lower),
+            upper=float(upper),
+        )
+    return intervals
+
+
+def pad_trades(sequences) -> tuple:
+    """Stack ragged (pnl, pnl_pct) sequences into padded arrays plus a validity mask"""
+    width = max((len(p) for p, _ in sequences), default=0)
+    pnl = np.zeros((len(sequences), width))
+    pnl_pct = np.zeros((len(sequences), width))
+    valid = np.zeros((len(sequences), width), dtype=bool)
+    for i, (p, r) in enumerate(sequences):
+        pnl[i, :len(p)] = p
+        pnl_pct[i, :len(r)] = r
+        valid[i, :len(p)] = True
+    return pnl, pnl_pct, valid
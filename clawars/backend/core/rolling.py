@@ -0,0 +1,273 @@
+"""
+CLAWARS Rolling Statistics
+O(1)-per-bar incremental window statistics shared by backtests and live strategies
+"""
+
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Optional
+
+
+class RollingSum:
+    """
+    Sum over the last `window` values.
+    The running total is rebuilt from the window periodically so float
+    drift from add/remove pairs cannot accumulate without bound.
+    """
+
+    RESYNC_EVERY = 16  # window lengths of updates between exact rebuilds
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        """Push a value and return the current window sum"""
+        self.values.append(value)
+        self.total += value
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+
+        self._updates += 1
+        if self._updates >= self.RESYNC_EVERY * self.window:
+            self.total = math.fsum(self.values)
+            self._updates = 0
+        return self.total
+
+    @property
+    def ready(self) -> bool:
+        """True once the window is full"""
+        return len(self.values) == self.window
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    def get_state(self) -> Dict:
+        return {"window": self.window, "values": list(self.values)}
+
+    def set_state(self, state: Dict) -> None:
+        self.window = state["window"]
+        self.values = deque(state["values"])
+        self.total = math.fsum(self.values)
+        self._updates = 0
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingSum":
+        obj = cls(state["window"])
+        obj.set_state(state)
+        return obj
+
+
+class RollingMean(RollingSum):
+    """Mean over the last `window` values"""
+
+    def update(self, value: float) -> float:
+        """Push a value and return the current window mean"""
+        super().update(value)
+        return self.mean
+
+    @property
+    def mean(self) -> float:
+        return self.total / len(self.values) if self.values else 0.0
+
+
+class RollingVariance:
+    """
+    Mean and sample variance over the last `window` values.
+    Welford's update with removal of the value leaving the window.
+    """
+
+    RESYNC_EVERY = 16
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0  # sum of squared deviations from the mean
+        self._updates = 0
+
+    def update(self, value: float) -> float:
+        """Push a value and return the current sample variance"""
+        self.values.append(value)
+        n = len(self.values)
+
+        if n > self.window:
+            # Replace the oldest value in one step (window size unchanged)
+            old = self.values.popleft()
+            n -= 1
+            delta = value - old
+            old_mean = self.mean
+            self.mean += delta / n
+            self.m2 += delta * (value - self.mean + old - old_mean)
+        else:
+            delta = value - self.mean
+            self.mean += delta / n
+            self.m2 += delta * (value - self.mean)
+
+        self._updates += 1
+        if self._updates >= self.RESYNC_EVERY * self.window:
+            self._resync()
+        return self.variance
+
+    def _resync(self) -> None:
+        """Recompute mean and M2 exactly from the window"""
+        n = len(self.values)
+        self.mean = math.fsum(self.values) / n if n else 0.0
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+        self._updates = 0
+
+    @property
+    def ready(self) -> bool:
+        return len(self.values) == self.window
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def variance(self) -> float:
+        n = len(self.values)
+        return max(self.m2, 0.0) / (n - 1) if n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def get_state(self) -> Dict:
+        return {"window": self.window, "values": list(self.values)}
+
+    def set_state(self, state: Dict) -> None:
+        self.window = state["window"]
+        self.values = deque(state["values"])
+        self._resync()
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingVariance":
+        obj = cls(state["window"])
+        obj.set_state(state)
+        return obj
+
+
+class _RollingExtreme(ABC):
+    """Monotonic-deque window extreme; amortized O(1) per update"""
+
+    def __init__(self, window: int):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = window
+        self.candidates = deque()  # (index, value), values monotonic
+        self.index = 0
+
+    @abstractmethod
+    def _dominates(self, new: float, old: float) -> bool:
+        """True when `new` makes the earlier candidate `old` irrelevant"""
+
+    def update(self, value: float) -> float:
+        """Push a value and return the current window extreme"""
+        while self.candidates and self._dominates(value, self.candidates[-1][1]):
+            self.candidates.pop()
+        self.candidates.append((self.index, value))
+        if self.candidates[0][0] <= self.index - self.window:
+            self.candidates.popleft()
+        self.index += 1
+        return self.candidates[0][1]
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.candidates[0][1] if self.candidates else None
+
+    @property
+    def ready(self) -> bool:
+        return self.index >= self.window
+
+    def get_state(self) -> Dict:
+        return {
+            "window": self.window,
+            "index": self.index,
+            "candidates": [list(c) for c in self.candidates],
+        }
+
+    def set_state(self, state: Dict) -> None:
+        self.window = state["window"]
+        self.index = state["index"]
+        self.candidates = deque((i, v) for i, v in state["candidates"])
+
+    @classmethod
+    def from_state(cls, state: Dict):
+        obj = cls(state["window"])
+        obj.set_state(state)
+        return obj
+
+
+class RollingMin(_RollingExtreme):
+    """Minimum over the last `window` values"""
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new <= old
+
+
+class RollingMax(_RollingExtreme):
+    """Maximum over the last `window` values"""
+
+    def _dominates(self, new: float, old: float) -> bool:
+        return new >= old
+
+
+class EMA:
+    """
+    Exponential moving average, alpha = 2 / (length + 1), matching Pine's
+    ta.ema and the compiled core.pine_compiler series: na (nan) until
+    `length` values have arrived, seeded with their simple mean, and
+    restarted by a nan or infinite input.
+    """
+
+    def __init__(self, length: int):
+        if length < 1:
+            raise ValueError("length must be >= 1")
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.value = math.nan
+        self.count = 0  # values since the last restart
+        self.seed_sum = 0.0  # of those values, until the seed is taken
+
+    def update(self, value: float) -> float:
+        """Push a value and return the current average (nan while warming up)"""
+        if not math.isfinite(value):
+            self.value, self.count, self.seed_sum = math.nan, 0, 0.0
+            return self.value
+        self.count += 1
+        if self.count < self.length:
+            self.seed_sum += value
+        elif self.count == self.length:
+            self.value = (self.seed_sum + value) / self.length
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.length
+
+    def get_state(self) -> Dict:
+        return {"length": self.length, "value": self.value, "count": self.count, "seed_sum": self.seed_sum}
+
+    def set_state(self, state: Dict) -> None:
+        self.length = state["length"]
+        self.alpha = 2.0 / (self.length + 1)
+        self.value = math.nan if state["value"] is None else state["value"]
+        self.count = state["count"]
+        self.seed_sum = state.get("seed_sum", 0.0)
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "EMA":
+        obj = cls(state["length"])
+        obj.set_state(state)
+        return obj
@@ -0,0 +1,302 @@
+"""
+CLAWARS Strategy Sandbox
+Pool of pre-started, resource-limited interpreters that fork a process per Python strategy run
+"""
+
+import atexit
+import json
+import math
+import multiprocessing.connection
+import os
+import pwd
+import queue
+import socket
+import subprocess
+import sys
+import threading
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .bars import Bars
+from .config import settings
+from .sandbox_child import _MAX_HEADER, ALLOWED_MODULES
+
+_CHILD_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_child.py")
+
+# Everything a sandbox inherits from the environment; a run gets one core
+_CHILD_ENV = {"PATH": os.defpath, "OPENBLAS_NUM_THREADS": "1", "OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1"}
+
+
+class SandboxError(RuntimeError):
+    """A strategy failed, misbehaved or exceeded its limits"""
+
+
+def _layout(n: int) -> int:
+    """Bytes for timestamp + five price columns"""
+    return 8 * n * len(Bars.COLUMNS)
+
+
+def _views(buffer, n: int) -> Dict[str, np.ndarray]:
+    columns = {}
+    for i, name in enumerate(Bars.COLUMNS):
+        dtype = np.int64 if name == "timestamp" else np.float64
+        columns[name] = np.ndarray((n,), dtype=dtype, buffer=buffer, offset=8 * n * i)
+    return columns
+
+
+def _sandbox_user(user: Optional[str]) -> Tuple[int, int]:
+    """(uid, gid) a sandbox switches to, or (-1, -1) when it keeps this process's user"""
+    if not user or os.geteuid() != 0:
+        return -1, -1  # only root can switch; the syscall filter still applies
+    try:
+        entry = pwd.getpwnam(user)
+    except KeyError:
+        raise SandboxError(f"Sandbox user {user!r} does not exist") from None
+    return entry.pw_uid, entry.pw_gid
+
+
+def _checked_params(params: Any) -> Dict[str, Any]:
+    """Parameters a strategy set, validated here since the sandbox is not trusted"""
+    if not isinstance(params, dict) or set(params) - {"kelly_fraction"}:
+        raise SandboxError("Sandbox sent unexpected parameters")
+    checked = {}
+    if "kelly_fraction" in params:
+        kelly = params["kelly_fraction"]
+        if isinstance(kelly, bool) or not isinstance(kelly, (int, float)) or not math.isfinite(kelly) or kelly <= 0:
+            raise SandboxError(f"KELLY_FRACTION must be a number in (0, 1], got {kelly!r}")
+        checked["kelly_fraction"] = min(float(kelly), 1.0)
+    return checked
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+
+class _Sandbox:
+    """
+    One child interpreter (core/sandbox_child.py) and the shared-memory
+    segment it reads bars from. The segment keeps its owner-only mode; the
+    sandbox gets a read-only descriptor to it over the socket instead.
+    """
+
+    def __init__(self, memory_mb: int, cpu_seconds: int, uid: int, gid: int, seccomp: bool):
+        parent, child = socket.socketpair()
+        self.segment: Optional[shared_memory.SharedMemory] = None
+        self.broken = False
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, "-I", "-B", _CHILD_SCRIPT, str(child.fileno()),
+                 str(memory_mb), str(cpu_seconds), str(uid), str(gid), str(int(seccomp))],
+                env=_CHILD_ENV,
+                cwd="/",
+                pass_fds=(child.fileno(),),
+                stdin=subprocess.DEVNULL,
+            )
+        finally:
+            child.close()
+        self._socket = parent
+        self.conn = multiprocessing.connection.Connection(os.dup(parent.fileno()))
+        try:
+            header, _ = self._reply(60.0)
+        except SandboxError as e:
+            header = {"error": str(e)}
+        if header.get("status") != "ready":
+            self.close()
+            raise SandboxError(f"Sandbox failed to start: {header.get('error', header)}")
+
+    def run(self, code: str, bars: Bars, timeout: float) -> Tuple[np.ndarray, Dict[str, Any]]:
+        n = len(bars)
+        size = _layout(n)
+        if self.segment is None or self.segment.size < size:
+            self._release_segment()
+            self.segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self._send_segment()
+        columns = _views(self.segment.buf, n)
+        try:
+            for name in Bars.COLUMNS:
+                columns[name][:] = getattr(bars, name)
+        finally:
+            # Views into the segment must be gone before it can be closed
+            del columns
+        # The sandbox forks a process per run; only that process reads the code
+        self.conn.send(("run", Bars.COLUMNS, n))
+        self.conn.send_bytes(code.encode("utf-8"))
+        header, payload = self._reply(timeout)
+        if header.get("retire"):
+            self.broken = True
+        if self.conn.poll(0):
+            self.broken = True  # the strategy wrote to the pipe itself
+            raise SandboxError("Sandbox sent more than one reply")
+        if header.get("status") != "ok":
+            raise SandboxError(str(header.get("error", "Strategy failed"))[:2000])
+        signals = np.frombuffer(payload, dtype=np.int8)
+        if signals.shape != (n,) or signals.min(initial=0) < 0 or signals.max(initial=0) > 3:
+            raise SandboxError("Sandbox returned malformed signals")
+        return signals.copy(), _checked_params(header.get("params", {}))
+
+    def _reply(self, timeout: float) -> Tuple[Dict[str, Any], bytes]:
+        """Header and signal bytes of one reply; nothing from a sandbox is unpickled"""
+        try:
+            if not self.conn.poll(timeout):
+                self.broken = True
+                raise SandboxError(f"Strategy timed out after {timeout:g}s")
+            header = json.loads(self.conn.recv_bytes(_MAX_HEADER))
+            if not self.conn.poll(timeout):
+                self.broken = True
+                raise SandboxError(f"Strategy timed out after {timeout:g}s")
+            payload = self.conn.recv_bytes()
+        except (EOFError, OSError):
+            self.broken = True
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+            raise SandboxError(f"Strategy sandbox died (exit code {self.process.returncode})") from None
+        except ValueError:
+            self.broken = True
+            raise SandboxError("Sandbox sent a malformed reply") from None
+        if not isinstance(header, dict):
+            self.broken = True
+            raise SandboxError("Sandbox sent a malformed reply")
+        return header, payload
+
+    def _send_segment(self) -> None:
+        fd = os.open(os.path.join("/dev/shm", self.segment.name.lstrip("/")), os.O_RDONLY)
+        try:
+            self.conn.send(("segment", self.segment.size))
+            socket.send_fds(self._socket, [b"\0"], [fd])
+        finally:
+            os.close(fd)
+
+    def _release_segment(self) -> None:
+        if self.segment is not None:
+            self.segment.close()
+            self.segment.unlink()
+            self.segment = None
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            try:
+                self.conn.send(("close",))
+            except OSError:
+                pass
+            try:
+                self.process.wait(1)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.conn.close()
+        self._socket.close()
+        self._release_segment()
+
+
+class SandboxPool:
+    """
+    Pre-started sandboxes for Python strategies.
+
+    Each sandbox is an interpreter started with an empty environment
+    that imports numpy and confines itself once, then forks a fresh
+    process for every backtest, so strategies from different users never
+    share an interpreter and nothing of a run outlives it (a strategy is
+    compiled on every run). Confinement does not rely on the import
+    allowlist (module attributes reach os): the sandbox sets its limits
+    (address space, no file writes), drops to `user` when the pool runs
+    as root, and installs a syscall filter (`seccomp`, Linux
+    x86_64/aarch64) that denies networking, running programs, changing
+    or writing files and signalling or tracing other processes. Each run
+    process adds a CPU budget and a stricter filter that also denies
+    forking. A sandbox started without root keeps the worker's user and
+    can read what that user can read, so production workers should start
+    as root or under an account of their own.
+
+    Bars travel through a shared-memory segment owned by the parent and
+    passed to the sandbox as a read-only descriptor; signals and
+    parameters come back as raw bytes and JSON, never pickles, and are
+    validated here. A sandbox that times out, crashes or hits a limit is
+    replaced and the run raises SandboxError.
+
+    A strategy defines `generate_signals(bars)` returning one signal per
+    bar, as codes (0 HOLD, 1 LONG, 2 SHORT, 3 CLOSE) or their names, and
+    may set KELLY_FRACTION (in (0, 1]; larger values are clamped to 1).
+    `bars` exposes read-only numpy columns timestamp, open, high, low,
+    close and volume. Imports are limited to ALLOWED_MODULES.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        memory_mb: int = 1024,
+        cpu_seconds: int = 60,
+        timeout: float = 120.0,
+        user: Optional[str] = "nobody",
+        seccomp: bool = True,
+    ):
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.timeout = timeout
+        self.uid, self.gid = _sandbox_user(user)
+        self.seccomp = seccomp
+        self._idle: "queue.Queue[_Sandbox]" = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._add()
+
+    def _add(self) -> None:
+        sandbox = _Sandbox(self.memory_mb, self.cpu_seconds, self.uid, self.gid, self.seccomp)
+        with self._lock:
+            self._all.append(sandbox)
+        self._idle.put(sandbox)
+
+    def _discard(self, sandbox: _Sandbox) -> None:
+        with self._lock:
+            self._all.remove(sandbox)
+        sandbox.close()
+
+    def run(self, code: str, bars: Bars) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """int8 signal codes for `bars`, and the parameters the strategy set"""
+        sandbox = self._idle.get()
+        try:
+            return sandbox.run(code, bars, self.timeout)
+        except BaseException as e:
+            # A strategy that raised leaves its sandbox usable; anything else replaces it
+            sandbox.broken = sandbox.broken or not isinstance(e, SandboxError)
+            raise
+        finally:
+            if sandbox.broken:
+                self._discard(sandbox)
+                self._add()
+            else:
+                self._idle.put(sandbox)
+
+    def close(self) -> None:
+        with self._lock:
+            sandboxes, self._all = self._all, []
+        for sandbox in sandboxes:
+            sandbox.close()
+
+    def __enter__(self) -> "SandboxPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_pool: Optional[SandboxPool] = None
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """Process-wide pool sized by settings.SANDBOX_*; started on first use"""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = SandboxPool(
+            settings.SANDBOX_POOL_SIZE,
+            settings.SANDBOX_MEMORY_MB,
+            settings.SANDBOX_CPU_SECONDS,
+            settings.SANDBOX_TIMEOUT_SECONDS,
+            settings.SANDBOX_USER,
+            settings.SANDBOX_SECCOMP,
+        )
+        atexit.register(_default_pool.close)
+    return _default_pool
@@ -0,0 +1,395 @@
+"""
+CLAWARS Strategy Sandbox Child
+The interpreter Python strategies run under. Started by core.sandbox as a
+script (`python -I -B sandbox_child.py ...`) with an empty environment;
+it imports nothing from the project, so no settings or secrets are loaded.
+It confines itself once and then forks a fresh, further confined process
+for every run, so no strategy shares an interpreter with another.
+"""
+
+import builtins
+import ctypes
+import errno
+import json
+import mmap
+import os
+import platform
+import resource
+import signal
+import socket
+import struct
+import sys
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# Modules a strategy may import. This (like the builtins denylist) only keeps
+# honest strategies tidy: module attributes reach os, sys and the rest. The
+# isolation is the process: a fresh fork per run, an empty environment, an
+# unprivileged user, resource limits and the syscall filter below.
+ALLOWED_MODULES = frozenset({
+    "numpy", "math", "statistics", "collections", "itertools", "functools", "operator",
+    "dataclasses", "typing", "enum", "bisect", "heapq", "random", "decimal", "fractions",
+})
+_BLOCKED_BUILTINS = ("open", "input", "breakpoint", "exit", "quit", "help")
+
+# Signals may be returned as codes (see backtest_engine.SIGNAL_CODES) or names
+_SIGNAL_NAMES = {"HOLD": 0, "LONG": 1, "SHORT": 2, "CLOSE": 3}
+
+# Longest error message sent back to the parent
+_MAX_ERROR = 2000
+
+# Largest reply header (JSON) the parent accepts
+_MAX_HEADER = 64 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Syscall filter
+
+# Denied outright: networking, running programs, changing the filesystem,
+# touching other processes and widening the sandbox
+_DENIED = (
+    "socket", "socketpair", "connect", "bind", "listen", "accept", "accept4",
+    "execve", "execveat", "fork", "vfork",
+    "unlink", "unlinkat", "rename", "renameat", "renameat2", "rmdir", "mkdir", "mkdirat",
+    "link", "linkat", "symlink", "symlinkat", "chmod", "fchmod", "fchmodat",
+    "chown", "fchown", "lchown", "fchownat", "truncate", "ftruncate", "creat", "openat2",
+    "kill", "tkill", "ptrace", "process_vm_readv", "process_vm_writev",
+    "mount", "umount2", "unshare", "setns", "bpf", "keyctl", "add_key", "request_key",
+    "open_by_handle_at", "io_uring_setup", "io_uring_enter", "io_uring_register",
+)
+
+_SYSCALLS = {
+    "x86_64": (0xC000003E, {
+        "open": 2, "fork": 57, "vfork": 58, "execve": 59, "kill": 62, "truncate": 76, "ftruncate": 77,
+        "rename": 82, "mkdir": 83, "rmdir": 84, "creat": 85, "link": 86, "unlink": 87, "symlink": 88,
+        "chmod": 90, "fchmod": 91, "chown": 92, "fchown": 93, "lchown": 94, "ptrace": 101,
+        "socket": 41, "connect": 42, "accept": 43, "bind": 49, "listen": 50, "socketpair": 53,
+        "clone": 56, "mount": 165, "umount2": 166, "tkill": 200, "tgkill": 234,
+        "add_key": 248, "request_key": 249, "keyctl": 250, "openat": 257, "mkdirat": 258,
+        "fchownat": 260, "unlinkat": 263, "renameat": 264, "linkat": 265, "symlinkat": 266,
+        "fchmodat": 268, "unshare": 272, "accept4": 288, "open_by_handle_at": 304, "setns": 308,
+        "process_vm_readv": 310, "process_vm_writev": 311, "renameat2": 316, "bpf": 321,
+        "execveat": 322, "io_uring_setup": 425, "io_uring_enter": 426, "io_uring_register": 427,
+        "clone3": 435, "openat2": 437,
+    }),
+    "aarch64": (0xC00000B7, {
+        "mkdirat": 34, "unlinkat": 35, "symlinkat": 36, "linkat": 37, "renameat": 38, "umount2": 39,
+        "mount": 40, "truncate": 45, "ftruncate": 46, "fchmod": 52, "fchmodat": 53, "fchownat": 54,
+        "fchown": 55, "openat": 56, "unshare": 97, "ptrace": 117, "kill": 129, "tkill": 130,
+        "tgkill": 131, "socket": 198, "socketpair": 199, "bind": 200, "listen": 201, "accept": 202,
+        "connect": 203, "add_key": 217, "request_key": 218, "keyctl": 219, "clone": 220,
+        "execve": 221, "accept4": 242, "open_by_handle_at": 265, "setns": 268,
+        "process_vm_readv": 270, "process_vm_writev": 271, "renameat2": 276, "bpf": 280,
+        "execveat": 281, "io_uring_setup": 425, "io_uring_enter": 426, "io_uring_register": 427,
+        "clone3": 435, "openat2": 437,
+    }),
+}
+
+_WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+_CLONE_THREAD = 0x00010000
+
+_LD_ABS, _JEQ, _JGE, _JSET, _RET = 0x20, 0x15, 0x35, 0x45, 0x06
+_RET_ALLOW, _RET_KILL = 0x7FFF0000, 0x80000000
+_X32_SYSCALL_BIT = 0x40000000
+
+
+def _ret_errno(code: int) -> int:
+    return 0x00050000 | code
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_ushort), ("jt", ctypes.c_ubyte), ("jf", ctypes.c_ubyte), ("k", ctypes.c_uint)]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [("len", ctypes.c_ushort), ("filter", ctypes.POINTER(_SockFilter))]
+
+
+def _arg(index: int) -> int:
+    """Offset of the low word of a syscall argument in struct seccomp_data"""
+    return 16 + 8 * index
+
+
+def _seccomp_program(processes: bool = False) -> List[Tuple[int, int, int, int]]:
+    """
+    The filter program; `processes` lets the zygote fork its run processes,
+    each of which stacks the filter again without it
+    """
+    machine = platform.machine()
+    if machine not in _SYSCALLS:
+        raise OSError(f"No syscall filter for {machine}")
+    arch, numbers = _SYSCALLS[machine]
+    deny = _ret_errno(errno.EPERM)
+    program = [
+        (_LD_ABS, 0, 0, 4), (_JEQ, 1, 0, arch), (_RET, 0, 0, _RET_KILL),
+        (_LD_ABS, 0, 0, 0), (_JGE, 0, 1, _X32_SYSCALL_BIT), (_RET, 0, 0, _RET_KILL),
+    ]
+
+    def guarded(name: str, body: List[Tuple[int, int, int, int]]) -> None:
+        """`body` runs for syscall `name` and must return"""
+        if name in numbers:
+            program.append((_JEQ, 0, len(body), numbers[name]))
+            program.extend(body)
+
+    for name in _DENIED:
+        if not (processes and name in ("fork", "vfork")):
+            guarded(name, [(_RET, 0, 0, deny)])
+    # Reading files is allowed, opening them for writing is not
+    for name, flags in (("open", 1), ("openat", 2)):
+        guarded(name, [(_LD_ABS, 0, 0, _arg(flags)), (_JSET, 0, 1, _WRITE_FLAGS), (_RET, 0, 0, deny), (_RET, 0, 0, _RET_ALLOW)])
+    # Threads, not processes; clone3 hides its flags, so libc falls back to clone
+    if not processes:
+        guarded("clone", [(_LD_ABS, 0, 0, _arg(0)), (_JSET, 1, 0, _CLONE_THREAD), (_RET, 0, 0, deny), (_RET, 0, 0, _RET_ALLOW)])
+    guarded("clone3", [(_RET, 0, 0, _ret_errno(errno.ENOSYS))])
+    # Signals to this process only (each run process adds its own guard)
+    if not processes:
+        guarded("tgkill", [(_LD_ABS, 0, 0, _arg(0)), (_JEQ, 1, 0, os.getpid()), (_RET, 0, 0, deny), (_RET, 0, 0, _RET_ALLOW)])
+    program.append((_RET, 0, 0, _RET_ALLOW))
+    return program
+
+
+_PR_SET_PDEATHSIG, _PR_SET_DUMPABLE, _PR_SET_SECCOMP, _PR_SET_NO_NEW_PRIVS = 1, 4, 22, 38
+_SECCOMP_MODE_FILTER = 2
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.prctl.argtypes = [ctypes.c_int, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+
+
+def _prctl(option: int, value: int, what: str) -> None:
+    if _libc.prctl(option, value, 0, 0, 0) != 0:
+        code = ctypes.get_errno()
+        raise OSError(code, f"Could not {what}: {os.strerror(code)}")
+
+
+def _install_seccomp(processes: bool = False) -> None:
+    program = _seccomp_program(processes)
+    filters = (_SockFilter * len(program))(*(_SockFilter(*inst) for inst in program))
+    fprog = _SockFprog(len(program), filters)
+    _prctl(_PR_SET_NO_NEW_PRIVS, 1, "install the syscall filter")
+    if _libc.prctl(_PR_SET_SECCOMP, _SECCOMP_MODE_FILTER, ctypes.addressof(fprog), 0, 0) != 0:
+        code = ctypes.get_errno()
+        raise OSError(code, f"Could not install the syscall filter: {os.strerror(code)}")
+
+
+# ---------------------------------------------------------------------------
+# Strategies
+
+class _StrategyBars:
+    """What a strategy sees: read-only OHLCV columns over shared memory"""
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        for name, column in columns.items():
+            setattr(self, name, column)
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+
+def _guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or name.split(".")[0] not in ALLOWED_MODULES:
+        raise ImportError(f"Import of '{name}' is not allowed in strategies")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _load_strategy(code: str) -> Dict[str, Any]:
+    safe = {k: v for k, v in vars(builtins).items() if k not in _BLOCKED_BUILTINS}
+    safe["__import__"] = _guarded_import
+    namespace = {"__builtins__": safe, "__name__": "strategy", "np": np}
+    exec(compile(code, "<strategy>", "exec"), namespace)
+    if not callable(namespace.get("generate_signals")):
+        raise NameError("Strategy must define generate_signals(bars)")
+    return namespace
+
+
+def _to_codes(result, n: int) -> np.ndarray:
+    codes = np.asarray(result)
+    if codes.dtype.kind in "OUS":
+        codes = np.array([_SIGNAL_NAMES[str(getattr(s, "value", s)).upper()] for s in codes.tolist()])
+    if codes.shape != (n,):
+        raise ValueError(f"generate_signals returned shape {codes.shape}, expected ({n},)")
+    if codes.dtype.kind not in "iub" or codes.min(initial=0) < 0 or codes.max(initial=0) > 3:
+        raise ValueError("Signals must be codes 0-3 (HOLD, LONG, SHORT, CLOSE)")
+    return codes.astype(np.int8)
+
+
+def _views(segment: mmap.mmap, columns: List[str], n: int) -> Dict[str, np.ndarray]:
+    return {
+        name: np.frombuffer(segment, np.int64 if name == "timestamp" else np.float64, n, 8 * n * i)
+        for i, name in enumerate(columns)
+    }
+
+
+# ---------------------------------------------------------------------------
+# Process
+
+def _set_cpu_budget(cpu_seconds: int) -> None:
+    """Raise the soft CPU limit to `cpu_seconds` past what has been used; SIGXCPU ends the process"""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime) + cpu_seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _confine(memory_mb: int, uid: int, gid: int, seccomp: bool) -> None:
+    """Everything a strategy may import is loaded first: the new user may not read the install"""
+    for module in sorted(ALLOWED_MODULES):
+        __import__(module)
+    limit = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))  # no file writes
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    if uid >= 0:
+        os.setgroups([])
+        os.setgid(gid)
+        os.setuid(uid)
+    # Not dumpable: processes of the same user cannot open our /proc/<pid>/mem
+    _prctl(_PR_SET_DUMPABLE, 0, "make the sandbox non-dumpable")
+    if seccomp:
+        _install_seccomp(processes=True)
+
+
+def _reply(conn: Connection, header: Dict[str, Any], signals: bytes = b"") -> None:
+    """JSON header and raw signal bytes; the parent never unpickles what a sandbox sends"""
+    conn.send_bytes(json.dumps(header).encode())
+    conn.send_bytes(signals)
+
+
+def _send_frame(fd: int, data: memoryview) -> None:
+    """Connection.send_bytes framing, written straight from `data` without copying it"""
+    chunks = [struct.pack("!i", len(data)), data]
+    for chunk in chunks:
+        while len(chunk):
+            chunk = chunk[os.write(fd, chunk):]
+
+
+def _run(conn: Connection, control: socket.socket, reply_fd: int, segment: mmap.mmap,
+         columns: List[str], n: int, cpu_seconds: int, seccomp: bool, sandbox: int) -> None:
+    """
+    One run in a forked process: receive the code, execute it, and write the
+    framed reply (header length, JSON header, signals) to `reply_fd`
+    """
+    _prctl(_PR_SET_PDEATHSIG, signal.SIGKILL, "tie the run to the sandbox")
+    if os.getppid() != sandbox:
+        raise OSError("The sandbox exited before its run started")
+    if seccomp:
+        _install_seccomp(processes=False)
+    code = conn.recv_bytes().decode("utf-8")
+    # The reply goes through the sandbox, which forwards exactly one
+    control.close()
+    conn.close()
+    try:
+        _set_cpu_budget(cpu_seconds)
+        namespace = _load_strategy(code)
+        signals = _to_codes(namespace["generate_signals"](_StrategyBars(_views(segment, columns, n))), n)
+        params = {}
+        if "KELLY_FRACTION" in namespace:
+            params["kelly_fraction"] = float(namespace["KELLY_FRACTION"])
+        header, payload = {"status": "ok", "params": params}, signals.tobytes()
+    except Exception as e:
+        header, payload = {"status": "error", "error": f"{type(e).__name__}: {e}"[:_MAX_ERROR]}, b""
+    encoded = json.dumps(header).encode()
+    data = memoryview(struct.pack("!I", len(encoded)) + encoded + payload)
+    while len(data):
+        data = data[os.write(reply_fd, data):]
+
+
+def _collect(pid: int, reply_fd: int, n: int) -> Tuple[mmap.mmap, int, int]:
+    """
+    Read a run's reply into an anonymous mapping (zeroed and dropped once
+    forwarded, so nothing of it outlives the run) and reap the process
+    """
+    buffer = mmap.mmap(-1, 4 + _MAX_HEADER + n + 1)
+    view = memoryview(buffer)
+    used = 0
+    try:
+        while used < len(buffer):
+            count = os.readv(reply_fd, [view[used:]])
+            if not count:
+                break
+            used += count
+    finally:
+        view.release()
+        os.close(reply_fd)
+        _, status = os.waitpid(pid, 0)
+    return buffer, used, status
+
+
+def _serve(conn: Connection, control: socket.socket, segment: mmap.mmap, columns: List[str], n: int,
+           cpu_seconds: int, seccomp: bool) -> bool:
+    """Fork one run and forward its reply; False when the sandbox should retire"""
+    sandbox = os.getpid()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            _run(conn, control, write_fd, segment, columns, n, cpu_seconds, seccomp, sandbox)
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    buffer, used, status = _collect(pid, read_fd, n)
+    try:
+        length = struct.unpack_from("!I", buffer)[0] if used >= 4 else -1
+        if status != 0 or not 0 <= length <= _MAX_HEADER or 4 + length > used or used - 4 - length > n:
+            if os.WIFSIGNALED(status):
+                error = f"Strategy process killed by signal {os.WTERMSIG(status)}"
+            elif status:
+                error = f"Strategy process died (exit code {os.waitstatus_to_exitcode(status)})"
+            else:
+                error = "Strategy process sent a malformed reply"
+            # The run may not have read its code, which would be taken for the next message
+            _reply(conn, {"status": "error", "error": error, "retire": True})
+            return False
+        view = memoryview(buffer)
+        try:
+            _send_frame(conn.fileno(), view[4:4 + length])
+            _send_frame(conn.fileno(), view[4 + length:used])
+        finally:
+            view.release()
+        return True
+    finally:
+        buffer[:] = bytes(len(buffer))
+        buffer.close()
+
+
+def main(fd: int, memory_mb: int, cpu_seconds: int, uid: int, gid: int, seccomp: bool) -> None:
+    """Confine once, then fork a fresh process per backtest"""
+    conn = Connection(fd)
+    control = socket.socket(fileno=os.dup(fd))  # segment descriptors arrive as SCM_RIGHTS
+    try:
+        _confine(memory_mb, uid, gid, seccomp)
+    except Exception as e:
+        _reply(conn, {"status": "error", "error": f"{type(e).__name__}: {e}"[:_MAX_ERROR]})
+        return
+    _reply(conn, {"status": "ready"})
+    segment = None
+    while True:
+        try:
+            message = conn.recv()  # control messages from the parent, which is trusted
+        except EOFError:
+            break
+        if message[0] == "close":
+            break
+        if message[0] == "segment":
+            _, fds, _, _ = socket.recv_fds(control, 1, 1)
+            if segment is not None:
+                segment.close()
+            try:
+                segment = mmap.mmap(fds[0], message[1], mmap.MAP_SHARED, mmap.PROT_READ)
+            finally:
+                os.close(fds[0])
+            continue
+        _, columns, n = message
+        if not _serve(conn, control, segment, columns, n, cpu_seconds, seccomp):
+            break
+
+
+if __name__ == "__main__":
+    fd, memory_mb, cpu_seconds, uid, gid, seccomp = map(int, sys.argv[1:7])
+    main(fd, memory_mb, cpu_seconds, uid, gid, bool(seccomp))
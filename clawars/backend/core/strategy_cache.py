@@ -0,0 +1,58 @@
+"""
+CLAWARS Strategy Cache
+Compiled Pine strategies keyed by code hash, in memory and on shared disk
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, Optional
+
+from .config import settings
+from .pickle_cache import PickleCache
+from .pine_compiler import COMPILER_VERSION, CompiledStrategy, compile_pine
+
+
+def code_hash(code: str) -> str:
+    """SHA-256 of the strategy source (models.Strategy.code_hash)"""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def cache_key(code: str, inputs: Optional[Dict[str, Any]] = None) -> str:
+    """Code hash, compiler version and input overrides; stable across processes"""
+    overrides = json.dumps(inputs or {}, sort_keys=True, default=repr)
+    return hashlib.sha256(
+        f"{COMPILER_VERSION}\0{code_hash(code)}\0{overrides}".encode("utf-8")
+    ).hexdigest()
+
+
+class StrategyCache(PickleCache):
+    """
+    Compiled Pine strategies by cache_key, so every prefork worker sharing
+    the directory skips parsing once any one of them has compiled the
+    script. Compile errors are not cached.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_entries: int = 256, secret: Optional[str] = None):
+        super().__init__(root, max_entries, secret, version=COMPILER_VERSION)
+
+    def get(self, code: str, inputs: Optional[Dict[str, Any]] = None) -> CompiledStrategy:
+        key = cache_key(code, inputs)
+        compiled = self._fetch(key)
+        if compiled is None:
+            compiled = compile_pine(code, inputs)
+            self._store(key, compiled)
+        return compiled
+
+    def _decode(self, entry: Any) -> Optional[CompiledStrategy]:
+        return entry if isinstance(entry, CompiledStrategy) else None
+
+
+_default_cache: Optional[StrategyCache] = None
+
+
+def get_strategy_cache() -> StrategyCache:
+    """Process-wide cache rooted at settings.STRATEGY_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = StrategyCache(settings.STRATEGY_CACHE_DIR, settings.STRATEGY_CACHE_SIZE)
+    return _default_cache
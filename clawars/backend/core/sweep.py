@@ -0,0 +1,175 @@
+"""
+CLAWARS Parameter Sweeps
+Grid / random / Latin-hypercube sweeps over one shared price series
+"""
+
+import itertools
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bars import Bars
+from .pipeline import process_pool
+
+if TYPE_CHECKING:
+    from .exits import ExitStage
+
+# Sweepable parameters, keyed as in PineScriptEngine.parsed
+SWEEP_PARAMETERS = ("lookback", "entry_threshold", "exit_threshold", "kelly_fraction")
+
+# Pine input names accepted as aliases
+_PINE_ALIASES = {
+    "entryThreshold": "entry_threshold",
+    "exitThreshold": "exit_threshold",
+    "kellyFraction": "kelly_fraction",
+}
+
+ParameterSpace = Dict[str, Tuple[float, float]]
+
+
+@dataclass
+class SweepEntry:
+    rank: int
+    params: Dict[str, float]
+    metrics: Dict[str, float]
+
+
+def _normalize(params: Dict) -> Dict:
+    normalized = {}
+    for key, value in params.items():
+        key = _PINE_ALIASES.get(key, key)
+        if key not in SWEEP_PARAMETERS:
+            raise ValueError(f"Unknown sweep parameter: {key}")
+        normalized[key] = int(value) if key == "lookback" else float(value)
+    return normalized
+
+
+def parameter_grid(grid: Dict[str, Sequence[float]]) -> List[Dict]:
+    """Every combination of the listed values"""
+    keys = list(grid)
+    return [
+        _normalize(dict(zip(keys, values)))
+        for values in itertools.product(*(grid[k] for k in keys))
+    ]
+
+
+def random_samples(space: ParameterSpace, n: int, seed: Optional[int] = None) -> List[Dict]:
+    """n independent uniform draws; integer bounds give integer parameters"""
+    rng = np.random.default_rng(seed)
+    unit = rng.random((n, len(space)))
+    return _scale(space, unit)
+
+
+def latin_hypercube(space: ParameterSpace, n: int, seed: Optional[int] = None) -> List[Dict]:
+    """n samples with exactly one sample per stratum along every dimension"""
+    rng = np.random.default_rng(seed)
+    d = len(space)
+    strata = np.argsort(rng.random((n, d)), axis=0)  # independent permutation per column
+    unit = (strata + rng.random((n, d))) / n
+    return _scale(space, unit)
+
+
+def _scale(space: ParameterSpace, unit: np.ndarray) -> List[Dict]:
+    columns = {}
+    for j, (key, (lo, hi)) in enumerate(space.items()):
+        if isinstance(lo, int) and isinstance(hi, int):
+            # Integer range is inclusive of hi
+            columns[key] = np.minimum(lo + np.floor(unit[:, j] * (hi - lo + 1)), hi)
+        else:
+            columns[key] = lo + unit[:, j] * (hi - lo)
+    return [
+        _normalize({key: columns[key][i] for key in columns})
+        for i in range(len(unit))
+    ]
+
+
+def run_sweep(
+    engine,
+    strategy_code: str,
+    bars: Bars,
+    combinations: List[Dict],
+    max_workers: Optional[int] = None,
+) -> List[SweepEntry]:
+    """
+    Backtest every combination over `bars` and rank by composite score.
+    Combinations sharing a lookback share one score series; groups are
+    spread over a process pool.
+    """
+    from .backtest_engine import PineScriptEngine
+
+    base = PineScriptEngine(strategy_code).parsed
+    groups: Dict[int, List[Dict]] = {}
+    for combo in combinations:
+        params = {**{k: base[k] for k in SWEEP_PARAMETERS}, **_normalize(combo)}
+        groups.setdefault(params["lookback"], []).append(params)
+
+    config = engine.config()
+    tasks = [(config, strategy_code, bars, lookback, group) for lookback, group in groups.items()]
+
+    with process_pool(min(max_workers or os.cpu_count() or 1, len(tasks))) as pool:
+        if pool is None:
+            rows = [row for task in tasks for row in _run_group(*task)]
+        else:
+            rows = [row for chunk in pool.map(_run_group, *zip(*tasks)) for row in chunk]
+
+    rows.sort(key=lambda row: row[1]["composite_score"], reverse=True)
+    return [
+        SweepEntry(rank=i + 1, params=params, metrics=metrics)
+        for i, (params, metrics) in enumerate(rows)
+    ]
+
+
+def _run_group(
+    config: Dict, strategy_code: str, bars: Bars, lookback: int, group: List[Dict]
+) -> List[Tuple[Dict, Dict]]:
+    """Worker: one shared score series, then signals/simulation per combination"""
+    from .backtest_engine import (
+        BacktestEngine, PineScriptEngine, SIGNALS_BY_CODE, cached_residual_scores, signal_codes_from_scores
+    )
+    from .metrics import MetricsAccumulator
+
+    engine = BacktestEngine(**config)
+    if PineScriptEngine(strategy_code).compiled.has_orders:
+        return [_run_script(engine, strategy_code, bars, params) for params in group]
+
+    thresholds = sorted({p["entry_threshold"] for p in group} | {p["exit_threshold"] for p in group})
+    scores = cached_residual_scores(bars, lookback, thresholds=tuple(thresholds))
+
+    rows = []
+    signals_by_rule: Dict[Tuple[float, float], Tuple[List, "ExitStage"]] = {}
+    for params in group:
+        rule = (params["entry_threshold"], params["exit_threshold"])
+        if rule not in signals_by_rule:
+            exits = engine._exit_stage(bars)
+            codes = signal_codes_from_scores(scores, *rule, start=lookback + 2, exits=exits)
+            signals_by_rule[rule] = ([SIGNALS_BY_CODE[c] for c in codes.tolist()], exits)
+        signals, exits = signals_by_rule[rule]
+        metrics = MetricsAccumulator(engine.initial_capital)
+        trades, equity_curve = engine._simulate_trades(
+            bars, signals, params["kelly_fraction"], metrics, exits
+        )
+        result = engine._calculate_metrics(trades, equity_curve, metrics)
+        rows.append((params, result.summary()))
+    return rows
+
+
+def _run_script(engine, strategy_code: str, bars: Bars, params: Dict) -> Tuple[Dict, Dict]:
+    """One combination of a script with its own orders: recompile with the inputs overridden"""
+    from .backtest_engine import PineScriptEngine
+    from .metrics import MetricsAccumulator
+
+    script = PineScriptEngine(strategy_code)
+    inputs = {
+        PineScriptEngine.INPUT_NAMES[key]: value
+        for key, value in params.items()
+        if PineScriptEngine.INPUT_NAMES[key] in script.compiled.inputs
+    }
+    script = PineScriptEngine(strategy_code, inputs=inputs)
+    exits = engine._exit_stage(bars)
+    metrics = MetricsAccumulator(engine.initial_capital)
+    trades, equity_curve = engine._simulate_trades(
+        bars, script.generate_signals(bars, exits), params["kelly_fraction"], metrics, exits
+    )
+    return params, engine._calculate_metrics(trades, equity_curve, metrics).summary()
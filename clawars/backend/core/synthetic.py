@@ -0,0 +1,176 @@
+"""
+CLAWARS Synthetic Markets
+Seeded, vectorized multi-path OHLCV generators for testing and Monte Carlo runs
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .bars import Bars, MS_PER_HOUR, TimeLike, to_epoch_ms
+
+
+@dataclass
+class SyntheticPaths:
+    """N simulated paths sharing one timestamp index; price arrays are (paths, bars)"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    regime: Optional[np.ndarray] = None  # (paths, bars) regime ids, regime model only
+
+    def __len__(self) -> int:
+        return self.close.shape[0]
+
+    @property
+    def n_bars(self) -> int:
+        return self.close.shape[1]
+
+    def bars(self, path: int) -> Bars:
+        """One path as Bars; rows are contiguous so no data is copied"""
+        return Bars(
+            timestamp=self.timestamp,
+            open=self.open[path],
+            high=self.high[path],
+            low=self.low[path],
+            close=self.close[path],
+            volume=self.volume[path],
+        )
+
+
+class SyntheticMarket:
+    """
+    Generator of synthetic OHLCV paths from a seeded numpy Generator.
+
+    Closes follow log-normal steps; each bar's high/low is drawn from the
+    exact distribution of a Brownian bridge's extremes between its open
+    and close, so intrabar ranges are consistent with the bar's volatility.
+    """
+
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        start_price: float = 45000.0,
+        base_volume: float = 1000.0,
+    ):
+        self.rng = np.random.default_rng(seed)
+        self.start_price = start_price
+        self.base_volume = base_volume
+
+    def gbm(
+        self,
+        n_paths: int,
+        n_bars: int,
+        drift: float = 0.0001,
+        volatility: float = 0.02,
+        start: TimeLike = 0,
+        interval_ms: int = 4 * MS_PER_HOUR,
+    ) -> SyntheticPaths:
+        """Geometric Brownian motion; `drift` is the expected simple return per bar"""
+        z = self.rng.standard_normal((n_paths, n_bars))
+        sigma = np.full((n_paths, n_bars), volatility)
+        log_returns = (drift - 0.5 * volatility ** 2) + volatility * z
+        return self._build(log_returns, sigma, z, start, interval_ms)
+
+    def regime_switching(
+        self,
+        n_paths: int,
+        n_bars: int,
+        drifts: Sequence[float] = (0.0008, -0.0008, 0.0),
+        volatilities: Sequence[float] = (0.015, 0.025, 0.01),
+        transition: Optional[np.ndarray] = None,
+        start: TimeLike = 0,
+        interval_ms: int = 4 * MS_PER_HOUR,
+    ) -> SyntheticPaths:
+        """
+        Markov regime-switching GBM.
+        Default regimes are bull / bear / chop, each persisting ~50 bars.
+        """
+        drifts = np.asarray(drifts, dtype=np.float64)
+        vols = np.asarray(volatilities, dtype=np.float64)
+        k = len(drifts)
+        if transition is None:
+            transition = np.full((k, k), 0.02 / max(k - 1, 1))
+            np.fill_diagonal(transition, 0.98)
+        transition = np.asarray(transition, dtype=np.float64)
+        if transition.shape != (k, k):
+            raise ValueError("transition must be a k x k matrix for k regimes")
+
+        regime = self._regime_paths(n_paths, n_bars, transition)
+        z = self.rng.standard_normal((n_paths, n_bars))
+        sigma = vols[regime]
+        log_returns = (drifts[regime] - 0.5 * sigma ** 2) + sigma * z
+        paths = self._build(log_returns, sigma, z, start, interval_ms)
+        paths.regime = regime
+        return paths
+
+    def _regime_paths(self, n_paths: int, n_bars: int, transition: np.ndarray) -> np.ndarray:
+        """
+        Sample regime sequences segment by segment: geometric sojourn times,
+        then a jump to another regime. Vectorized across paths, so the loop
+        runs once per regime change rather than once per bar.
+        """
+        k = len(transition)
+        stay = np.clip(np.diag(transition), 0.0, 1.0 - 1e-12)
+        jumps = transition * (1 - np.eye(k))
+        totals = jumps.sum(axis=1, keepdims=True)
+        jumps = np.where(totals > 0, jumps / np.where(totals > 0, totals, 1), np.eye(k))
+        jump_cdf = np.cumsum(jumps, axis=1)
+
+        starts = np.zeros((n_paths, n_bars), dtype=np.int16)  # regime + 1 at segment starts
+        state = self.rng.integers(0, k, n_paths)
+        pos = np.zeros(n_paths, dtype=np.int64)
+        rows = np.arange(n_paths)
+
+        active = pos < n_bars
+        while active.any():
+            starts[rows[active], pos[active]] = state[active] + 1
+            duration = self.rng.geometric(1.0 - stay[state])
+            pos = pos + np.minimum(duration, n_bars)
+            u = self.rng.random(n_paths)
+            state = np.minimum((u[:, None] > jump_cdf[state]).sum(axis=1), k - 1)
+            active = pos < n_bars
+
+        # Forward-fill segment starts along time
+        marks = np.where(starts > 0, np.arange(n_bars), 0)
+        np.maximum.accumulate(marks, axis=1, out=marks)
+        return starts[rows[:, None], marks].astype(np.int64) - 1
+
+    def _build(
+        self,
+        log_returns: np.ndarray,
+        sigma: np.ndarray,
+        z: np.ndarray,
+        start: TimeLike,
+        interval_ms: int,
+    ) -> SyntheticPaths:
+        n_paths, n_bars = log_returns.shape
+        log_close = np.log(self.start_price) + np.cumsum(log_returns, axis=1)
+        log_open = np.empty_like(log_close)
+        log_open[:, 0] = np.log(self.start_price)
+        log_open[:, 1:] = log_close[:, :-1]
+
+        # Extremes of a Brownian bridge from open to close with variance sigma^2
+        move = log_close - log_open
+        u_high = self.rng.random((n_paths, n_bars))
+        u_low = self.rng.random((n_paths, n_bars))
+        spread = 2.0 * sigma * sigma
+        log_high = 0.5 * (log_open + log_close + np.sqrt(move * move - spread * np.log(u_high)))
+        log_low = 0.5 * (log_open + log_close - np.sqrt(move * move - spread * np.log(u_low)))
+
+        # Volume: log-normal noise, heavier on large moves
+        volume = self.base_volume * np.exp(0.3 * self.rng.standard_normal((n_paths, n_bars)))
+        volume *= 1.0 + np.abs(z)
+
+        timestamp = to_epoch_ms(start) + np.arange(n_bars, dtype=np.int64) * interval_ms
+        return SyntheticPaths(
+            timestamp=timestamp,
+            open=np.exp(log_open),
+            high=np.exp(log_high),
+            low=np.exp(log_low),
+            close=np.exp(log_close),
+            volume=volume,
+        )
@@ -0,0 +1,297 @@
+"""
+CLAWARS Trade Log
+Struct-of-arrays trade storage with lazy row views, binary serialization
+and disk spill past a row cap
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import weakref
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .bars import from_epoch_ms
+
+# Column layout; order is also the binary serialization order
+COLUMNS = (
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("entry_time", np.int64),   # epoch ms
+    ("exit_time", np.int64),    # epoch ms
+    ("direction", np.int8),     # see DIRECTIONS
+    ("size", np.float64),
+    ("pnl", np.float64),
+    ("pnl_pct", np.float64),
+    ("exit_reason", np.int8),   # index into EXIT_REASONS
+    ("entry_bar", np.int32),    # index into the run's bar timestamps, -1 if unknown
+    ("exit_bar", np.int32),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+DIRECTIONS = {"LONG": 1, "SHORT": -1}
+DIRECTION_NAMES = {code: name for name, code in DIRECTIONS.items()}
+EXIT_REASONS = ("Signal", "stop_loss", "take_profit", "time_stop")
+
+_MAGIC = b"CLTL"
+_VERSION = 2
+_HEADER = struct.Struct("<4sBQ")  # magic, version, row count
+
+
+class TradeView:
+    """Lazy read-only view of one row; fields are read from the columns on access"""
+
+    __slots__ = ("_log", "_index")
+
+    def __init__(self, log: "TradeLog", index: int):
+        self._log = log
+        self._index = index
+
+    def _get(self, name: str):
+        return self._log._value(name, self._index)
+
+    @property
+    def entry_price(self) -> float:
+        return float(self._get("entry_price"))
+
+    @property
+    def exit_price(self) -> float:
+        return float(self._get("exit_price"))
+
+    @property
+    def entry_time(self):
+        return from_epoch_ms(self._get("entry_time"))
+
+    @property
+    def exit_time(self):
+        return from_epoch_ms(self._get("exit_time"))
+
+    @property
+    def entry_bar(self) -> int:
+        return int(self._get("entry_bar"))
+
+    @property
+    def exit_bar(self) -> int:
+        return int(self._get("exit_bar"))
+
+    @property
+    def direction(self) -> str:
+        return DIRECTION_NAMES[int(self._get("direction"))]
+
+    @property
+    def size(self) -> float:
+        return float(self._get("size"))
+
+    @property
+    def pnl(self) -> float:
+        return float(self._get("pnl"))
+
+    @property
+    def pnl_pct(self) -> float:
+        return float(self._get("pnl_pct"))
+
+    @property
+    def exit_reason(self) -> str:
+        return EXIT_REASONS[int(self._get("exit_reason"))]
+
+    def to_dict(self) -> Dict:
+        """JSON-ready row"""
+        return {
+            "entry_price": self.entry_price,
+            "exit_price": self.exit_price,
+            "entry_time": self.entry_time.isoformat(),
+            "exit_time": self.exit_time.isoformat(),
+            "direction": self.direction,
+            "size": self.size,
+            "pnl": self.pnl,
+            "pnl_pct": self.pnl_pct,
+            "exit_reason": self.exit_reason,
+            "entry_bar": self.entry_bar,
+            "exit_bar": self.exit_bar,
+        }
+
+    def __repr__(self) -> str:
+        return f"TradeView({self._index}, {self.direction}, pnl={self.pnl:.2f})"
+
+
+class TradeLog:
+    """
+    Closed trades as parallel typed columns.
+
+    Rows live in growable in-memory arrays until `max_rows` is reached;
+    the in-memory rows are then appended to per-column files on disk and
+    memory is reused, so resident size stays bounded however many trades
+    a run produces. Columns and views read transparently across both tiers.
+
+    Spill files belong to the process that wrote them, so a log pickles
+    through `to_bytes`: the receiving process gets every row and spills
+    again under the same cap.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 256,
+        max_rows: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.max_rows = max_rows
+        self._spill_root = spill_dir
+        self._spill_path: Optional[str] = None
+        self._spilled = 0
+        self._spill_maps: Dict[str, np.ndarray] = {}
+        self._rows = 0
+        capacity = min(capacity, max_rows) if max_rows else capacity
+        self._data = {name: np.empty(max(capacity, 1), dtype=dtype) for name, dtype in COLUMNS}
+
+    def append(
+        self,
+        entry_price: float,
+        exit_price: float,
+        entry_time: int,
+        exit_time: int,
+        direction: str,
+        size: float,
+        pnl: float,
+        pnl_pct: float,
+        exit_reason: str = "Signal",
+        entry_bar: int = -1,
+        exit_bar: int = -1,
+    ) -> None:
+        """Record one closed trade (times in epoch ms, bars as indices into the run's bars)"""
+        if self.max_rows and self._rows >= self.max_rows:
+            self._spill()
+        elif self._rows == len(self._data["pnl"]):
+            self._grow()
+
+        i = self._rows
+        data = self._data
+        data["entry_price"][i] = entry_price
+        data["exit_price"][i] = exit_price
+        data["entry_time"][i] = entry_time
+        data["exit_time"][i] = exit_time
+        data["direction"][i] = DIRECTIONS[direction]
+        data["size"][i] = size
+        data["pnl"][i] = pnl
+        data["pnl_pct"][i] = pnl_pct
+        data["exit_reason"][i] = EXIT_REASONS.index(exit_reason)
+        data["entry_bar"][i] = entry_bar
+        data["exit_bar"][i] = exit_bar
+        self._rows += 1
+
+    def _grow(self) -> None:
+        capacity = len(self._data["pnl"]) * 2
+        if self.max_rows:
+            capacity = min(capacity, self.max_rows)
+        for name, column in self._data.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._rows] = column[:self._rows]
+            self._data[name] = grown
+
+    def _spill(self) -> None:
+        """Append in-memory rows to the on-disk columns and reset the memory tier"""
+        if self._spill_path is None:
+            self._spill_path = tempfile.mkdtemp(prefix="clawars-trades-", dir=self._spill_root)
+            weakref.finalize(self, shutil.rmtree, self._spill_path, True)
+        for name, column in self._data.items():
+            with open(os.path.join(self._spill_path, name), "ab") as f:
+                f.write(column[:self._rows].tobytes())
+        self._spilled += self._rows
+        self._rows = 0
+        self._spill_maps = {}
+
+    def _spilled_column(self, name: str) -> np.ndarray:
+        if name not in self._spill_maps:
+            dtype = self._data[name].dtype
+            self._spill_maps[name] = np.memmap(
+                os.path.join(self._spill_path, name), dtype=dtype, mode="r", shape=(self._spilled,)
+            )
+        return self._spill_maps[name]
+
+    def _value(self, name: str, index: int):
+        if index < self._spilled:
+            return self._spilled_column(name)[index]
+        return self._data[name][index - self._spilled]
+
+    def __len__(self) -> int:
+        return self._spilled + self._rows
+
+    @property
+    def spilled_rows(self) -> int:
+        return self._spilled
+
+    @property
+    def nbytes(self) -> int:
+        """Resident (in-memory) bytes"""
+        return sum(column.nbytes for column in self._data.values())
+
+    def column(self, name: str) -> np.ndarray:
+        """Whole column; a view when nothing has spilled, otherwise a concatenated copy"""
+        memory = self._data[name][:self._rows]
+        if not self._spilled:
+            return memory
+        return np.concatenate([self._spilled_column(name), memory])
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Column access as attributes: log.pnl, log.entry_price, ...
+        if name in COLUMN_NAMES:
+            return self.column(name)
+        raise AttributeError(name)
+
+    def __getitem__(self, index: int) -> TradeView:
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("trade index out of range")
+        return TradeView(self, index)
+
+    def __iter__(self) -> Iterator[TradeView]:
+        for i in range(len(self)):
+            yield TradeView(self, i)
+
+    def __repr__(self) -> str:
+        return f"TradeLog(rows={len(self)}, spilled={self._spilled})"
+
+    def __reduce__(self):
+        return type(self).from_bytes, (self.to_bytes(), self.max_rows, self._spill_root)
+
+    def to_records(self) -> List[Dict]:
+        """Rows as JSON-ready dicts (for the API)"""
+        return [view.to_dict() for view in self]
+
+    def to_bytes(self) -> bytes:
+        """Compact binary form: header, then each column's raw little-endian bytes"""
+        parts = [_HEADER.pack(_MAGIC, _VERSION, len(self))]
+        for name, dtype in COLUMNS:
+            parts.append(np.ascontiguousarray(self.column(name), dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(
+        cls,
+        payload: bytes,
+        max_rows: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ) -> "TradeLog":
+        """Inverse of `to_bytes`; rows past `max_rows` spill to `spill_dir` as they would when appended"""
+        magic, version, rows = _HEADER.unpack_from(payload)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a serialized TradeLog")
+        log = cls(capacity=max(rows, 1), max_rows=max_rows, spill_dir=spill_dir)
+        columns = {}
+        offset = _HEADER.size
+        for name, dtype in COLUMNS:
+            dtype = np.dtype(dtype).newbyteorder("<")
+            columns[name] = np.frombuffer(payload, dtype=dtype, count=rows, offset=offset)
+            offset += columns[name].nbytes
+        chunk = len(log._data["pnl"])
+        for start in range(0, rows, chunk):
+            if log._rows:
+                log._spill()
+            stop = min(start + chunk, rows)
+            for name, column in columns.items():
+                log._data[name][:stop - start] = column[start:stop]
+            log._rows = stop - start
+        return log
@@ -0,0 +1,34 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from core import data_store, indicator_cache, resample, result_cache, strategy_cache
+from core.config import settings
+
+DIRS = {
+    "MARKET_DATA_DIR": "market",
+    "STRATEGY_CACHE_DIR": "strategies",
+    "INDICATOR_CACHE_DIR": "indicators",
+    "RESULT_CACHE_DIR": "results",
+    "PROFILE_DIR": "profiles",
+}
+SINGLETONS = (
+    (data_store, "_default_store"),
+    (resample, "_default_resampler"),
+    (strategy_cache, "_default_cache"),
+    (indicator_cache, "_default_cache"),
+    (result_cache, "_default_cache"),
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_data(tmp_path_factory, monkeypatch):
+    """Point every data and cache directory at a fresh temporary one, so no test reads another's results"""
+    root = tmp_path_factory.mktemp("data")
+    for name, directory in DIRS.items():
+        monkeypatch.setattr(settings, name, str(root / directory))
+    monkeypatch.setattr(settings, "BENCHMARK_HISTORY_FILE", str(root / "benchmarks" / "history.jsonl"))
+    for module, name in SINGLETONS:
+        monkeypatch.setattr(module, name, None)
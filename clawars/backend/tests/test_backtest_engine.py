@@ -0,0 +1,298 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.backtest_engine import (
+    BacktestEngine, PineScriptEngine, SignalType, _exact_residual_score
+)
+from core.rolling import EMA, RollingMax, RollingMean, RollingMin, RollingVariance
+
+
+def _strategy_code(lookback=20, entry=1.5, exit_=0.5, kelly=0.25):
+    return (
+        f"lookback = input.int({lookback}, \"Lookback\")\n"
+        f"entryThreshold = input.float({entry:.8f}, \"Entry\")\n"
+        f"exitThreshold = input.float({exit_:.8f}, \"Exit\")\n"
+        f"kellyFraction = input.float({kelly:.8f}, \"Kelly\")\n"
+    )
+
+
+def _random_walk(n, seed, vol=0.02):
+    rng = random.Random(seed)
+    price = 100.0
+    prices = [price]
+    for _ in range(n):
+        price = max(price * (1 + rng.gauss(0.0001, vol)), 1)
+        prices.append(price)
+    return prices
+
+
+def _reference_signals(prices, lookback, entry, exit_):
+    """Original O(bars x lookback) signal loop"""
+    signals, position = [], None
+    for i in range(len(prices)):
+        signal = SignalType.HOLD
+        if i >= lookback + 2:
+            score = _exact_residual_score(prices, i, lookback)
+            if position is None and score > entry:
+                signal, position = SignalType.LONG, "LONG"
+            elif position is None and score < -entry:
+                signal, position = SignalType.SHORT, "SHORT"
+            elif position == "LONG" and score < exit_:
+                signal, position = SignalType.CLOSE, None
+            elif position == "SHORT" and score > -exit_:
+                signal, position = SignalType.CLOSE, None
+        signals.append(signal)
+    return signals
+
+
+class TestVectorizedSignals:
+    """Both signal paths must match the original per-bar loop"""
+
+    @pytest.mark.parametrize("lookback", [1, 2, 5, 20, 50])
+    @pytest.mark.parametrize("seed", [1, 7, 42])
+    def test_matches_reference_loop(self, lookback, seed):
+        prices = _random_walk(2000, seed)
+        code = _strategy_code(lookback, entry=0.012, exit_=0.002)
+        expected = _reference_signals(prices, lookback, 0.012, 0.002)
+        fast = PineScriptEngine(code, vectorized=True).generate_signals(prices)
+        incremental = PineScriptEngine(code, vectorized=False).generate_signals(prices)
+        assert fast == expected
+        assert incremental == expected
+        assert SignalType.CLOSE in fast or lookback < 3
+
+    def test_flat_prices_score_zero(self):
+        prices = [100.0] * 50 + _random_walk(200, 3)[1:] + [250.0] * 50
+        code = _strategy_code(10, entry=0.0, exit_=0.0)
+        fast = PineScriptEngine(code, vectorized=True).generate_signals(prices)
+        slow = PineScriptEngine(code, vectorized=False).generate_signals(prices)
+        assert fast == slow
+
+    def test_short_series_holds(self):
+        engine = PineScriptEngine(_strategy_code(20))
+        assert engine.generate_signals([100.0] * 10) == [SignalType.HOLD] * 10
+
+
+class TestRollingStatistics:
+    """Incremental window statistics against direct recomputation"""
+
+    def test_rolling_variance_matches_window(self):
+        import statistics
+        values = [v - 100 for v in _random_walk(5000, 5)]
+        window = RollingVariance(20)
+        for i, v in enumerate(values):
+            window.update(v)
+            if i >= 19:
+                expected = values[i - 19:i + 1]
+                assert window.mean == pytest.approx(statistics.mean(expected), abs=1e-9)
+                assert window.variance == pytest.approx(statistics.variance(expected), rel=1e-9)
+
+    def test_min_max_mean(self):
+        values = _random_walk(500, 9)
+        lo, hi, mean = RollingMin(7), RollingMax(7), RollingMean(7)
+        for i, v in enumerate(values):
+            assert lo.update(v) == min(values[max(0, i - 6):i + 1])
+            assert hi.update(v) == max(values[max(0, i - 6):i + 1])
+            assert mean.update(v) == pytest.approx(sum(values[max(0, i - 6):i + 1]) / min(i + 1, 7))
+
+    @pytest.mark.parametrize("cls", [RollingVariance, RollingMin, RollingMax, RollingMean])
+    def test_state_round_trip(self, cls):
+        values = _random_walk(100, 2)
+        original = cls(10)
+        for v in values[:60]:
+            original.update(v)
+        restored = cls.from_state(original.get_state())
+        for v in values[60:]:
+            assert restored.update(v) == pytest.approx(original.update(v), rel=1e-12)
+
+    def test_ema_seeded_with_sma(self):
+        ema = EMA(3)
+        assert np.isnan(ema.update(10.0)) and np.isnan(ema.update(20.0))
+        assert EMA.from_state(ema.get_state()).update(30.0) == ema.update(30.0) == 20.0
+        assert ema.update(40.0) == 30.0
+        assert np.isnan(ema.update(float("nan"))) and not ema.ready
+
+
+class TestBacktestEngine:
+    """End-to-end engine runs"""
+
+    @pytest.fixture
+    def anyio_backend(self):
+        return "asyncio"
+
+    @pytest.mark.anyio
+    async def test_signal_modes_agree(self):
+        from datetime import datetime
+        # Synthetic data starts at 45000, so scores are ~1/45000 per sigma
+        code = _strategy_code(20, entry=0.00002, exit_=0.000005)
+        results = []
+        for vectorized in (True, False):
+            engine = BacktestEngine(vectorized=vectorized)
+            results.append(await engine.run_backtest(
+                code, "pine_script", datetime(2023, 1, 1), datetime(2023, 3, 1), seed=11, use_cache=False
+            ))
+        assert results[0].total_trades > 0
+        assert results[0].total_trades == results[1].total_trades
+        assert results[0].composite_score == results[1].composite_score
+
+    @pytest.mark.anyio
+    async def test_chunked_progress_and_cancellation(self):
+        from datetime import datetime
+        from core.backtest_engine import BacktestCancelled
+        code = _strategy_code(20, entry=0.00002, exit_=0.000005, kelly=0.0001)
+        engine = BacktestEngine()
+        bars = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 6, 1), seed=4)
+        signals = PineScriptEngine(code).generate_signals(bars)
+        whole = engine._simulate_trades(bars, signals, 0.0001, chunk_bars=len(bars))
+        reports = []
+        chunked = engine._simulate_trades(bars, signals, 0.0001, progress_callback=reports.append, chunk_bars=100)
+        assert chunked[1] == whole[1] and len(chunked[0]) == len(whole[0]) > 0
+        # Trade times are the timestamps of the bars they entered and exited at
+        trades = whole[0]
+        assert (trades.entry_bar < trades.exit_bar).all()
+        np.testing.assert_array_equal(trades.entry_time, bars.timestamp[trades.entry_bar])
+        np.testing.assert_array_equal(trades.exit_time, bars.timestamp[trades.exit_bar])
+        assert [r.bars_done for r in reports] == list(range(100, len(bars), 100)) + [len(bars)]
+        assert reports[-1].fraction == 1.0 and reports[-1].trades == len(whole[0])
+        assert reports[-1].equity == pytest.approx(whole[1][-1]["equity"])
+
+        polls = []
+        with pytest.raises(BacktestCancelled):
+            engine._simulate_trades(bars, signals, 0.0001, should_cancel=lambda: polls.append(1) or len(polls) > 2,
+                                    chunk_bars=100)
+        assert len(polls) == 3
+        with pytest.raises(BacktestCancelled):
+            await engine.run_backtest(code, "pine_script", datetime(2023, 1, 1), datetime(2023, 6, 1),
+                                      should_cancel=lambda: True)
+
+
+class TestParameterSweep:
+    """Sweeps over one shared series"""
+
+    def _bars(self):
+        from datetime import datetime
+        return BacktestEngine()._generate_price_data(
+            datetime(2023, 1, 1), datetime(2023, 6, 1), seed=5
+        )
+
+    def test_grid_matches_individual_runs(self):
+        from core.bars import as_bars
+        bars = self._bars()
+        engine = BacktestEngine()
+        grid = {"lookback": [10, 20], "entryThreshold": [0.00002, 0.00003], "kelly_fraction": [0.25]}
+        entries = engine.sweep(_strategy_code(), bars, grid=grid, max_workers=2)
+
+        assert len(entries) == 4
+        assert [e.rank for e in entries] == [1, 2, 3, 4]
+        scores = [e.metrics["composite_score"] for e in entries]
+        assert scores == sorted(scores, reverse=True)
+
+        for entry in entries:
+            p = entry.params
+            single = PineScriptEngine(_strategy_code(p["lookback"], p["entry_threshold"], p["exit_threshold"]))
+            trades, curve = engine._simulate_trades(bars, single.generate_signals(bars), p["kelly_fraction"])
+            np.testing.assert_equal(engine._calculate_metrics(trades, curve).summary(), entry.metrics)
+
+    def test_samplers(self):
+        from core.sweep import latin_hypercube, random_samples
+        space = {"lookback": (5, 50), "entry_threshold": (0.5, 2.5)}
+        lhs = latin_hypercube(space, 10, seed=1)
+        assert lhs == latin_hypercube(space, 10, seed=1)
+        # One sample per stratum along each dimension
+        strata = sorted(int((s["entry_threshold"] - 0.5) / 0.2) for s in lhs)
+        assert strata == list(range(10))
+        assert all(isinstance(s["lookback"], int) and 5 <= s["lookback"] <= 50 for s in lhs)
+        assert len(random_samples(space, 7, seed=3)) == 7
+
+
+class TestSyntheticMarket:
+    """Seeded multi-path generator"""
+
+    def test_seed_is_reproducible(self):
+        from core.synthetic import SyntheticMarket
+        a = SyntheticMarket(seed=3).gbm(4, 500)
+        b = SyntheticMarket(seed=3).gbm(4, 500)
+        np.testing.assert_array_equal(a.close, b.close)
+        assert not np.array_equal(a.close, SyntheticMarket(seed=4).gbm(4, 500).close)
+
+    @pytest.mark.parametrize("model", ["gbm", "regime_switching"])
+    def test_ohlc_consistent(self, model):
+        from core.synthetic import SyntheticMarket
+        paths = getattr(SyntheticMarket(seed=1), model)(50, 300)
+        assert paths.close.shape == (50, 300)
+        assert np.all(paths.high >= np.maximum(paths.open, paths.close))
+        assert np.all(paths.low <= np.minimum(paths.open, paths.close))
+        np.testing.assert_array_equal(paths.open[:, 1:], paths.close[:, :-1])
+        bars = paths.bars(7)
+        assert np.shares_memory(bars.close, paths.close)
+
+    def test_regimes_persist(self):
+        from core.synthetic import SyntheticMarket
+        paths = SyntheticMarket(seed=2).regime_switching(200, 1000)
+        switches = (np.diff(paths.regime, axis=1) != 0).mean()
+        assert 0.005 < switches < 0.04  # default stay probability 0.98
+
+    @pytest.mark.anyio
+    async def test_backtest_seed_reproducible(self):
+        from datetime import datetime
+        code = _strategy_code(20, entry=0.00002, exit_=0.000005)
+        runs = [
+            await BacktestEngine().run_backtest(
+                code, "pine_script", datetime(2023, 1, 1), datetime(2023, 4, 1), seed=9, use_cache=False
+            )
+            for _ in range(2)
+        ]
+        assert runs[0].summary() == runs[1].summary()
+
+    @pytest.fixture
+    def anyio_backend(self):
+        return "asyncio"
+
+
+class TestRobustness:
+    """Bootstrap / Monte Carlo intervals"""
+
+    def test_batch_metrics_match_engine(self):
+        from core.robustness import batch_metrics
+        engine = BacktestEngine()
+        bars = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 12, 1), seed=4)
+        code = _strategy_code(20, entry=0.00002, exit_=0.000005, kelly=0.0001)
+        trades, _ = engine._simulate_trades(bars, PineScriptEngine(code).generate_signals(bars), 0.0001)
+        # Trade-level equity curve so both sides measure the same drawdown
+        equity, curve = engine.initial_capital, []
+        for t in trades:
+            equity += t.pnl
+            curve.append({"timestamp": 0, "equity": equity})
+        expected = engine._calculate_metrics(trades, curve).summary()
+
+        pnl = trades.pnl[None, :]
+        pnl_pct = trades.pnl_pct[None, :]
+        batch = batch_metrics(pnl, pnl_pct, engine.initial_capital)
+        for name, values in batch.items():
+            assert values[0] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+    def test_report_intervals(self):
+        engine = BacktestEngine()
+        bars = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 6, 1), seed=8)
+        code = _strategy_code(20, entry=0.00002, exit_=0.000005, kelly=0.0001)
+        report = engine.robustness(code, bars, n_resamples=2000, n_paths=20, seed=1)
+        assert report.n_resamples == 2000 and report.n_paths == 20
+        for intervals in (report.bootstrap, report.monte_carlo):
+            score = intervals["composite_score"]
+            assert score.lower <= score.mean <= score.upper
+        again = engine.robustness(code, bars, n_resamples=2000, n_paths=20, seed=1)
+        assert again.bootstrap == report.bootstrap
+
+    def test_bootstrap_blocks_do_not_change_intervals(self, monkeypatch):
+        from core import robustness
+        rng = np.random.default_rng(3)
+        pnl = rng.normal(5, 50, 300)
+        whole = robustness.bootstrap_intervals(pnl, pnl / 100, 10000, n_resamples=3000, seed=2)
+        monkeypatch.setattr(robustness, "_BOOTSTRAP_CELLS", 1000)  # 3 resamples per block
+        assert robustness.bootstrap_intervals(pnl, pnl / 100, 10000, n_resamples=3000, seed=2) == whole
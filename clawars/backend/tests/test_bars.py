@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.bars import Bars, MS_PER_HOUR, as_bars, from_epoch_ms, to_epoch_ms
+
+
+@pytest.fixture
+def bars():
+    closes = 100 + np.cumsum(np.sin(np.arange(500)))
+    return Bars.from_closes(closes, start=datetime(2024, 1, 1), interval_ms=MS_PER_HOUR)
+
+
+class TestBars:
+    """Columnar bar container"""
+
+    def test_columns_are_typed_and_contiguous(self, bars):
+        assert bars.timestamp.dtype == np.int64
+        for name in Bars.PRICE_COLUMNS:
+            column = getattr(bars, name)
+            assert column.dtype == np.float64
+            assert column.flags.c_contiguous
+        assert np.all(bars.high >= bars.low)
+
+    def test_between_is_zero_copy(self, bars):
+        window = bars.between(datetime(2024, 1, 2), datetime(2024, 1, 3))
+        assert len(window) == 25
+        assert from_epoch_ms(window.start) == datetime(2024, 1, 2)
+        assert from_epoch_ms(window.end) == datetime(2024, 1, 3)
+        assert np.shares_memory(window.close, bars.close)
+
+    def test_save_and_memory_map(self, bars, tmp_path):
+        bars.save(str(tmp_path / "btc"))
+        loaded = Bars.load(str(tmp_path / "btc"))
+        assert isinstance(loaded.close.base, np.memmap) or isinstance(loaded.close, np.memmap)
+        np.testing.assert_array_equal(loaded.close, bars.close)
+        np.testing.assert_array_equal(loaded.timestamp, bars.timestamp)
+        sliced = loaded.between(bars.timestamp[10], bars.timestamp[20])
+        assert len(sliced) == 11
+
+    def test_as_bars_wraps_close_series(self):
+        wrapped = as_bars([1.0, 2.0, 3.0])
+        np.testing.assert_array_equal(wrapped.close, [1.0, 2.0, 3.0])
+        assert as_bars(wrapped) is wrapped
+
+    def test_epoch_round_trip(self):
+        when = datetime(2023, 6, 1, 12, 30)
+        assert from_epoch_ms(to_epoch_ms(when)) == when
@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataclasses import replace
+
+from benchmarks import engine as bench
+from benchmarks.engine import BenchmarkRun, Measurement, compare, density_signals
+from core.backtest_engine import SignalType
+
+TINY = {"bars": [600], "lookbacks": [20], "densities": [10], "strategies": [2], "sweep_bars": [600]}
+
+
+class TestEngineBenchmarks:
+    """Stage benchmarks, history and regression gate"""
+
+    def test_profile_measures_every_stage(self):
+        run = bench.run_profile(TINY, repeat=1)
+        assert [m.key for m in run.measurements] == [
+            "signals/bars=600/lookback=20",
+            "simulate/bars=600/density=10",
+            "metrics/bars=600/density=10",
+            "sweep/bars=600/strategies=2",
+        ]
+        assert all(m.seconds > 0 and m.peak_bytes > 0 for m in run.measurements)
+        assert run.by_key()["simulate/bars=600/density=10"].trades == 6
+
+        signals = density_signals(1000, 10)
+        assert signals.count(SignalType.CLOSE) == 10
+        assert signals.count(SignalType.LONG) == signals.count(SignalType.SHORT) == 5
+
+    def test_compare_flags_slowdowns_past_threshold(self):
+        def run(*seconds):
+            return BenchmarkRun("quick", [Measurement("simulate", {"bars": i}, s, 0) for i, s in enumerate(seconds)])
+
+        baseline = run(0.100, 0.100, 0.001, 0.100)
+        current = run(0.105, 0.130, 0.004, 0.050)
+        assert [r.key for r in compare(baseline, current, threshold_pct=10)] == ["simulate/bars=1"]
+        assert compare(baseline, current, threshold_pct=50) == []
+        # Sub-floor stages are noise; stages missing from the baseline are new
+        assert compare(baseline, current, 10, min_seconds=0.0)[-1].key == "simulate/bars=2"
+        assert compare(run(), current, 10) == []
+
+    def test_history_and_cli_gate(self, tmp_path, monkeypatch):
+        history = str(tmp_path / "bench" / "history.jsonl")
+        fast = BenchmarkRun("quick", [Measurement("signals", {"bars": 1}, 0.1, 10)], host="h")
+        bench.append_history(history, fast)
+        assert bench.load_history(history)[0] == fast
+
+        monkeypatch.setattr(bench, "PROFILES", {"quick": TINY})
+        slow = replace(fast, measurements=[Measurement("signals", {"bars": 1}, 0.5, 10)])
+        monkeypatch.setattr(bench, "run_profile", lambda *args, **kwargs: slow)
+        assert bench.main(["--history", history, "--compare"]) == 1
+        assert len(bench.load_history(history)) == 2
+        # The slow run is now the baseline
+        assert bench.main(["--history", history, "--compare", "--no-save"]) == 0
+        assert len(bench.load_history(history)) == 2
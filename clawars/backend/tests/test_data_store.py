@@ -0,0 +1,129 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.bars import Bars, MS_PER_HOUR, to_epoch_ms
+from core.data_store import CHUNK_BARS, BarStore
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _bars(n, start=datetime(2020, 1, 1), interval=4 * MS_PER_HOUR):
+    closes = 100 + np.cumsum(np.random.default_rng(n).normal(0, 1, n))
+    return Bars.from_closes(closes, start=start, interval_ms=interval)
+
+
+class TestBarStore:
+    """Chunked columnar history with range queries"""
+
+    def test_range_query_across_chunks(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        bars = _bars(CHUNK_BARS + 5000, interval=MS_PER_HOUR)
+        assert store.append("btcusdt", "1H", bars) == len(bars)
+        assert store.assets() == ["BTCUSDT"]
+        assert store.timeframes("BTCUSDT") == ["1H"]
+        assert len(os.listdir(tmp_path / "BTCUSDT" / "1H")) >= 2
+
+        start, end = int(bars.timestamp[100]), int(bars.timestamp[-100])
+        got = store.bars("BTCUSDT", "1H", start, end)
+        np.testing.assert_array_equal(got.close, bars.close[100:-99])
+        assert store.span("BTCUSDT", "1H") == (bars.start, bars.end)
+
+        # Inside one chunk the result is a view on the memory-mapped file
+        inner = store.bars("BTCUSDT", "1H", start, int(bars.timestamp[200]))
+        assert not inner.close.flags.owndata
+
+    def test_append_merges_and_overwrites(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        bars = _bars(300)
+        store.append("ETHUSDT", "4H", bars[:200])
+        assert len(store.bars("ETHUSDT", "4H")) == 200
+
+        revised = bars[150:300]
+        revised.close[:] += 1.0
+        store.append("ETHUSDT", "4H", revised)
+        got = store.bars("ETHUSDT", "4H")
+        assert len(got) == 300
+        np.testing.assert_array_equal(got.close[:150], bars.close[:150])
+        np.testing.assert_array_equal(got.close[150:], revised.close)
+
+    def test_revisions_change_on_every_append(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        bars = _bars(300)
+        store.append("ETHUSDT", "4H", bars[:200])
+        first = store.dataset_id("ETHUSDT", "4H")
+        series = tmp_path / "ETHUSDT" / "4H"
+        stamp = os.stat(series).st_mtime_ns
+        store.append("ETHUSDT", "4H", bars[200:])
+        os.utime(series, ns=(stamp, stamp))  # a coarse clock would look like this
+        second = store.dataset_id("ETHUSDT", "4H")
+        assert second != first
+        assert store.first_change_since("ETHUSDT", "4H", first) == int(bars.timestamp[200])
+
+        store.append("ETHUSDT", "4H", bars[10:11])  # overwrite an old row
+        assert store.first_change_since("ETHUSDT", "4H", first) == int(bars.timestamp[10])
+        assert store.first_change_since("ETHUSDT", "4H", store.dataset_id("ETHUSDT", "4H")) is None
+        assert store.first_change_since("ETHUSDT", "4H", "elsewhere@x.1") is None
+
+        # A recreated series starts a new token, so old ids never match it again
+        shutil.rmtree(series)
+        store.append("ETHUSDT", "4H", bars[:200])
+        assert store.dataset_id("ETHUSDT", "4H") != first
+
+    def test_import_csv_and_klines(self, tmp_path):
+        store = BarStore(str(tmp_path / "store"))
+        with_header = tmp_path / "a.csv"
+        with_header.write_text(
+            "date,open,high,low,close,volume\n"
+            "2024-01-01T00:00:00,1,2,0.5,1.5,10\n"
+            "2024-01-01T04:00:00,1.5,2,1,1.8,12\n"
+        )
+        assert store.import_csv("SOLUSDT", "4H", str(with_header)) == 2
+        got = store.bars("SOLUSDT", "4H", datetime(2024, 1, 1, 4), None)
+        assert got.timestamp.tolist() == [to_epoch_ms(datetime(2024, 1, 1, 4))]
+        assert got.close.tolist() == [1.8]
+
+        # Binance dump: no header, microsecond open_time, extra columns ignored
+        dump = tmp_path / "b.csv"
+        dump.write_text("1704067200000000,42000,42100,41900,42050,3.5,1704081599999999,0,0,0,0,0\n")
+        store.import_csv("BTCUSDT", "4H", str(dump))
+        assert store.bars("BTCUSDT", "4H").start == 1704067200000
+
+        # Milliseconds before 1973 look like seconds unless the unit is given
+        old = [[86_400_000, 1, 2, 0.5, 1.5, 10]]
+        store.import_klines("OLD", "1D", old, unit="ms")
+        assert store.bars("OLD", "1D").start == 86_400_000
+        with pytest.raises(ValueError, match="unit"):
+            store.import_klines("OLD", "1D", old, unit="ns")
+
+    @pytest.mark.anyio
+    async def test_run_backtest_uses_stored_history(self, tmp_path, monkeypatch):
+        from core import data_store
+        from core.backtest_engine import BacktestEngine
+
+        store = BarStore(str(tmp_path))
+        bars = _bars(600)
+        store.append("BTCUSDT", "4H", bars)
+        monkeypatch.setattr(data_store, "_default_store", store)
+
+        engine = BacktestEngine()
+        start, end = datetime(2020, 1, 10), datetime(2020, 2, 20)
+        stored = engine._load_bars(start, end, "BTCUSDT", "4H", None)
+        np.testing.assert_array_equal(stored.close, bars.between(start, end).close)
+        result = await engine.run_backtest(
+            "//@version=5\nstrategy('x')", "pine_script", start, end, asset="BTCUSDT", timeframe="4H"
+        )
+        assert result.equity_curve[0]["timestamp"] == to_epoch_ms(start)
+        with pytest.raises(ValueError):
+            await engine.run_backtest(
+                "", "pine_script", datetime(2030, 1, 1), datetime(2030, 2, 1), asset="BTCUSDT", timeframe="4H"
+            )
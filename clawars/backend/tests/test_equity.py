@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from core.equity import downsample_equity, lttb_indices
+from core.metrics import MetricsAccumulator
+
+
+def _replayed_drawdown(points, initial):
+    acc = MetricsAccumulator(initial)
+    for point in points:
+        acc.add_equity(point["equity"])
+    return acc.max_drawdown
+
+
+class TestEquityDownsampling:
+    """Stored curves are small but keep drawdown and final equity exact"""
+
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        y = np.zeros(1000)
+        y[437] = 50.0
+        picks = lttb_indices(y, 20)
+        assert len(picks) == 20
+        assert picks[0] == 0 and picks[-1] == 999
+        assert 437 in picks
+        assert np.all(np.diff(picks) > 0)
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_replayed_drawdown_is_exact(self, seed):
+        rng = np.random.default_rng(seed)
+        equity = 10000.0 + np.cumsum(rng.normal(0, 40, 20000))
+        if seed == 3:
+            equity -= 30000.0  # account blown through zero
+        full = MetricsAccumulator(10000.0)
+        full.add_equity_array(equity)
+
+        timestamps = np.arange(len(equity), dtype=np.int64) * 60000
+        points = downsample_equity(timestamps, equity, 200, 10000.0)
+        assert len(points) <= 2 * 201
+        assert points[-1] == {"timestamp": int(timestamps[-1]), "equity": float(equity[-1])}
+        assert _replayed_drawdown(points, 10000.0) == full.max_drawdown
+
+    def test_engine_curve_is_bar_resolution(self):
+        from datetime import datetime
+        from core.backtest_engine import BacktestEngine, PineScriptEngine
+        from test_backtest_engine import _strategy_code
+
+        engine = BacktestEngine(equity_points=50)
+        bars = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 3, 1), seed=3)
+        signals = PineScriptEngine(_strategy_code(10, 0.00002, 0.000005, 0.0001)).generate_signals(bars)
+        metrics = MetricsAccumulator(engine.initial_capital)
+        trades, curve = engine._simulate_trades(bars, signals, 0.0001, metrics)
+        assert len(trades) > 0
+        assert len(curve) <= 102
+        assert curve[0]["timestamp"] == int(bars.timestamp[0])
+        assert curve[-1]["timestamp"] == int(bars.timestamp[-1])
+        assert _replayed_drawdown(curve, engine.initial_capital) == metrics.max_drawdown
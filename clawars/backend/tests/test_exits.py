@@ -0,0 +1,123 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.backtest_engine import BacktestEngine, PineScriptEngine
+from core.bars import Bars, MS_PER_HOUR
+from core.exits import ExitStage
+from core.synthetic import SyntheticMarket
+
+STRATEGIES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "strategies")
+
+
+def _bars(n=5000, seed=8):
+    return SyntheticMarket(seed).gbm(1, n, 0.0, 0.01, start=datetime(2024, 1, 1), interval_ms=MS_PER_HOUR).bars(0)
+
+
+def _reference(bars, entry, direction, signal_exit, stop_loss, take_profit, hours):
+    """Bar-by-bar walk of the same rules"""
+    stop = bars.close[entry] * (1 - direction * stop_loss)
+    limit = bars.close[entry] * (1 + direction * take_profit)
+    last = len(bars) - 1 if signal_exit is None else signal_exit
+    for i in range(entry + 1, last + 1):
+        low, high, opened = bars.low[i], bars.high[i], bars.open[i]
+        if (direction > 0 and (low <= stop or high >= limit)) or (direction < 0 and (high >= stop or low <= limit)):
+            if direction * (opened - stop) <= 0:
+                return i, opened, "stop_loss"
+            if direction * (opened - limit) >= 0:
+                return i, opened, "take_profit"
+            adverse = low if direction > 0 else high
+            return (i, stop, "stop_loss") if direction * (adverse - stop) <= 0 else (i, limit, "take_profit")
+        if bars.timestamp[i] >= bars.timestamp[entry] + hours * MS_PER_HOUR:
+            return i, bars.close[i], "time_stop"
+    return signal_exit, None if signal_exit is None else bars.close[signal_exit], "Signal"
+
+
+class TestExitStage:
+    """First stop, target or time limit after each entry"""
+
+    def test_matches_bar_by_bar_walk(self):
+        bars = _bars()
+        rng = np.random.default_rng(1)
+        for stop_loss, take_profit, hours in ((0.02, 0.03, 10_000), (0.05, 0.01, 36), (0.5, 0.5, 12)):
+            stage = ExitStage(bars, stop_loss, take_profit, hours * MS_PER_HOUR)
+            for entry in rng.integers(0, len(bars) - 1, 40).tolist():
+                direction = int(rng.choice([-1, 1]))
+                signal_exit = int(rng.choice([entry + 300, len(bars) - 1])) if rng.random() < 0.8 else None
+                if signal_exit is not None:
+                    signal_exit = min(signal_exit, len(bars) - 1)
+                bar = stage.exit(entry, direction, signal_exit)
+                expected_bar, expected_price, reason = _reference(
+                    bars, entry, direction, signal_exit, stop_loss, take_profit, hours
+                )
+                assert bar == expected_bar
+                if bar is not None:
+                    assert stage.fill(bar) == (expected_price, reason)
+
+    def test_gaps_fill_at_the_open(self):
+        t = np.arange(4, dtype=np.int64) * MS_PER_HOUR
+        bars = Bars(t, [100, 100, 90, 90], [101, 101, 91, 91], [99, 99, 80, 89], [100, 100, 90, 90], [1] * 4)
+        stage = ExitStage(bars, stop_loss=0.05, take_profit=0.05)
+        assert stage.exit(0, 1, None) == 2 and stage.fill(2) == (90.0, "stop_loss")
+        assert stage.exit(1, -1, 3) == 2 and stage.fill(2) == (90.0, "take_profit")
+        assert ExitStage(bars).exit(0, 1, 3) == 3 and not ExitStage(bars).active
+
+    def test_time_stop_never_closes_the_entry_bar(self):
+        t = np.arange(4, dtype=np.int64) * MS_PER_HOUR
+        bars = Bars(t, [100] * 4, [101] * 4, [99] * 4, [100] * 4, [1] * 4)
+        stage = ExitStage(bars, time_stop_ms=0)
+        assert stage.exit(1, 1, None) == 2 and stage.fill(2) == (100.0, "time_stop")
+        for hours in (0, -1, float("nan")):
+            with pytest.raises(ValueError, match="time_stop_hours"):
+                BacktestEngine(time_stop_hours=hours)
+
+
+class TestEngineExits:
+    """State machines re-enter after protective exits; fills reach the trade log"""
+
+    def test_residual_rule_with_stops(self):
+        bars = _bars(3000)
+        source = (
+            "lookback = input.int(20, \"Lookback\")\n"
+            "entryThreshold = input.float(0.00004, \"Entry\")\n"
+            "exitThreshold = input.float(-0.00004, \"Exit\")\n"
+        )
+        engine = BacktestEngine(stop_loss=0.01, take_profit=0.015, time_stop_hours=4)
+        exits = engine._exit_stage(bars)
+        pine = PineScriptEngine(source)
+        signals = pine.generate_signals(bars, exits)
+        trades, _ = engine._simulate_trades(bars, signals, 0.0001, exits=exits)
+        assert {1, 2, 3} <= set(trades.exit_reason.tolist())  # stop, target and time stop fills
+        held = (trades.exit_time - trades.entry_time) / MS_PER_HOUR
+        assert held.max() <= 4
+        assert len(trades) > len(BacktestEngine()._simulate_trades(bars, pine.generate_signals(bars), 0.0001)[0])
+
+        # Opaque codes (Python strategies) get the same exits imposed: every
+        # position closes within the time stop, at a bar the stage chose
+        stage = engine._exit_stage(bars)
+        imposed = stage.apply(pine.generate_signal_codes(bars))
+        entries, closes = np.flatnonzero((imposed == 1) | (imposed == 2)), np.flatnonzero(imposed == 3)
+        assert len(closes) > 0 and len(entries) - len(closes) in (0, 1)
+        assert (bars.timestamp[closes] - bars.timestamp[entries[:len(closes)]]).max() <= 4 * MS_PER_HOUR
+
+    def test_pine_brackets(self):
+        with open(os.path.join(STRATEGIES, "simons_mean_reversion_v1.pine")) as f:
+            source = f.read()
+        bars = SyntheticMarket(3).gbm(1, 6000, 0.0, 0.01, start=datetime(2024, 1, 1), interval_ms=4 * MS_PER_HOUR).bars(0)
+        engine = BacktestEngine()
+        exits = engine._exit_stage(bars)
+        signals = PineScriptEngine(source).generate_signals(bars, exits)
+        trades, _ = engine._simulate_trades(bars, signals, 0.0001, exits=exits)
+        records = trades.to_records()
+        assert records and {r["exit_reason"] for r in records} <= {"stop_loss", "take_profit"}
+        for record in records:
+            # Stops lose and targets win
+            move = (record["exit_price"] - record["entry_price"]) / record["entry_price"]
+            if record["direction"] == "SHORT":
+                move = -move
+            assert (move > 0) == (record["exit_reason"] == "take_profit")
@@ -0,0 +1,109 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.backtest_engine import residual_scores
+from core.bars import Bars, MS_PER_HOUR
+from core.data_store import BarStore
+from core.indicator_cache import IndicatorCache
+from core.pine_compiler import compile_pine
+from core.synthetic import SyntheticMarket
+
+SOURCE = (
+    "dev = ta.stdev(close - close[1], 20)\n"
+    "corr = ta.correlation(close, hl2[3], 17)\n"
+    "avg = ta.ema(close, 9)\n"
+    "mix = ta.wma(math.abs(close - open), 13) + ta.atr(5)\n"
+)
+
+
+def _bars(n=5000, dataset="test:1"):
+    bars = SyntheticMarket(3).gbm(1, n, 0.0, 0.01, start=datetime(2024, 1, 1), interval_ms=MS_PER_HOUR).bars(0)
+    bars.dataset = dataset
+    return bars
+
+
+def _anonymous(bars):
+    return Bars(*(getattr(bars, name) for name in Bars.COLUMNS))
+
+
+class TestIndicatorCache:
+    """Series keyed by dataset, indicator and parameters"""
+
+    def test_contained_windows_match_recomputation(self):
+        bars = _bars()
+        compiled = compile_pine(SOURCE)
+        cache = IndicatorCache(1 << 30)
+        for name in ("dev", "corr", "avg", "mix"):
+            compiled.series(bars, name, cache)
+        assert not compiled.series(bars, "dev", cache).flags.writeable
+        for lo, hi in ((7, 4900), (1234, 1260), (4990, 5000)):
+            window = bars[lo:hi]
+            for name in ("dev", "corr", "avg", "mix"):
+                np.testing.assert_array_equal(
+                    compiled.series(window, name, cache), compiled.series(_anonymous(window), name)
+                )
+        stats = cache.stats()
+        assert stats["slices"] > 0
+        # Recursive averages depend on the whole window: never sliced
+        assert compiled.series(bars[7:4900], "avg", cache) is compiled.series(bars[7:4900], "avg", cache)
+
+        scores = residual_scores(bars.close[100:3000], 20, (1.5, 0.5))
+        compute = lambda b: residual_scores(b.close, 20, (1.5, 0.5))
+        cache.series(bars, "residual", (20,), compute, history=22)
+        np.testing.assert_array_equal(cache.series(bars[100:3000], "residual", (20,), compute, history=22), scores)
+
+    def test_keys_eviction_and_strided_slices(self):
+        bars = _bars(1000)
+        cache = IndicatorCache(8000 * 2)
+        calls = []
+
+        def compute(b):
+            calls.append(len(b))
+            return b.close * 2
+
+        cache.series(bars, "double", (), compute)
+        cache.series(bars, "double", (), compute)
+        cache.series(_bars(1000, "test:2"), "double", (), compute)
+        cache.series(bars, "double", (1,), compute)
+        assert calls == [1000, 1000, 1000]
+        assert cache.stats()["entries"] == 2  # LRU bound of two series
+        cache.series(bars, "double", (), compute)
+        assert calls[-1] == 1000 and len(calls) == 4
+
+        with pytest.raises(ValueError):
+            cache.series(bars, "double", (1,), compute)[0] = 1.0  # stored read-only
+        assert bars[::2].dataset is None
+        cache.series(_anonymous(bars), "double", (), compute)
+        assert cache.stats()["entries"] == 2
+
+    def test_disk_tier_shared_between_processes(self, tmp_path):
+        bars = _bars(2000)
+        writer = IndicatorCache(1 << 20, str(tmp_path), 1 << 30)
+        writer.series(bars, "sma", (5,), lambda b: np.convolve(b.close, np.ones(5) / 5)[:len(b)], history=5)
+
+        reader = IndicatorCache(1 << 20, str(tmp_path), 1 << 30)
+        window = bars[500:1500]
+        expected = np.convolve(window.close, np.ones(5) / 5)[:len(window)]
+        found = reader.series(window, "sma", (5,), lambda b: np.convolve(b.close, np.ones(5) / 5)[:len(b)], history=5)
+        np.testing.assert_allclose(found, expected, rtol=1e-12)
+        assert reader.stats()["disk_hits"] == 1 and reader.misses == 0
+
+        small = IndicatorCache(1 << 20, str(tmp_path), 1)
+        small.prune()
+        assert not any(files for _, _, files in os.walk(str(tmp_path)))
+
+    def test_store_revision_changes_dataset(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        store.append("BTC", "1H", _anonymous(_bars(100)))
+        first = store.bars("BTC", "1H")
+        assert first.dataset and first.between(first.start, first.end).dataset == first.dataset
+        os.utime(os.path.join(str(tmp_path), "BTC", "1H"), ns=(0, 0))  # only writes revise
+        assert store.bars("BTC", "1H").dataset == first.dataset
+        store.append("BTC", "1H", first[50:51])
+        assert store.bars("BTC", "1H").dataset != first.dataset
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+import statistics
+
+import pytest
+
+from core.metrics import ExactMoments, MetricsAccumulator
+
+
+def _batch_metrics(pnls, pnl_pcts, equity_points, initial_capital):
+    """Original multi-pass formulas from BacktestEngine._calculate_metrics"""
+    total_trades = len(pnls)
+    winning_trades = sum(1 for p in pnls if p and p > 0)
+    win_rate = winning_trades / total_trades * 100
+    gross_profit = sum(p for p in pnls if p and p > 0)
+    gross_loss = abs(sum(p for p in pnls if p and p <= 0))
+    profit_factor = gross_profit / gross_loss if gross_loss > 0 else 0
+    avg_trade_pnl = sum(p for p in pnls if p) / total_trades
+    total_return = (equity_points[-1] - initial_capital) / initial_capital * 100
+    returns = [r for r in pnl_pcts if r]
+    if len(returns) > 1:
+        avg_return = statistics.mean(returns)
+        std_return = statistics.stdev(returns)
+        sharpe = avg_return / std_return * (252 ** 0.5) if std_return > 0 else 0
+        downside = [r for r in returns if r < 0]
+        downside_std = statistics.stdev(downside) if len(downside) > 1 else 1
+        sortino = avg_return / downside_std * (252 ** 0.5) if downside_std > 0 else 0
+    else:
+        sharpe = sortino = 0
+    peak, max_dd = initial_capital, 0
+    for equity in equity_points:
+        peak = max(peak, equity)
+        max_dd = min(max_dd, (equity - peak) / peak * 100)
+    score = min(sharpe, 5) * 0.4 + min(profit_factor, 3) * 0.3 + win_rate * 0.2 - abs(max_dd) * 0.1
+    return {
+        "total_trades": total_trades,
+        "winning_trades": winning_trades,
+        "losing_trades": total_trades - winning_trades,
+        "win_rate": win_rate,
+        "profit_factor": profit_factor,
+        "sharpe_ratio": sharpe,
+        "sortino_ratio": sortino,
+        "max_drawdown": max_dd,
+        "avg_trade_pnl": avg_trade_pnl,
+        "total_return": total_return,
+        "composite_score": round(max(0, min(100, score)), 2),
+    }
+
+
+class TestMetricsAccumulator:
+    """Streaming metrics must equal the original batch formulas exactly"""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_identical_to_batch_formulas(self, seed):
+        rng = random.Random(seed)
+        pnls = [rng.gauss(5, 50) for _ in range(rng.randint(2, 400))]
+        pnls[0] = 0.0
+        pnl_pcts = [p / 37.0 for p in pnls]
+        equity, points = 10000.0, []
+        acc = MetricsAccumulator(10000.0)
+        for pnl, pct in zip(pnls, pnl_pcts):
+            acc.add_trade(pnl, pct)
+            equity += pnl
+            points.append(equity)
+            acc.add_equity(equity)
+        assert acc.result() == _batch_metrics(pnls, pnl_pcts, points, 10000.0)
+
+    def test_state_round_trip(self):
+        acc = MetricsAccumulator(1000.0)
+        for pnl in (10.0, -4.0, 7.5):
+            acc.add_trade(pnl, pnl / 10)
+            acc.add_equity(1000.0 + pnl)
+        restored = MetricsAccumulator.from_state(acc.get_state())
+        for target in (acc, restored):
+            target.add_trade(-2.0, -0.2)
+            target.add_equity(990.0)
+        assert restored.result() == acc.result()
+
+    def test_empty(self):
+        assert MetricsAccumulator(100.0).result()["composite_score"] == 0
+
+    def test_exact_moments_match_statistics(self):
+        rng = random.Random(3)
+        values = [rng.uniform(-1e6, 1e6) * 10 ** rng.randint(-12, 3) for _ in range(300)]
+        moments = ExactMoments()
+        for v in values:
+            moments.add(v)
+        assert moments.mean == statistics.mean(values)
+        assert moments.stdev == statistics.stdev(values)
@@ -0,0 +1,219 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.bars import MS_PER_HOUR
+from core.pine_compiler import compile_pine
+from core.pine_parser import PineCompileError, PineSyntaxError
+from core.rolling import EMA
+from core.synthetic import SyntheticMarket
+
+STRATEGIES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "strategies")
+
+
+def _bars(n=600, seed=4, interval_ms=MS_PER_HOUR):
+    return SyntheticMarket(seed).gbm(1, n, 0.0, 0.01, start=datetime(2024, 1, 1), interval_ms=interval_ms).bars(0)
+
+
+def _series(source, name, bars):
+    return compile_pine(source).series(bars, name)
+
+
+class TestParser:
+    """Pine v5 subset front end"""
+
+    def test_wrapped_lines_ternaries_and_tuples(self):
+        source = (
+            "//@version=5\n"
+            "strategy(\"t\",\n"
+            "     overlay=true)\n"
+            "len = input.int(5, \"Length\", minval=2)\n"
+            "[mid, up, lo] = ta.bb(close, len, 2.0)\n"
+            "side = close > up ? 1 :\n"
+            "       close < lo ? -1 : 0\n"
+            "width = (up - lo) /\n"
+            "     mid\n"
+        )
+        bars = _bars()
+        compiled = compile_pine(source)
+        assert compiled.version == 5
+        assert compiled.declaration["overlay"] is True
+        assert compiled.inputs["len"].minval == 2
+        side = compiled.series(bars, "side")
+        assert set(np.unique(side)) <= {-1.0, 0.0, 1.0}
+        np.testing.assert_allclose(
+            compiled.series(bars, "width"),
+            (compiled.series(bars, "up") - compiled.series(bars, "lo")) / compiled.series(bars, "mid"),
+        )
+
+    def test_errors_carry_line_numbers(self):
+        with pytest.raises(PineSyntaxError) as info:
+            compile_pine("a = close\nb = (close + \n")
+        assert "line" in str(info.value)
+        with pytest.raises(PineCompileError):
+            compile_pine("for i = 0 to 10\n    x = i\n")
+        with pytest.raises(PineCompileError) as info:
+            compile_pine("x = ta.sma(close, bar_index)\n")
+        assert info.value.line == 1
+
+    def test_unsupported_calls_only_fail_when_orders_use_them(self):
+        compile_pine("label = str.tostring(close)\nplot(close)\n")
+        with pytest.raises(PineCompileError):
+            compile_pine("x = ta.vwap(close)\nif x > 0\n    strategy.entry(\"L\", strategy.long)\n")
+
+
+class TestIndicators:
+    """Builtins follow Pine's definitions bar for bar"""
+
+    def test_rolling_statistics(self):
+        bars = _bars()
+        c = bars.close
+        sma = _series("x = ta.sma(close, 10)", "x", bars)
+        stdev = _series("x = ta.stdev(close, 10)", "x", bars)
+        corr = _series("x = ta.correlation(close, close[1], 10)", "x", bars)
+        assert np.isnan(sma[:9]).all() and np.isnan(corr[:10]).all()
+        for i in (9, 200, 599):
+            window = c[i - 9:i + 1]
+            assert sma[i] == pytest.approx(window.mean(), rel=1e-12)
+            assert stdev[i] == pytest.approx(window.std(), rel=1e-9)
+            if i >= 10:
+                assert corr[i] == pytest.approx(np.corrcoef(window, c[i - 10:i])[0, 1], rel=1e-9)
+
+    def test_recursive_averages(self):
+        bars = _bars()
+        c = bars.close.tolist()
+
+        def reference_rma(values, length, alpha):
+            out, prev = [], math.nan
+            for i, v in enumerate(values):
+                if prev != prev:
+                    window = values[i - length + 1:i + 1] if i >= length - 1 else None
+                    prev = sum(window) / length if window and not any(w != w for w in window) else math.nan
+                else:
+                    prev = alpha * v + (1 - alpha) * prev
+                out.append(prev)
+            return np.array(out)
+
+        ema = _series("x = ta.ema(close, 12)", "x", bars)
+        np.testing.assert_allclose(ema, reference_rma(c, 12, 2 / 13), rtol=1e-12)
+        streaming = EMA(12)  # the live path agrees bar by bar
+        np.testing.assert_allclose([streaming.update(v) for v in c], ema, rtol=1e-12)
+
+        # An na restarts the average from a fresh SMA window
+        gapped = _series("x = ta.ema(bar_index % 100 == 50 ? na : close, 12)", "x", bars)
+        expected = reference_rma([math.nan if i % 100 == 50 else v for i, v in enumerate(c)], 12, 2 / 13)
+        np.testing.assert_allclose(gapped, expected, rtol=1e-12)
+        assert np.isnan(gapped[50:62]).all() and not np.isnan(gapped[62])
+
+        tr = [bars.high[0] - bars.low[0]] + [
+            max(bars.high[i] - bars.low[i], abs(bars.high[i] - c[i - 1]), abs(bars.low[i] - c[i - 1]))
+            for i in range(1, len(c))
+        ]
+        atr = _series("x = ta.atr(14)", "x", bars)
+        np.testing.assert_allclose(atr, reference_rma(tr, 14, 1 / 14), rtol=1e-12)
+
+        changes = [math.nan] + [c[i] - c[i - 1] for i in range(1, len(c))]
+        up = reference_rma([max(d, 0) if d == d else d for d in changes], 14, 1 / 14)
+        down = reference_rma([max(-d, 0) if d == d else d for d in changes], 14, 1 / 14)
+        rsi = _series("x = ta.rsi(close, 14)", "x", bars)
+        np.testing.assert_allclose(rsi, 100 - 100 / (1 + up / down), rtol=1e-12)
+
+    def test_math_round_half_away_from_zero(self):
+        bars = _bars(6)
+        source = "x = math.round(bar_index - 2.5)\ny = math.round(-bar_index * 0.4)"
+        np.testing.assert_array_equal(_series(source, "x", bars), [-3, -2, -1, 1, 2, 3])
+        np.testing.assert_array_equal(_series(source, "y", bars), [0, 0, -1, -1, -2, -2])
+
+    def test_var_keeps_last_assignment(self):
+        source = (
+            "var float lastUp = na\n"
+            "before = lastUp\n"
+            "if close > open\n"
+            "    lastUp := close\n"
+        )
+        bars = _bars()
+        compiled = compile_pine(source)
+        expected_before, expected_after, last = [], [], math.nan
+        for o, c in zip(bars.open, bars.close):
+            expected_before.append(last)
+            if c > o:
+                last = c
+            expected_after.append(last)
+        np.testing.assert_array_equal(compiled.series(bars, "before"), expected_before)
+        np.testing.assert_array_equal(compiled.series(bars, "lastUp"), expected_after)
+        with pytest.raises(PineCompileError):
+            compile_pine("var x = 0.0\nif close > x\n    x := close\n")
+
+    def test_security_uses_completed_higher_timeframe_bars(self):
+        bars = _bars(24 * 5)
+        daily = _series("d = request.security(syminfo.tickerid, \"D\", close)", "d", bars)
+        closes = bars.close.reshape(5, 24)[:, -1]
+        assert np.isnan(daily[:23]).all()
+        assert daily[23] == closes[0]           # last hour completes the day
+        assert (daily[24:47] == closes[0]).all()  # next day sees only the completed one
+        assert daily[47] == closes[1]
+
+
+class TestStrategies:
+    """Orders lower to entry/exit conditions for the engine's state machine"""
+
+    def test_repository_strategies_compile_and_trade(self):
+        bars = _bars(3000, seed=2)
+        for name in os.listdir(STRATEGIES):
+            if name.endswith(".pine"):
+                with open(os.path.join(STRATEGIES, name)) as f:
+                    compiled = compile_pine(f.read())
+                assert compiled.has_orders
+                assert len(compiled.signal_codes(bars)) == len(bars)
+
+    def test_position_state_and_closed_trades(self):
+        source = (
+            "maxTrades = input.int(2, \"Max\")\n"
+            "up = close > close[1]\n"
+            "if up and strategy.position_size == 0 and strategy.closedtrades < maxTrades\n"
+            "    strategy.entry(\"L\", strategy.long)\n"
+            "if not up and strategy.position_size > 0\n"
+            "    strategy.close(\"L\")\n"
+        )
+        bars = _bars()
+        up = bars.close[1:] > bars.close[:-1]
+        codes = compile_pine(source).signal_codes(bars)
+        entries, exits = np.flatnonzero(codes == 1), np.flatnonzero(codes == 3)
+        assert len(entries) == 2 and len(exits) == 2
+        first = int(np.argmax(up)) + 1
+        assert entries[0] == first
+        assert exits[0] == first + 1 + int(np.argmax(~up[first:]))
+        assert len(np.flatnonzero(compile_pine(source, {"maxTrades": 5}).signal_codes(bars) == 1)) == 5
+        with pytest.raises(PineCompileError):
+            compile_pine(source, {"nope": 1})
+
+    def test_engine_runs_script_orders(self):
+        from core.backtest_engine import BacktestEngine, PineScriptEngine, SignalType
+        source = (
+            "lookback = input.int(10, \"Lookback\")\n"
+            "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+            "fast = ta.sma(close, lookback)\n"
+            "if ta.crossover(close, fast)\n"
+            "    strategy.entry(\"L\", strategy.long)\n"
+            "if ta.crossunder(close, fast)\n"
+            "    strategy.close(\"L\")\n"
+        )
+        bars = BacktestEngine()._generate_price_data(datetime(2023, 1, 1), datetime(2023, 3, 1), seed=3)
+        engine = PineScriptEngine(source)
+        assert engine.parsed["lookback"] == 10 and engine.parsed["kelly_fraction"] == 0.0001
+        signals = engine.generate_signals(bars)
+        assert signals.count(SignalType.LONG) > 0
+        assert PineScriptEngine(source, vectorized=False).generate_signals(bars) == signals
+
+        backtester = BacktestEngine()
+        entries = backtester.sweep(source, bars, grid={"lookback": [5, 20]}, max_workers=1)
+        for entry in entries:
+            single = PineScriptEngine(source, inputs={"lookback": entry.params["lookback"]})
+            trades, curve = backtester._simulate_trades(bars, single.generate_signals(bars), 0.0001)
+            assert backtester._calculate_metrics(trades, curve).summary() == entry.metrics
@@ -0,0 +1,111 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+import types
+from datetime import datetime
+
+import pytest
+
+from core.backtest_engine import BacktestEngine
+from core import pipeline
+from core.pipeline import BacktestJob, BacktestPipeline, prefetch, process_pool
+
+SOURCE = (
+    "lookback = input.int(20, \"Lookback\")\n"
+    "entryThreshold = input.float(0.00002, \"Entry\")\n"
+    "exitThreshold = input.float(0.000005, \"Exit\")\n"
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+)
+
+
+class TestPrefetch:
+    """Bounded read-ahead on a background thread"""
+
+    def test_order_bound_and_errors(self):
+        produced = []
+
+        def items():
+            for i in range(20):
+                produced.append(i)
+                yield i
+
+        seen = []
+        for item in prefetch(items(), 3):
+            time.sleep(0.002)
+            assert len(produced) <= len(seen) + 1 + 3 + 1  # consumed + queued + in hand
+            seen.append(item)
+        assert seen == list(range(20))
+
+        def failing():
+            yield 1
+            raise KeyError("boom")
+
+        reader = prefetch(failing(), 2)
+        assert next(reader) == 1
+        with pytest.raises(KeyError):
+            next(reader)
+
+    def test_overlaps_loading_with_compute_and_stops_early(self):
+        def load(i):
+            time.sleep(0.05)
+            return i
+
+        began = time.perf_counter()
+        for _ in prefetch(range(8), 2, load):
+            time.sleep(0.05)
+        assert time.perf_counter() - began < 0.7  # 0.8s when loading and computing alternate
+
+        threads = threading.active_count()
+        reader = prefetch(iter(range(1000)), 1)
+        next(reader)
+        reader.close()
+        time.sleep(0.3)
+        assert threading.active_count() == threads
+
+
+class TestProcessPool:
+    """One pool policy for sweeps and pipelines"""
+
+    def test_inline_for_one_worker_and_daemonic_processes(self, monkeypatch):
+        with process_pool(1) as pool:
+            assert pool is None
+        with process_pool(2) as pool:
+            assert list(pool.map(abs, [-1, -2])) == [1, 2]
+        monkeypatch.setattr(pipeline.multiprocessing, "current_process", lambda: types.SimpleNamespace(daemon=True))
+        with process_pool(4) as pool:
+            assert pool is None
+
+
+class TestBacktestPipeline:
+    """Queued backtests with datasets loaded ahead"""
+
+    def _jobs(self):
+        start, end = datetime(2023, 1, 1), datetime(2023, 4, 1)
+        return [
+            BacktestJob(SOURCE, "pine_script", start, end, seed=1),
+            BacktestJob(SOURCE, "cobol", start, end, seed=2),
+            BacktestJob(SOURCE, "pine_script", start, end, seed=3, timeframe="1H"),
+        ]
+
+    def test_matches_run_backtest_and_isolates_failures(self):
+        engine = BacktestEngine()
+        outcomes = list(BacktestPipeline(engine).run(self._jobs(), use_cache=False))
+        assert [o.job.seed for o in outcomes] == [1, 2, 3]
+        assert isinstance(outcomes[1].error, ValueError) and outcomes[1].result is None
+        for outcome in (outcomes[0], outcomes[2]):
+            job = outcome.job
+            expected = asyncio.run(engine.run_backtest(
+                SOURCE, "pine_script", job.start_date, job.end_date, seed=job.seed,
+                timeframe=job.timeframe, use_cache=False,
+            ))
+            assert outcome.result.summary() == expected.summary()
+            assert "data" in outcome.result.timings
+
+        pooled = list(BacktestPipeline(engine, max_workers=2).run(self._jobs(), use_cache=False))
+        assert [o.result.summary() if o.result else None for o in pooled] == \
+               [o.result.summary() if o.result else None for o in outcomes]
+        assert isinstance(pooled[1].error, ValueError)
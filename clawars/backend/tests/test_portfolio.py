@@ -0,0 +1,122 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.backtest_engine import BacktestEngine, PineScriptEngine
+from core.bars import Bars, MS_PER_HOUR
+from core.pine_compiler import compile_pine
+from core.portfolio import Panel, simulate_portfolio
+from core.synthetic import SyntheticMarket
+
+SOURCE = (
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+    "maxPositions = input.int(2, \"Max positions\")\n"
+    "fast = ta.ema(close, 8)\n"
+    "slow = ta.sma(close, 30)\n"
+    "if ta.crossover(fast, slow) and strategy.closedtrades < 40\n"
+    "    strategy.entry(\"L\", strategy.long)\n"
+    "if ta.crossunder(fast, slow)\n"
+    "    strategy.close(\"L\")\n"
+)
+
+
+def _panel(assets=8, n=3000):
+    paths = SyntheticMarket(11).gbm(assets, n, 0.0, 0.01, start=datetime(2024, 1, 1), interval_ms=MS_PER_HOUR)
+    return Panel.align({f"A{i}": paths.bars(i) for i in range(assets)})
+
+
+class TestPanel:
+    """Assets aligned on one time index"""
+
+    def test_alignment_fills_gaps_after_listing(self):
+        t = np.arange(6, dtype=np.int64) * MS_PER_HOUR
+        first = Bars.from_closes([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], interval_ms=MS_PER_HOUR)
+        late = Bars(t[[2, 3, 5]], [9.0] * 3, [9.5] * 3, [8.5] * 3, [10.0, 11.0, 12.0], [1.0] * 3)
+        panel = Panel.align({"A": first, "B": late})
+        assert len(panel) == 6 and panel.assets == ["A", "B"]
+        assert panel.present[1].tolist() == [False, False, True, True, False, True]
+        assert np.isnan(panel.close[1, :2]).all()
+        assert panel.close[1, 2:].tolist() == [10.0, 11.0, 11.0, 12.0]
+        assert panel.high[1, 4] == 11.0 and panel.volume[1, 4] == 0.0
+        assert panel.asset_bars(1) is late
+        with pytest.raises(ValueError):
+            Panel.align({})
+
+
+class TestPortfolio:
+    """Vectorized signals over all assets, one cash pool"""
+
+    def test_panel_codes_match_single_asset_codes(self):
+        panel = _panel()
+        compiled = compile_pine(SOURCE)
+        codes = compiled.signal_codes(panel)
+        assert codes.shape == (8, len(panel))
+        for r in range(8):
+            np.testing.assert_array_equal(codes[r], compiled.signal_codes(panel.asset_bars(r)))
+
+        residual = PineScriptEngine("lookback = input.int(15, \"Lookback\")\n").generate_signal_codes(panel)
+        rule = PineScriptEngine("lookback = input.int(15, \"Lookback\")\n")
+        np.testing.assert_array_equal(residual[3], rule.generate_signal_codes(panel.asset_bars(3)))
+
+    def test_single_asset_matches_engine(self):
+        panel = _panel(1)
+        bars = panel.asset_bars(0)
+        engine = BacktestEngine()
+        pine = PineScriptEngine(SOURCE)
+        codes = pine.generate_signal_codes(panel)
+        # Small enough that the cash cap never binds
+        trades, assets, curve = simulate_portfolio(engine, panel, codes, 1e-5, 1)
+        expected, expected_curve = engine._simulate_trades(bars, pine.generate_signals(bars), 1e-5)
+        assert len(trades) == len(expected) > 0 and not assets.any()
+        np.testing.assert_array_equal(trades.pnl, expected.pnl)
+        assert [p["equity"] for p in curve] == [p["equity"] for p in expected_curve]
+        assert trades.entry_time[0] == bars.timestamp[np.flatnonzero(codes[0] == 1)[0]]
+
+    def test_single_asset_cash_cap(self):
+        panel = _panel(1)
+        bars = panel.asset_bars(0)
+        engine = BacktestEngine()
+        pine = PineScriptEngine(SOURCE)
+        codes = pine.generate_signal_codes(panel)
+        # Half of equity in units at prices near 100 is far more than the cash
+        trades, _, _ = simulate_portfolio(engine, panel, codes, 1.0, 1)
+        expected, _ = engine._simulate_trades(bars, pine.generate_signals(bars), 1.0)
+        np.testing.assert_array_equal(trades.entry_bar, expected.entry_bar)
+        np.testing.assert_array_equal(trades.exit_bar, expected.exit_bar)
+        assert expected.entry_price[0] * expected.size[0] > 10 * engine.initial_capital
+        assert trades.entry_price[0] * trades.size[0] == pytest.approx(engine.initial_capital)
+        assert trades.pnl[0] == pytest.approx(expected.pnl[0] * trades.size[0] / expected.size[0])
+
+    def test_position_limit_and_cash(self):
+        panel = _panel()
+        result = BacktestEngine().run_portfolio(SOURCE, panel)
+        assert result.max_positions == 2
+        trades = result.result.trades
+        entries, exits = trades.entry_time, trades.exit_time
+        # Never more than two positions overlap
+        for t in np.union1d(entries, exits).tolist():
+            assert int(((entries <= t) & (exits > t)).sum()) <= 2
+        assert sum(result.trades_by_asset().values()) == len(trades)
+
+        # Sizing on all equity is capped by uncommitted cash
+        engine = BacktestEngine()
+        engine._calculate_position_size = lambda equity, kelly: equity * 2
+        codes = compile_pine(SOURCE).signal_codes(panel)
+        trades, _, _ = simulate_portfolio(engine, panel, codes, 1.0, 8)
+        notional = trades.entry_price * trades.size
+        assert notional.max() <= engine.initial_capital * 1.01
+
+    def test_portfolio_backtest_loads_each_asset(self):
+        engine = BacktestEngine()
+        result = asyncio.run(engine.run_portfolio_backtest(
+            SOURCE, "pine_script", datetime(2023, 1, 1), datetime(2023, 6, 1), assets=["X", "Y", "Z"], seed=5
+        ))
+        assert result.assets == ["X", "Y", "Z"] and result.result.total_trades > 0
+        with pytest.raises(ValueError):
+            engine.run_portfolio(SOURCE, {"X": Bars.empty()}, strategy_type="ruby")
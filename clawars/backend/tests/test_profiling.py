@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+from structlog.testing import capture_logs
+
+from core.backtest_engine import BacktestEngine
+from core.profiling import Profiler
+
+SOURCE = (
+    "lookback = input.int(20, \"Lookback\")\n"
+    "entryThreshold = input.float(0.00002, \"Entry\")\n"
+    "exitThreshold = input.float(0.000005, \"Exit\")\n"
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+)
+
+
+def _allocate_and_sum():
+    return float(np.ones(500_000).sum())
+
+
+class TestProfiler:
+    """Per-stage timings and sampled captures"""
+
+    def test_records_stages_and_calls_hooks(self):
+        seen = []
+        profiler = Profiler(hooks=[seen.append])
+        with profiler.stage("first"):
+            _allocate_and_sum()
+        with profiler.stage("second"):
+            pass
+        assert [t.stage for t in seen] == ["first", "second"]
+        assert list(profiler.as_dict()) == ["first", "second"]
+        first = profiler.as_dict()["first"]
+        assert first["wall_seconds"] > 0 and first["cpu_seconds"] >= 0
+        assert "peak_bytes" not in first and seen[0].profile is None
+
+    @pytest.mark.skipif(not os.access("/proc/self/clear_refs", os.W_OK), reason="needs Linux /proc")
+    def test_peak_rss_is_per_stage(self):
+        profiler = Profiler()
+        with profiler.stage("large"):
+            np.ones(32_000_000).sum()  # 256 MB, freed before the next stage
+        with profiler.stage("small"):
+            pass
+        large, small = (t.process_peak_rss_bytes for t in profiler.stages)
+        assert large - small > 200_000_000
+
+    def test_cpu_time_is_the_stage_thread(self):
+        stop = threading.Event()
+
+        def spin():
+            while not stop.is_set():
+                pass
+
+        reader = threading.Thread(target=spin)
+        profiler = Profiler()
+        reader.start()
+        try:
+            with profiler.stage("idle"):
+                time.sleep(0.3)
+        finally:
+            stop.set()
+            reader.join()
+        assert profiler.stages[0].cpu_seconds < 0.1
+
+    def test_samplers_capture_slow_stages(self, tmp_path):
+        profiler = Profiler(sampler="cprofile", slow_seconds=0.0, dump_dir=str(tmp_path), backtest_id="bt1")
+        with capture_logs() as logs:
+            with profiler.stage("signals"):
+                _allocate_and_sum()
+        timing = profiler.stages[0]
+        assert "_allocate_and_sum" in timing.profile
+        assert os.path.basename(timing.profile_path).startswith("bt1-signals-")
+        assert os.path.exists(timing.profile_path)
+        assert logs[0]["event"] == "Slow backtest stage" and logs[0]["backtest_id"] == "bt1"
+
+        profiler = Profiler(sampler="tracemalloc", slow_seconds=60.0)
+        with profiler.stage("simulate"):
+            _allocate_and_sum()
+        assert profiler.stages[0].peak_bytes >= 4_000_000  # the 500k float64 temporary
+        assert profiler.stages[0].profile is None  # not slow
+
+    def test_backtest_timings_attached_and_logged(self):
+        engine = BacktestEngine()
+        with capture_logs() as logs:
+            result = asyncio.run(engine.run_backtest(
+                SOURCE, "pine_script", datetime(2023, 1, 1), datetime(2023, 3, 1),
+                use_cache=False, profiler=Profiler(backtest_id="bt2"),
+            ))
+        assert list(result.timings) == ["data", "signals", "simulate", "metrics"]
+        event = [log for log in logs if log["event"] == "Backtest stages"][0]
+        assert event["backtest_id"] == "bt2" and event["stages"] == result.timings
+        assert event["trades"] == result.total_trades and event["cache_hit"] is False
@@ -0,0 +1,135 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core import data_store
+from core.backtest_engine import BacktestEngine
+from core.bars import Bars, MS_PER_HOUR, to_epoch_ms
+from core.data_store import BarStore
+from core.resample import Resampler, resample, timeframe_bucket
+
+DAY = 24 * MS_PER_HOUR
+
+
+def _bars(n, start=datetime(2020, 1, 1), interval=MS_PER_HOUR, seed=5):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    bars = Bars.from_closes(closes, start=start, interval_ms=interval)
+    bars.high = bars.high + rng.uniform(0, 1, n)
+    bars.low = bars.low - rng.uniform(0, 1, n)
+    bars.volume = rng.uniform(1, 10, n)
+    return bars
+
+
+def _fresh(store, asset, timeframe):
+    return Resampler(store).bars(asset, timeframe)
+
+
+class TestResample:
+    """Vectorized OHLCV aggregation and cached higher timeframes"""
+
+    def test_matches_manual_aggregation(self):
+        bars = _bars(500)
+        keep = np.random.default_rng(1).uniform(size=len(bars)) > 0.2  # gaps
+        bars = Bars(*(getattr(bars, name)[keep] for name in Bars.COLUMNS))
+        daily, group = resample(bars, DAY)
+        assert len(group) == len(bars) and group[-1] == len(daily) - 1
+        for i, day in enumerate(daily.timestamp):
+            rows = (bars.timestamp // DAY) * DAY == day
+            assert daily.open[i] == bars.open[rows][0] and daily.close[i] == bars.close[rows][-1]
+            assert daily.high[i] == bars.high[rows].max() and daily.low[i] == bars.low[rows].min()
+            assert np.isclose(daily.volume[i], bars.volume[rows].sum())
+
+        weekly, _ = resample(bars, *timeframe_bucket("1W"))
+        weekdays = {datetime.fromtimestamp(t / 1000, timezone.utc).weekday() for t in weekly.timestamp}
+        assert weekdays == {0}  # Monday
+
+    def test_builds_from_finest_stored_timeframe(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        hourly = _bars(24 * 60)
+        store.append("BTCUSDT", "1H", hourly)
+        store.append("BTCUSDT", "4H", resample(hourly, 4 * MS_PER_HOUR)[0])
+        resampler = Resampler(store)
+        assert resampler.base_timeframe("BTCUSDT", "1D") == "1H"
+        assert resampler.base_timeframe("BTCUSDT", "4H") == "4H"
+        assert not resampler.has("BTCUSDT", "5m") and not resampler.has("ETHUSDT", "1D")
+
+        daily = resampler.bars("BTCUSDT", "1D", datetime(2020, 1, 10), datetime(2020, 1, 20))
+        np.testing.assert_array_equal(daily.close, resample(hourly, DAY)[0].between(
+            datetime(2020, 1, 10), datetime(2020, 1, 20)).close)
+        assert daily.dataset.endswith(">1D")
+        resampler.bars("BTCUSDT", "1D")
+        assert resampler.stats() == {"entries": 1, "builds": 1, "extensions": 0, "hits": 1}
+
+    def test_appends_extend_instead_of_rebuilding(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        hourly = _bars(24 * 40 + 7)  # ends part way through a day
+        store.append("BTCUSDT", "1H", hourly[:24 * 30 + 5])
+        resampler = Resampler(store)
+        for timeframe in ("1D", "1W"):
+            resampler.bars("BTCUSDT", timeframe)
+
+        store.append("BTCUSDT", "1H", hourly[24 * 30 + 5:24 * 35])
+        store.append("BTCUSDT", "1H", hourly[24 * 35:])
+        for timeframe in ("1D", "1W"):
+            got = resampler.bars("BTCUSDT", timeframe)
+            expected = _fresh(store, "BTCUSDT", timeframe)
+            for column in Bars.COLUMNS:
+                np.testing.assert_array_equal(getattr(got, column), getattr(expected, column))
+        assert resampler.builds == 2 and resampler.extensions == 2
+
+        # Rewriting history before the cached last bucket forces a rebuild
+        store.append("BTCUSDT", "1H", _bars(48, start=datetime(2019, 12, 30), seed=9))
+        np.testing.assert_array_equal(resampler.bars("BTCUSDT", "1D").close,
+                                      _fresh(store, "BTCUSDT", "1D").close)
+        assert resampler.builds == 3
+
+    def test_forming_bucket_is_not_served(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        hourly = _bars(24 * 3)
+        store.append("BTCUSDT", "1H", hourly[:24 * 2 + 20])  # the third day has 20 of its 24 hours
+        resampler = Resampler(store)
+        assert len(resampler.bars("BTCUSDT", "1D")) == 2
+        assert len(resampler.bars("BTCUSDT", "4H")) == 17  # the 16:00 bucket is already whole
+
+        store.append("BTCUSDT", "1H", hourly[24 * 2 + 20:])
+        daily = resampler.bars("BTCUSDT", "1D")
+        assert len(daily) == 3 and resampler.extensions == 1
+        assert daily.close[-1] == hourly.close[-1] and daily.high[-1] == hourly.high[48:].max()
+
+    def test_overwritten_rows_rebuild(self, tmp_path):
+        store = BarStore(str(tmp_path))
+        hourly = _bars(24 * 10)
+        store.append("BTCUSDT", "1H", hourly)
+        resampler = Resampler(store)
+        before = resampler.bars("BTCUSDT", "1D")
+
+        # Same row count, new close on an hour of an already complete day
+        revised = hourly[24 * 3 + 23:24 * 4]
+        revised.close = np.array([5000.0])
+        store.append("BTCUSDT", "1H", revised)
+        after = resampler.bars("BTCUSDT", "1D")
+        assert after.close[3] == 5000.0 and before.close[3] != 5000.0
+        assert after.dataset == f"{store.dataset_id('BTCUSDT', '1H')}>1D"
+        assert resampler.builds == 2 and resampler.extensions == 0
+
+    def test_backtests_read_aggregated_and_synthetic_timeframes(self, tmp_path, monkeypatch):
+        store = BarStore(str(tmp_path))
+        store.append("BTCUSDT", "1H", _bars(24 * 200))
+        monkeypatch.setattr(data_store, "_default_store", store)
+        engine = BacktestEngine()
+        start, end = datetime(2020, 2, 1), datetime(2020, 6, 1)
+        daily = engine._load_bars(start, end, "BTCUSDT", "1D", None)
+        assert len(daily) == (end - start).days + 1 and np.all(np.diff(daily.timestamp) == DAY)
+        chunks, total = engine._iter_bars(start, end, "BTCUSDT", "1D", None)
+        assert total == len(daily) and sum(map(len, chunks)) == len(daily)
+
+        synthetic = engine._generate_price_data(start, end, seed=1, timeframe="1H")
+        assert len(synthetic) == (end - start).days * 24 + 1
+        assert synthetic.timestamp[1] - synthetic.timestamp[0] == MS_PER_HOUR
+        assert synthetic.start == to_epoch_ms(start)
+        assert len(engine._generate_price_data(start, end, seed=1)) == (end - start).days * 6 + 1
@@ -0,0 +1,101 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core import result_cache
+from core.backtest_engine import BacktestEngine
+from core.result_cache import ResultCache, result_key
+
+SOURCE = (
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+    "fast = ta.sma(close, 10)\n"
+    "if ta.crossover(close, fast)\n"
+    "    strategy.entry(\"L\", strategy.long)\n"
+    "if ta.crossunder(close, fast)\n"
+    "    strategy.close(\"L\")\n"
+)
+
+
+def _run(engine, seed=7, **kwargs):
+    return asyncio.run(engine.run_backtest(
+        SOURCE, "pine_script", datetime(2023, 1, 1), datetime(2023, 4, 1), seed=seed, **kwargs
+    ))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path))
+    monkeypatch.setattr(result_cache, "_default_cache", cache)
+    return cache
+
+
+def _no_simulation(*args, **kwargs):
+    raise AssertionError("cache hit should not simulate")
+
+
+class TestResultCache:
+    """Backtest results by content key"""
+
+    def test_keys(self):
+        engine = BacktestEngine()
+        bars = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 4, 1), seed=7)
+        key = result_key(SOURCE, "pine_script", bars, engine.config(), "1")
+        assert key == result_key(SOURCE, "pine_script", bars, engine.config(), "1")
+        assert key != result_key(SOURCE, "pine_script", bars, engine.config(), "2")
+        assert key != result_key(SOURCE, "pine_script", bars, BacktestEngine(commission=0.001).config(), "1")
+        assert key != result_key(SOURCE, "pine_script", bars[1:], engine.config(), "1")
+        bars.dataset = "store:BTC/4H@2"
+        assert key != result_key(SOURCE, "pine_script", bars, engine.config(), "1")
+        unseeded = engine._generate_price_data(datetime(2023, 1, 1), datetime(2023, 4, 1))
+        assert result_key(SOURCE, "pine_script", unseeded, engine.config(), "1") is None
+
+    def test_repeat_runs_skip_execution(self, cache, tmp_path, monkeypatch):
+        first = _run(BacktestEngine())
+        assert first.total_trades > 0 and cache.misses == 1
+
+        monkeypatch.setattr(BacktestEngine, "_simulate_trades", _no_simulation)
+        assert _run(BacktestEngine()) is first
+        assert cache.stats()["memory_hits"] == 1
+
+        # Another worker reads the stored result back
+        other = ResultCache(str(tmp_path))
+        monkeypatch.setattr(result_cache, "_default_cache", other)
+        loaded = _run(BacktestEngine())
+        assert other.disk_hits == 1 and loaded.summary() == first.summary()
+        assert loaded.equity_curve == first.equity_curve and loaded.timings == first.timings
+        np.testing.assert_array_equal(loaded.trades.pnl, first.trades.pnl)
+
+        # Different costs, data or an opt-out run the backtest
+        for engine, kwargs in ((BacktestEngine(slippage=0.002), {}), (BacktestEngine(), {"seed": 8}),
+                               (BacktestEngine(), {"use_cache": False})):
+            with pytest.raises(AssertionError, match="should not simulate"):
+                _run(engine, **kwargs)
+
+    def test_prunes_old_versions_and_oldest_entries(self, tmp_path):
+        result = _run(BacktestEngine(), use_cache=False)
+        old = ResultCache(str(tmp_path), version="1.1")
+        old.put("ab" * 32, result)
+        legacy = tmp_path / "cd"
+        legacy.mkdir()
+        (legacy / f"{'cd' * 32}.pkl").write_bytes(b"unversioned")
+        (tmp_path / "keep.txt").write_text("not ours")
+
+        cache = ResultCache(str(tmp_path), version="2.2")
+        cache.put("ef" * 32, result)  # the first write of a process prunes
+        assert sorted(os.listdir(str(tmp_path))) == ["keep.txt", "v2.2"]
+        assert ResultCache(str(tmp_path), version="2.2").get("ef" * 32).summary() == result.summary()
+
+        size = os.path.getsize(cache._path("ef" * 32))
+        bounded = ResultCache(str(tmp_path / "bounded"), version="2.2", max_disk_bytes=3 * size)
+        for i in range(6):
+            bounded.put(f"{i:02d}" * 32, result)
+            os.utime(bounded._path(f"{i:02d}" * 32), ns=(i + 10**18, i + 10**18))
+        bounded.prune()
+        kept = [i for i in range(6) if os.path.exists(bounded._path(f"{i:02d}" * 32))]
+        assert kept == [3, 4, 5]
@@ -0,0 +1,161 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.backtest_engine import BacktestEngine, PythonStrategyEngine, SignalType
+from core.sandbox import SandboxError, SandboxPool
+from core.synthetic import SyntheticMarket
+
+CROSSOVER = """
+import numpy as np
+
+KELLY_FRACTION = 0.0001
+
+def generate_signals(bars):
+    close = bars.close
+    fast = np.convolve(close, np.ones(10) / 10)[:len(close)]
+    above = close > fast
+    signals = np.zeros(len(close), dtype=np.int8)
+    signals[1:][above[1:] & ~above[:-1]] = 1
+    signals[1:][~above[1:] & above[:-1]] = 3
+    return signals
+"""
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SandboxPool(size=1, memory_mb=1024, cpu_seconds=5, timeout=2.0) as pool:
+        yield pool
+
+
+def _bars(n=2000):
+    return SyntheticMarket(5).gbm(1, n, 0.0, 0.01, start=datetime(2024, 1, 1)).bars(0)
+
+
+class TestSandboxPool:
+    """Python strategies run in warm, limited subprocesses"""
+
+    def test_signals_through_shared_memory(self, pool):
+        bars = _bars()
+        above = bars.close > np.convolve(bars.close, np.ones(10) / 10)[:len(bars)]
+        codes, params = pool.run(CROSSOVER, bars)
+        assert codes.dtype == np.int8 and params == {"kelly_fraction": 0.0001}
+        np.testing.assert_array_equal(np.flatnonzero(codes == 1), np.flatnonzero(above[1:] & ~above[:-1]) + 1)
+        # A shorter series reuses the segment; names are accepted as signals
+        names = "def generate_signals(bars):\n    return ['LONG'] + ['HOLD'] * (len(bars) - 1)\n"
+        assert pool.run(names, bars[:10])[0].tolist() == [1] + [0] * 9
+
+    def test_strategy_errors_keep_the_sandbox(self, pool):
+        bars = _bars(100)
+        process = pool._all[0].process
+        for code, message in (
+            ("import os\ndef generate_signals(bars):\n    return []\n", "not allowed"),
+            ("def generate_signals(bars):\n    return [1]\n", "shape"),
+            ("def generate_signals(bars):\n    bars.close[0] = 1\n", "read-only"),
+            ("signals = 1\n", "generate_signals"),
+            ("def generate_signals(bars):\n    return [7] * len(bars)\n", "codes"),
+        ):
+            with pytest.raises(SandboxError, match=message):
+                pool.run(code, bars)
+        assert pool._all[0].process is process
+
+    def test_runaway_strategy_is_replaced(self, pool):
+        with pytest.raises(SandboxError, match="timed out"):
+            pool.run("def generate_signals(bars):\n    while True:\n        pass\n", _bars(100))
+        assert len(pool._all) == 1 and pool._all[0].process.poll() is None
+        assert pool.run(CROSSOVER, _bars(100))[0].shape == (100,)
+
+    def test_module_attributes_do_not_escape(self, pool, tmp_path, monkeypatch):
+        monkeypatch.setenv("CLAWARS_TEST_SECRET", "hunter2")
+        bars = _bars(100)
+        target = tmp_path / "host.txt"
+        target.write_text("keep")
+        os.chmod(tmp_path, 0o777)  # only the sandbox itself should stop the strategy
+        target.chmod(0o666)
+        escape = "import random\n{}\ndef generate_signals(bars):\n    return [0] * len(bars)\n"
+        sockets = "random._os.sys.modules['builtins'].__import__('socket').socket()"
+        for attempt in (
+            f"random._os.unlink({str(target)!r})",
+            f"random._os.open({str(target)!r}, random._os.O_WRONLY | random._os.O_TRUNC)",
+            f"random._os.rename({str(target)!r}, {str(target)!r} + '.moved')",
+            sockets,
+            f"random._os.execv('/bin/sh', ['sh', '-c', 'rm {target}'])",
+            f"random._os.kill({os.getpid()}, 9)",
+            "random._os.fork()",
+        ):
+            with pytest.raises(SandboxError, match="PermissionError|Operation not permitted"):
+                pool.run(escape.format(attempt), bars)
+        assert target.read_text() == "keep"
+
+        # The environment is empty (Python itself may add LC_CTYPE)
+        environ = "import random\ndef generate_signals(bars):\n    raise ValueError(sorted(random._os.environ))\n"
+        with SandboxPool(size=1, cpu_seconds=5, timeout=5.0) as fresh:
+            with pytest.raises(SandboxError) as error:
+                fresh.run(environ, bars)
+        assert "CLAWARS_TEST_SECRET" not in str(error.value) and "'PATH'" in str(error.value)
+
+        # Started by root, the sandbox runs as another user and cannot read the worker's /proc
+        if os.geteuid() == 0:
+            proc = f"random._os.open('/proc/{os.getpid()}/environ', random._os.O_RDONLY)"
+            with pytest.raises(SandboxError, match="PermissionError"):
+                pool.run(escape.format(proc), bars)
+
+    def test_strategies_cannot_reach_each_other(self, pool):
+        bars = _bars(100)
+        victim = (
+            "VICTIM_SECRET = 'victim-marker-5d1c'\n"
+            "def generate_signals(bars):\n    return [1] + [0] * (len(bars) - 1)\n"
+        )
+        # Everything the interpreter holds: objects the collector tracks, and the frames above this one
+        thief = """
+import random
+_sys = random._os.sys
+_gc = _sys.modules['builtins'].__import__('gc')
+MARKER = 'victim-' + 'marker'
+
+def generate_signals(bars):
+    found = []
+    for obj in _gc.get_objects():
+        if isinstance(obj, dict) and 'VICTIM_SECRET' in obj:
+            found.append(obj['VICTIM_SECRET'])
+            obj['generate_signals'] = lambda bars: [2] * len(bars)
+        elif isinstance(obj, (str, bytes)) and MARKER in str(obj):
+            found.append(str(obj))
+    frame = _sys._getframe()
+    while frame is not None:
+        found.extend(repr(value)[:200] for value in frame.f_locals.values()
+                     if value is not globals() and MARKER in repr(value))
+        frame = frame.f_back
+    raise ValueError(f'found {len(found)}: ' + '|'.join(found))
+"""
+        first = pool.run(victim, bars)[0]
+        with pytest.raises(SandboxError, match="found 0: $") as error:
+            pool.run(thief, bars)
+        assert "5d1c" not in str(error.value)
+        np.testing.assert_array_equal(pool.run(victim, bars)[0], first)
+
+    def test_segment_is_private_to_the_parent(self, pool):
+        pool.run(CROSSOVER, _bars(100))
+        segment = pool._all[0].segment
+        assert os.stat(os.path.join("/dev/shm", segment.name.lstrip("/"))).st_mode & 0o777 == 0o600
+
+    def test_kelly_fraction_is_validated(self, pool):
+        bars = _bars(100)
+        code = "KELLY_FRACTION = {}\ndef generate_signals(bars):\n    return [0] * len(bars)\n"
+        assert pool.run(code.format(74.0), bars)[1] == {"kelly_fraction": 1.0}
+        for value in ("0", "-0.5", "float('nan')", "float('inf')"):
+            with pytest.raises(SandboxError, match="KELLY_FRACTION"):
+                pool.run(code.format(value), bars)
+
+    def test_engine_runs_python_strategies(self, pool):
+        bars = _bars()
+        engine = PythonStrategyEngine(CROSSOVER, pool=pool)
+        signals = engine.generate_signals(bars)
+        assert signals.count(SignalType.LONG) > 0 and engine.parsed["kelly_fraction"] == 0.0001
+        trades, _ = BacktestEngine()._simulate_trades(bars, signals, engine.parsed["kelly_fraction"])
+        assert len(trades) > 0
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import pickle
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core import strategy_cache
+from core.pine_parser import PineSyntaxError
+from core.strategy_cache import StrategyCache, cache_key, code_hash
+from core.synthetic import SyntheticMarket
+
+SOURCE = (
+    "lookback = input.int(10, \"Lookback\")\n"
+    "fast = ta.sma(close, lookback)\n"
+    "if ta.crossover(close, fast)\n"
+    "    strategy.entry(\"L\", strategy.long)\n"
+    "if ta.crossunder(close, fast)\n"
+    "    strategy.close(\"L\")\n"
+)
+
+
+def _no_compile(*args, **kwargs):
+    raise AssertionError("cache hit should not compile")
+
+
+class TestStrategyCache:
+    """Compiled artifacts by code hash, memory LRU over a shared directory"""
+
+    def test_keys(self):
+        assert code_hash(SOURCE) == hashlib.sha256(SOURCE.encode()).hexdigest()
+        assert cache_key(SOURCE) == cache_key(SOURCE, {})
+        assert cache_key(SOURCE, {"lookback": 5}) != cache_key(SOURCE)
+        assert cache_key(SOURCE + "\n") != cache_key(SOURCE)
+
+    def test_tiers_and_hit_rate(self, tmp_path, monkeypatch):
+        bars = SyntheticMarket(1).gbm(1, 500, 0.0, 0.01, start=datetime(2024, 1, 1)).bars(0)
+        first = StrategyCache(str(tmp_path), max_entries=1)
+        compiled = first.get(SOURCE)
+        assert first.get(SOURCE) is compiled
+        assert (first.misses, first.memory_hits, first.hit_rate) == (1, 1, 0.5)
+
+        # Another worker process sharing the directory loads without parsing
+        monkeypatch.setattr(strategy_cache, "compile_pine", _no_compile)
+        second = StrategyCache(str(tmp_path))
+        loaded = second.get(SOURCE)
+        assert second.stats()["disk_hits"] == 1
+        np.testing.assert_array_equal(loaded.signal_codes(bars), compiled.signal_codes(bars))
+        monkeypatch.undo()
+
+        # LRU evicts the least recent entry; overrides are separate artifacts
+        first.get(SOURCE, {"lookback": 5})
+        assert first.stats()["entries"] == 1
+        assert first.get(SOURCE) is not compiled
+        assert first.disk_hits == 1
+
+    def test_bad_artifacts_and_errors(self, tmp_path):
+        cache = StrategyCache(str(tmp_path))
+        key = cache_key(SOURCE)
+        path = os.path.join(str(tmp_path), key[:2], f"{key}.pkl")
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"truncated")
+        assert cache.get(SOURCE).has_orders
+        assert cache.misses == 1
+        assert StrategyCache(str(tmp_path)).get(SOURCE).has_orders  # replaced on recompile
+
+        with pytest.raises(PineSyntaxError):
+            cache.get("x = (close +\n")
+        assert len(os.listdir(str(tmp_path))) == 1
+
+    def test_unsigned_artifacts_are_not_loaded(self, tmp_path, monkeypatch):
+        StrategyCache(str(tmp_path), secret="ours").get(SOURCE)
+        path = StrategyCache(str(tmp_path))._path(cache_key(SOURCE))
+        with open(path, "rb") as f:
+            signed = f.read()
+        monkeypatch.setattr(strategy_cache, "compile_pine", _no_compile)
+        assert StrategyCache(str(tmp_path), secret="ours").get(SOURCE).has_orders
+
+        # Another secret, or a planted pickle, is never unpickled
+        loads = []
+        monkeypatch.setattr(pickle, "loads", loads.append)
+        for data, secret in ((signed, "theirs"), (signed[:32] + b"\x80\x04N.", "ours")):
+            with open(path, "wb") as f:
+                f.write(data)
+            with pytest.raises(AssertionError, match="should not compile"):
+                StrategyCache(str(tmp_path), secret=secret).get(SOURCE)
+        assert loads == []
@@ -0,0 +1,140 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core import data_store
+from core.backtest_engine import BacktestCancelled, BacktestEngine, PineScriptEngine
+from core.bars import Bars, MS_PER_HOUR
+from core.data_store import CHUNK_BARS, BarStore
+from core.equity import EquityCurveStream
+from core.metrics import MetricsAccumulator
+from core.profiling import Profiler
+
+SOURCE = (
+    "lookback = input.int(20, \"Lookback\")\n"
+    "entryThreshold = input.float(0.00002, \"Entry\")\n"
+    "exitThreshold = input.float(0.000005, \"Exit\")\n"
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+)
+
+
+def _bars(n, seed=3, start=0, interval=MS_PER_HOUR):
+    closes = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, n)))
+    return Bars.from_closes(closes, start=start, interval_ms=interval)
+
+
+def _chunks(bars, size):
+    return (bars[i:i + size] for i in range(0, len(bars), size))
+
+
+def _generated(n_chunks, size):
+    """Chunks made on demand: the whole series never exists at once"""
+    for k in range(n_chunks):
+        yield _bars(size, seed=k, start=k * size * MS_PER_HOUR)
+
+
+class TestStreamingBacktest:
+    """Bounded-memory backtests over chunk iterators"""
+
+    def test_matches_in_memory_run(self):
+        bars = _bars(20_000)
+        engine = BacktestEngine()
+        pine = PineScriptEngine(SOURCE)
+        trades, curve = engine._simulate_trades(bars, pine.generate_signals(bars), 0.0001)
+        expected = engine._calculate_metrics(trades, curve)
+
+        for size in (7, 999, 20_000):
+            reports = []
+            result = engine.run_streaming(SOURCE, _chunks(bars, size), progress_callback=reports.append,
+                                          profiler=Profiler(), total_bars=len(bars))
+            assert result.summary() == expected.summary()
+            for column in ("pnl", "entry_bar", "exit_bar", "exit_time"):
+                np.testing.assert_array_equal(getattr(result.trades, column), getattr(expected.trades, column))
+            assert len(reports) == -(-len(bars) // size) and reports[-1].fraction == 1.0
+            assert result.timings["simulate"].get("calls", 1) == len(reports)
+
+        # The bounded curve replays to the same drawdown and return
+        replay = MetricsAccumulator(engine.initial_capital)
+        for point in result.equity_curve:
+            replay.add_equity(point["equity"])
+        assert len(result.equity_curve) <= 2 * (engine.equity_points + 1)
+        assert replay.max_drawdown == pytest.approx(expected.max_drawdown)
+        assert result.equity_curve[-1] == expected.equity_curve[-1]
+
+    def test_memory_stays_flat(self, tmp_path, monkeypatch):
+        # Small trade and curve budgets, so both runs are past them
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        engine = BacktestEngine(max_trades=500, equity_points=20)
+        peaks = []
+        for n_chunks in (4, 40):
+            tracemalloc.start()
+            result = engine.run_streaming(SOURCE, _generated(n_chunks, 1_000), profiler=Profiler())
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            assert result.total_trades > 0
+        assert peaks[1] < 1.5 * peaks[0]
+
+    def test_store_streaming_and_limits(self, tmp_path, monkeypatch):
+        store = BarStore(str(tmp_path))
+        bars = _bars(2 * CHUNK_BARS + 1000, start=datetime(2020, 1, 1))
+        store.append("BTCUSDT", "1H", bars)
+        monkeypatch.setattr(data_store, "_default_store", store)
+        parts = list(store.iter_bars("BTCUSDT", "1H"))
+        assert len(parts) == 3 and sum(map(len, parts)) == len(bars)  # one Bars per aligned stored chunk
+
+        engine = BacktestEngine()
+        start, end = datetime(2020, 3, 1), datetime(2025, 1, 1)
+        run = lambda **kwargs: asyncio.run(engine.run_backtest(
+            SOURCE, "pine_script", start, end, asset="BTCUSDT", timeframe="1H", use_cache=False, **kwargs
+        ))
+        reports = []
+        assert run(stream=True, progress_callback=reports.append).summary() == run().summary()
+        assert reports[0].bars_total == reports[-1].bars_done == len(bars.between(start, end))
+        with pytest.raises(BacktestCancelled):
+            run(stream=True, should_cancel=lambda: True)
+
+        async def concurrently():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            await asyncio.sleep(0)
+            before = len(ticks)
+            await engine.run_backtest(SOURCE, "pine_script", start, end, asset="BTCUSDT",
+                                      timeframe="1H", use_cache=False, stream=True)
+            task.cancel()
+            return len(ticks) - before
+
+        assert asyncio.run(concurrently()) > 1  # the loop kept running during the stream
+
+        with pytest.raises(ValueError, match="Protective exits"):
+            BacktestEngine(stop_loss=0.02).run_streaming(SOURCE, _chunks(bars, 1000))
+        with pytest.raises(ValueError, match="cannot be streamed"):
+            engine.run_streaming("strategy.entry(\"L\", strategy.long)\n", _chunks(bars, 1000))
+
+    def test_equity_stream_keeps_peaks_and_trough(self):
+        rng = np.random.default_rng(1)
+        equity = 10_000 + np.cumsum(rng.normal(0, 5, 100_000))
+        timestamps = np.arange(len(equity), dtype=np.int64)
+        stream = EquityCurveStream(50, 10_000.0)
+        for i in range(0, len(equity), 777):
+            stream.add(timestamps[i:i + 777], equity[i:i + 777])
+        points = stream.points()
+        assert len(points) <= 102 and points[-1]["timestamp"] == len(equity) - 1
+
+        full, replay = MetricsAccumulator(10_000.0), MetricsAccumulator(10_000.0)
+        full.add_equity_array(equity)
+        replay.add_equity_array(np.array([p["equity"] for p in points]))
+        assert replay.max_drawdown == pytest.approx(full.max_drawdown)
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+from datetime import datetime
+
+from core.backtest_engine import BacktestEngine
+from core.config import settings
+from workers import tasks
+from workers.tasks import run_backtest, run_backtest_batch
+
+SOURCE = (
+    "lookback = input.int({}, \"Lookback\")\n"
+    "entryThreshold = input.float(0.00002, \"Entry\")\n"
+    "exitThreshold = input.float(0.000005, \"Exit\")\n"
+    "kellyFraction = input.float(0.0001, \"Kelly\")\n"
+)
+
+
+class TestBacktestBatch:
+    """Many backtests per task, one load per dataset"""
+
+    def test_groups_datasets_and_isolates_failures(self, monkeypatch):
+        loads = []
+        load_bars = BacktestEngine._load_bars
+
+        def counting(engine, *args):
+            loads.append(args)
+            return load_bars(engine, *args)
+
+        monkeypatch.setattr(BacktestEngine, "_load_bars", counting)
+        states = []
+        monkeypatch.setattr(run_backtest_batch, "update_state", lambda **kwargs: states.append(kwargs))
+
+        window = {"start_date": "2023-01-01", "end_date": "2023-03-01"}
+        specs = [
+            {"backtest_id": "a", "strategy_code": SOURCE.format(20), "strategy_type": "pine_script", "seed": 1, **window},
+            {"backtest_id": "b", "strategy_code": SOURCE.format(20), "strategy_type": "pine_script", "seed": 2, **window},
+            {"backtest_id": "c", "strategy_code": SOURCE.format(30), "strategy_type": "pine_script", "seed": 1, **window},
+            {"backtest_id": "d", "strategy_code": SOURCE.format(30), "strategy_type": "cobol", "seed": 2, **window},
+            {"backtest_id": "e", "strategy_type": "pine_script", **window},
+        ]
+        output = run_backtest_batch.run(specs)
+
+        assert [r["backtest_id"] for r in output["results"]] == ["a", "b", "c", "d", "e"]
+        assert [r["status"] for r in output["results"]] == ["completed"] * 3 + ["failed"] * 2
+        assert "Invalid spec" in output["results"][4]["error"]
+        assert output["failed"] == 2 and output["datasets"] == 2 and len(loads) == 2
+        assert states[-1]["meta"]["done"] == states[-1]["meta"]["total"] == 4
+
+        expected = asyncio.run(BacktestEngine().run_backtest(
+            SOURCE.format(30), "pine_script", datetime(2023, 1, 1), datetime(2023, 3, 1), seed=1,
+        ))
+        assert output["results"][2]["metrics"]["composite_score"] == expected.composite_score
+
+
+class TestBacktestProgress:
+    """Task progress comes from the simulation alone"""
+
+    def test_progress_never_goes_back(self, monkeypatch):
+        states = []
+        monkeypatch.setattr(run_backtest, "update_state", lambda **kwargs: states.append(kwargs))
+        monkeypatch.setattr(tasks, "PROGRESS_INTERVAL", 0.0)
+        monkeypatch.setattr(settings, "BACKTEST_CHUNK_BARS", 500)
+        output = run_backtest.run("p", SOURCE.format(20), "pine_script", "2023-01-01", "2023-06-01", "BTCUSDT", "1H")
+        assert output["status"] == "completed"
+        current = [state["meta"]["current"] for state in states]
+        assert len(current) > 1 and current == sorted(current) and current[-1] == 100
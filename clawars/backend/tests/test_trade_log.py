@@ -0,0 +1,91 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.bars import to_epoch_ms
+from core.trade_log import TradeLog
+
+
+def _fill(log, n):
+    t0 = to_epoch_ms(datetime(2024, 1, 1))
+    for i in range(n):
+        log.append(
+            entry_price=100.0 + i,
+            exit_price=101.0 + i,
+            entry_time=t0 + i * 1000,
+            exit_time=t0 + i * 1000 + 500,
+            direction="LONG" if i % 2 else "SHORT",
+            size=0.5,
+            pnl=float(i) - 10,
+            pnl_pct=0.1 * i,
+            entry_bar=2 * i,
+            exit_bar=2 * i + 1,
+        )
+    return log
+
+
+def _spilled_log(max_rows, n):
+    return _fill(TradeLog(max_rows=max_rows), n)
+
+
+class TestTradeLog:
+    """Columnar trade storage"""
+
+    def test_columns_and_views(self):
+        log = _fill(TradeLog(capacity=4), 25)
+        assert len(log) == 25
+        assert log.pnl.dtype == np.float64
+        np.testing.assert_array_equal(log.pnl, np.arange(25) - 10.0)
+        row = log[3]
+        assert row.direction == "LONG"
+        assert row.entry_time == datetime(2024, 1, 1, 0, 0, 3)
+        assert row.exit_reason == "Signal"
+        assert (row.entry_bar, row.exit_bar) == (6, 7)
+        assert log[-1].entry_price == 124.0
+
+    def test_spills_past_cap(self, tmp_path):
+        log = _fill(TradeLog(max_rows=10, spill_dir=str(tmp_path)), 35)
+        assert len(log) == 35
+        assert log.spilled_rows == 30
+        assert log.nbytes < 10 * 72
+        np.testing.assert_array_equal(log.pnl, np.arange(35) - 10.0)
+        assert log[5].pnl == -5.0
+        assert [t.size for t in log] == [0.5] * 35
+
+    def test_binary_round_trip(self):
+        log = _fill(TradeLog(max_rows=8), 20)
+        payload = log.to_bytes()
+        assert len(payload) < 20 * 72
+        restored = TradeLog.from_bytes(payload)
+        assert restored.to_records() == log.to_records()
+
+    def test_round_trip_keeps_the_cap(self, tmp_path):
+        log = _fill(TradeLog(), 20)
+        restored = TradeLog.from_bytes(log.to_bytes(), max_rows=8, spill_dir=str(tmp_path))
+        assert restored.spilled_rows == 16 and restored.nbytes < 20 * 72
+        assert restored.to_records() == log.to_records()
+
+    def test_spilled_log_survives_pickling(self):
+        log = _fill(TradeLog(max_rows=4), 10)
+        restored = pickle.loads(pickle.dumps(log))
+        del log  # removes the original's spill directory
+        np.testing.assert_array_equal(restored.pnl, np.arange(10) - 10.0)
+        assert restored.max_rows == 4 and restored.spilled_rows == 8
+
+    def test_spilled_log_crosses_processes(self):
+        # The worker's spill directory is gone once its log is collected
+        with ProcessPoolExecutor(1) as pool:
+            log = pool.submit(_spilled_log, 4, 10).result()
+        np.testing.assert_array_equal(log.pnl, np.arange(10) - 10.0)
+        assert log[1].direction == "LONG"
+
+    def test_rejects_foreign_payload(self):
+        with pytest.raises(ValueError):
+            TradeLog.from_bytes(b"XXXX" + bytes(20))
@@ -5,7 +5,8 @@ Async task processing for backtests
 
 from celery import Celery
 from datetime import datetime
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import time
 import structlog
 
 from core.config import settings
@@ -53,6 +54,74 @@ celery_app.conf.update(
 )
 
 
+# Redis key a running backtest polls between chunks; set by request_cancel
+CANCEL_KEY = "clawars:backtest:{}:cancel"
+
+# Minimum seconds between PROGRESS state updates
+PROGRESS_INTERVAL = 0.5
+
+
+def _redis():
+    import redis
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+
+def request_cancel(backtest_id: str) -> None:
+    """Ask the worker running `backtest_id` to stop after its current chunk"""
+    _redis().set(CANCEL_KEY.format(backtest_id), 1, ex=86400)
+
+
+def _cancel_check(backtest_id: str) -> Callable[[], bool]:
+    client = _redis()
+    key = CANCEL_KEY.format(backtest_id)
+
+    def should_cancel() -> bool:
+        try:
+            return bool(client.exists(key))
+        except Exception:
+            return False  # an unreachable Redis never kills a backtest
+
+    return should_cancel
+
+
+def _progress_reporter(task) -> Callable:
+    """Report simulation progress as task progress, rate limited"""
+    last_update = [0.0]
+
+    def report(progress) -> None:
+        now = time.monotonic()
+        if now - last_update[0] < PROGRESS_INTERVAL and progress.bars_done < progress.bars_total:
+            return
+        last_update[0] = now
+        task.update_state(
+            state="PROGRESS",
+            meta={
+                "current": int(100 * progress.fraction),
+                "status": "Simulating trades...",
+                "bars_done": progress.bars_done,
+                "bars_total": progress.bars_total,
+                "trades": progress.trades,
+                "equity": progress.equity,
+            }
+        )
+
+    return report
+
+
+def _metrics(result) -> Dict[str, float]:
+    """Headline metrics of a BacktestResult, as stored with the backtest"""
+    return {
+        "total_trades": result.total_trades,
+        "win_rate": result.win_rate,
+        "profit_factor": result.profit_factor,
+        "sharpe_ratio": result.sharpe_ratio,
+        "sortino_ratio": result.sortino_ratio,
+        "max_drawdown": result.max_drawdown,
+        "total_return": result.total_return,
+        "composite_score": result.composite_score,
+    }
+
+
 @celery_app.task(bind=True, name="workers.tasks.run_backtest")
 def run_backtest(
     self,
@@ -62,7 +131,8 @@ def run_backtest(
     start_date: str,
     end_date: str,
     asset: str,
-    timeframe: str
+    timeframe: str,
+    stream: bool = False
 ) -> Dict[str, Any]:
     """
     Execute a backtest asynchronously.
@@ -70,69 +140,71 @@ def run_backtest(
     Steps:
     1. Update status to "running"
     2. Fetch historical price data
-    3. Execute strategy
+    3. Execute strategy, reporting progress per chunk of bars
     4. Calculate metrics
     5. Save results
     6. Update leaderboard
+    
+    request_cancel(backtest_id) stops the run after its current chunk.
+    `stream` runs over the store's chunks in bounded memory (long 1m/tick ranges).
     """
+    from core.backtest_engine import BacktestCancelled
+    
     logger.info("Starting backtest", backtest_id=backtest_id)
     
     try:
-        # Progress: 0%
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 0, "status": "Initializing backtest..."}
-        )
-        
         # Import here to avoid circular imports
         import asyncio
         from core.backtest_engine import BacktestEngine
+        from core.profiling import Profiler
         from datetime import datetime as dt
         
         # Parse dates
         start = dt.fromisoformat(start_date)
         end = dt.fromisoformat(end_date)
         
-        # Progress: 10%
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 10, "status": "Fetching price data..."}
-        )
-        
         # Run backtest
         engine = BacktestEngine()
         result = asyncio.run(engine.run_backtest(
             strategy_code=strategy_code,
             strategy_type=strategy_type,
             start_date=start,
-            end_date=end
+            end_date=end,
+            asset=asset,
+            timeframe=timeframe,
+            progress_callback=_progress_reporter(self),
+            should_cancel=_cancel_check(backtest_id),
+            profiler=Profiler.from_settings(backtest_id=backtest_id, strategy_type=strategy_type),
+            stream=stream
         ))
         
-        # Progress: 90%
-        self.update_state(
-            state="PROGRESS",
-            meta={"current": 90, "status": "Calculating metrics..."}
-        )
-        
         # Save results to database (in production)
         # await save_backtest_results(backtest_id, result)
         
-        # Progress: 100%
-        logger.info("Backtest completed", backtest_id=backtest_id, score=result.composite_score)
+        from core.result_cache import get_result_cache
+        from core.strategy_cache import get_strategy_cache
+        logger.info(
+            "Backtest completed",
+            backtest_id=backtest_id,
+            score=result.composite_score,
+            strategy_cache_hit_rate=get_strategy_cache().hit_rate,
+            result_cache_hit_rate=get_result_cache().hit_rate,
+        )
         
         return {
             "backtest_id": backtest_id,
             "status": "completed",
-            "metrics": {
-                "total_trades": result.total_trades,
-                "win_rate": result.win_rate,
-                "profit_factor": result.profit_factor,
-                "sharpe_ratio": result.sharpe_ratio,
-                "sortino_ratio": result.sortino_ratio,
-                "max_drawdown": result.max_drawdown,
-                "total_return": result.total_return,
-                "composite_score": result.composite_score,
-            },
+            "metrics": _metrics(result),
+            "timings": result.timings,
+            "completed_at": datetime.utcnow().isoformat()
+        }
+        
+    except BacktestCancelled as e:
+        logger.info("Backtest cancelled", backtest_id=backtest_id, reason=str(e))
+        return {
+            "backtest_id": backtest_id,
+            "status": "cancelled",
+            "error": str(e),
             "completed_at": datetime.utcnow().isoformat()
         }
         
@@ -146,6 +218,83 @@ def run_backtest(
         }
 
 
+@celery_app.task(bind=True, name="workers.tasks.run_backtest_batch")
+def run_backtest_batch(self, specs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Execute many backtests in one task (e.g. the nightly re-score).
+    
+    Each spec carries the run_backtest arguments: backtest_id,
+    strategy_code, strategy_type, start_date, end_date and optionally
+    asset, timeframe and seed. Specs are grouped by dataset so each one
+    is loaded once, then run through one engine with the next dataset
+    prefetched (core.pipeline). A failing spec is reported as failed in
+    its own entry; the others still run. Results are in spec order.
+    A batch shares task_time_limit, so size batches to fit within it.
+    """
+    from core.backtest_engine import BacktestEngine
+    from core.pipeline import BacktestJob, BacktestPipeline
+    from datetime import datetime as dt
+    
+    logger.info("Starting backtest batch", size=len(specs))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(specs)
+    groups: Dict[tuple, List[Tuple[int, BacktestJob]]] = {}
+    for i, spec in enumerate(specs):
+        try:
+            job = BacktestJob(
+                strategy_code=spec["strategy_code"],
+                strategy_type=spec["strategy_type"],
+                start_date=dt.fromisoformat(spec["start_date"]),
+                end_date=dt.fromisoformat(spec["end_date"]),
+                asset=spec.get("asset"),
+                timeframe=spec.get("timeframe", "4H"),
+                seed=spec.get("seed"),
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            results[i] = _batch_failure(spec, f"Invalid spec: {e}")
+            continue
+        groups.setdefault(job.dataset_key, []).append((i, job))
+    
+    order = [entry for group in groups.values() for entry in group]
+    pipeline = BacktestPipeline(BacktestEngine())
+    last_update = 0.0
+    for done, ((i, _), outcome) in enumerate(zip(order, pipeline.run(job for _, job in order)), start=1):
+        backtest_id = specs[i].get("backtest_id")
+        if outcome.error is not None:
+            logger.error("Backtest failed", backtest_id=backtest_id, error=str(outcome.error))
+            results[i] = _batch_failure(specs[i], str(outcome.error))
+        else:
+            results[i] = {
+                "backtest_id": backtest_id,
+                "status": "completed",
+                "metrics": _metrics(outcome.result),
+                "timings": outcome.result.timings,
+            }
+        now = time.monotonic()
+        if now - last_update >= PROGRESS_INTERVAL or done == len(order):
+            last_update = now
+            self.update_state(
+                state="PROGRESS",
+                meta={"current": int(100 * done / len(order)), "done": done, "total": len(order)}
+            )
+    
+    failed = sum(1 for result in results if result["status"] == "failed")
+    logger.info(
+        "Backtest batch completed", size=len(specs), failed=failed, datasets=len(groups), loads=pipeline.loads
+    )
+    return {
+        "status": "completed",
+        "total": len(specs),
+        "failed": failed,
+        "datasets": len(groups),
+        "results": results,
+        "completed_at": datetime.utcnow().isoformat()
+    }
+
+
+def _batch_failure(spec: Dict[str, Any], error: str) -> Dict[str, Any]:
+    return {"backtest_id": spec.get("backtest_id"), "status": "failed", "error": error}
+
+
 @celery_app.task(name="workers.tasks.update_leaderboard")
 def update_leaderboard() -> Dict[str, int]:
     """
@@ -186,11 +335,15 @@ def validate_strategy(strategy_code: str, strategy_type: str) -> Dict[str, Any]:
     warnings = []
     
     if strategy_type == "pine_script":
-        # Check for forbidden functions
-        forbidden = ["strategy.entry", "strategy.exit", "strategy.close"]
-        for func in forbidden:
-            if func in strategy_code:
-                errors.append(f"Forbidden function: {func} - use CLAWARS functions instead")
+        # Compile against the supported Pine subset; a valid script stays
+        # cached for the backtests that follow
+        from core.pine_parser import PineError
+        from core.strategy_cache import get_strategy_cache
+        
+        try:
+            get_strategy_cache().get(strategy_code)
+        except PineError as e:
+            errors.append(f"Pine error: {e}")
         
         # Check for minimum requirements
         if "study(" not in strategy_code and "strategy(" not in strategy_code:
@@ -202,6 +355,18 @@ def validate_strategy(strategy_code: str, strategy_type: str) -> Dict[str, Any]:
             compile(strategy_code, "<string>", "exec")
         except SyntaxError as e:
             errors.append(f"Syntax error: {e}")
+        
+        # Trial run in the sandbox pool on a short synthetic series
+        if not errors:
+            from core.backtest_engine import PythonStrategyEngine
+            from core.sandbox import SandboxError
+            from core.synthetic import SyntheticMarket
+            
+            bars = SyntheticMarket(seed=0).gbm(1, 500).bars(0)
+            try:
+                PythonStrategyEngine(strategy_code).generate_signal_codes(bars)
+            except SandboxError as e:
+                errors.append(f"Strategy error: {e}")
     
     return {
         "valid": len(errors) == 0,